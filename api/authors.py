@@ -0,0 +1,58 @@
+# api/authors.py
+
+from django.db.models import Count, Q
+from django.contrib.postgres.aggregates import ArrayAgg
+
+from .models import Author, BookAuthor, author_key
+
+
+def book_authors(user, books_and_names):
+    """
+    Unsaved BookAuthors giving each (book, author name) pair its author, for a bulk_create.
+    Each book's authors keep the order they come in; any the user doesn't have yet are
+    created in one INSERT. A name repeated for a book, in any case or spacing, is stored once.
+    """
+    authors = Author.objects.named(user, [name for _, name in books_and_names])
+
+    rows = []
+    listed = {}
+    for book, name in books_and_names:
+        author_ids = listed.setdefault(book, [])
+        author = authors[name]
+        if author.id not in author_ids:
+            rows.append(BookAuthor(book=book, author=author, user=user, position=len(author_ids)))
+            author_ids.append(author.id)
+    return rows
+
+
+def authors_written(user, name):
+    """ the user's authors with the given name, in any case or spacing: a queryset of one or none """
+    return Author.objects.filter(user=user, key=author_key(name))
+
+
+def author_counts(user):
+    """
+    The user's authors who have books, in order of name, with how many books each has:
+    [{ 'id': 1, 'name': 'Ursula K. Le Guin', 'count': 3 }]
+    """
+    # naming the user of the book authors too (always the author's user) lets the
+    # join read just theirs, by the index on BookAuthor.user
+    return Author.objects.filter(
+        user=user, book_authors__user=user
+    ).values('id', 'name').annotate(
+        count=Count('book_authors__book', distinct=True)
+    ).order_by('name', 'id')
+
+
+def author_book_ids(user, author_id):
+    """
+    One of the user's authors with how many books they have and the ids of those books, in order:
+    a queryset of [{ 'id', 'name', 'count', 'books': [...] }], empty if they have no such author.
+    An author with no books left has None for books.
+    """
+    return Author.objects.filter(user=user, id=author_id).values('id', 'name').annotate(
+        count=Count('book_authors__book', distinct=True),
+        books=ArrayAgg(
+            'book_authors__book', distinct=True, ordering='book_authors__book',
+            filter=Q(book_authors__isnull=False)),
+    )
@@ -0,0 +1,405 @@
+# api/benchmark.py
+
+import http.client
+import json
+import math
+import random
+import re
+import threading
+import time
+import urllib.parse
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import connection
+from django.test import Client
+
+
+# the endpoints a benchmark can replay, with how often each comes up in the default mix.
+# reads dominate, like the iOS app's traffic; the writes put back the values they read,
+# so the benchmark can be run again and again against the same library
+DEFAULT_MIX = {
+    'books': 10,
+    'book': 30,
+    'tags': 10,
+    'tag': 5,
+    'series': 10,
+    'status': 20,
+    'rating': 10,
+    'auth-token': 5,
+}
+
+# the route and method each operation is recorded under in /metrics (see booktracker/metrics.py)
+METRICS_LABELS = {
+    'books': ('books', 'GET'),
+    'book': ('book', 'GET'),
+    'tags': ('tags', 'GET'),
+    'tag': ('tag', 'PUT'),
+    'series': ('series_list', 'GET'),
+    'status': ('bookstatus', 'GET'),
+    'rating': ('rating', 'PUT'),
+    'auth-token': ('get-auth-token', 'POST'),
+}
+
+METRICS_LINE = re.compile(r'^booktracker_db_queries_(sum|count)\{route="([^"]*)",method="([^"]*)"\} (\S+)$')
+
+
+def parse_mix(text):
+    """ turn 'books=10,book=30' into {'books': 10, 'book': 30}; raises ValueError if it is malformed """
+    mix = {}
+    for part in text.split(','):
+        name, _, weight = part.strip().partition('=')
+        if name not in DEFAULT_MIX:
+            raise ValueError("Unknown endpoint '%s'; use any of: %s" % (name, ", ".join(DEFAULT_MIX)))
+        try:
+            mix[name] = float(weight)
+        except ValueError:
+            raise ValueError("Invalid weight for '%s': %s" % (name, weight))
+        if mix[name] < 0:
+            raise ValueError("Invalid weight for '%s': %s" % (name, weight))
+    if not any(mix.values()):
+        raise ValueError("The mix must give at least one endpoint a weight")
+    return mix
+
+
+class ClientTarget:
+    """
+    Sends requests through the Django test client, in this process, against the configured database.
+    Queries are counted with an execute wrapper on the calling thread's connection.
+    """
+
+    def __init__(self):
+        # the test client's default host, 'testserver', is only allowed while tests run
+        hosts = [host for host in settings.ALLOWED_HOSTS if '*' not in host and not host.startswith('.')]
+        self.host = hosts[0] if hosts else 'testserver'
+        self.local = threading.local()
+
+    def client(self):
+        if not hasattr(self.local, 'client'):
+            # a view that crashes should count as a 500, not stop the benchmark
+            self.local.client = Client(SERVER_NAME=self.host, raise_request_exception=False)
+        return self.local.client
+
+    def request(self, method, path, token=None, data=None):
+        """ returns (status code, decoded JSON body or None, number of queries) """
+        extra = {}
+        if token:
+            extra['HTTP_AUTHORIZATION'] = 'Token ' + token
+        body = json.dumps(data) if data is not None else ''
+
+        queries = []
+
+        def count_query(execute, sql, params, many, context):
+            queries.append(sql)
+            return execute(sql, params, many, context)
+
+        with connection.execute_wrapper(count_query):
+            response = self.client().generic(method, '/' + path, body, content_type='application/json', **extra)
+
+        try:
+            content = json.loads(response.content)
+        except ValueError:
+            content = None
+        return response.status_code, content, len(queries)
+
+    def query_totals(self):
+        return None
+
+    def finish_thread(self):
+        # each worker thread opened its own database connection
+        connection.close()
+
+
+class HttpTarget:
+    """
+    Sends requests over HTTP to a running server, keeping one connection open per worker thread.
+    Query counts come from the server's /metrics endpoint, when it is reachable.
+    """
+
+    def __init__(self, base_url, metrics_token=None):
+        parsed = urllib.parse.urlparse(base_url)
+        self.connection_class = http.client.HTTPSConnection if parsed.scheme == 'https' else http.client.HTTPConnection
+        self.netloc = parsed.netloc
+        self.prefix = parsed.path.rstrip('/') + '/'
+        self.metrics_token = metrics_token
+        self.local = threading.local()
+
+    def connection(self):
+        if not hasattr(self.local, 'connection'):
+            self.local.connection = self.connection_class(self.netloc, timeout=60)
+        return self.local.connection
+
+    def send(self, method, path, headers, body):
+        try:
+            self.connection().request(method, path, body=body, headers=headers)
+            response = self.connection().getresponse()
+            return response.status, response.read()
+        except (http.client.HTTPException, ConnectionError):
+            # the server closed the kept-alive connection; reconnect once
+            self.connection().close()
+            del self.local.connection
+            self.connection().request(method, path, body=body, headers=headers)
+            response = self.connection().getresponse()
+            return response.status, response.read()
+
+    def request(self, method, path, token=None, data=None):
+        headers = {'Content-Type': 'application/json', 'Accept': 'application/json'}
+        if token:
+            headers['Authorization'] = 'Token ' + token
+        body = json.dumps(data) if data is not None else None
+
+        status_code, raw = self.send(method, self.prefix + path, headers, body)
+        try:
+            content = json.loads(raw)
+        except ValueError:
+            content = None
+        return status_code, content, None
+
+    def query_totals(self):
+        """ {(route, method): (query sum, request count)} from the server's /metrics, or None """
+        headers = {}
+        if self.metrics_token:
+            headers['Authorization'] = 'Bearer ' + self.metrics_token
+        status_code, raw = self.send('GET', self.prefix + 'metrics', headers, None)
+        if status_code != 200:
+            return None
+
+        totals = {}
+        for line in raw.decode('utf-8').splitlines():
+            match = METRICS_LINE.match(line)
+            if match:
+                kind, route, method, value = match.groups()
+                query_sum, count = totals.get((route, method), (0, 0))
+                if kind == 'sum':
+                    query_sum = float(value)
+                else:
+                    count = float(value)
+                totals[(route, method)] = (query_sum, count)
+        return totals
+
+    def finish_thread(self):
+        if hasattr(self.local, 'connection'):
+            self.local.connection.close()
+
+
+class Library:
+    """ the ids and names of a user's books and tags, to build requests from """
+
+    def __init__(self, target, username, password):
+        self.username = username
+        self.password = password
+
+        status_code, content, _ = target.request('POST', 'auth-token/', data={'username': username, 'password': password})
+        if status_code != 200:
+            raise ValueError("Could not log in as '%s' (status %s)" % (username, status_code))
+        self.token = content['token']
+
+        status_code, content, _ = target.request('GET', 'books/', self.token)
+        self.books = [(book['id'], book['rating']) for book in content['books']]
+        if not self.books:
+            raise ValueError("'%s' has no books to benchmark with; try manage.py seed_library" % (username))
+
+        status_code, content, _ = target.request('GET', 'tags/', self.token)
+        self.tags = [(tag['tag_name'], tag['books']) for tag in content['tags']]
+
+
+def build_request(operation, library, rng):
+    """ the (method, path, data, needs token) of one request for an operation """
+    if operation == 'books':
+        return 'GET', 'books/', None, True
+    if operation == 'book':
+        book_id, _ = rng.choice(library.books)
+        return 'GET', 'books/%s/' % (book_id), None, True
+    if operation == 'tags':
+        return 'GET', 'tags/', None, True
+    if operation == 'tag':
+        if not library.tags:
+            return 'GET', 'tags/', None, True
+        # rename the tag to itself, on the books it already has
+        tag_name, book_ids = rng.choice(library.tags)
+        return 'PUT', 'tags/%s/' % (urllib.parse.quote(tag_name)), {'new_name': tag_name, 'books': book_ids}, True
+    if operation == 'series':
+        return 'GET', 'series/', None, True
+    if operation == 'status':
+        book_id, _ = rng.choice(library.books)
+        return 'GET', 'status/%s/' % (book_id), None, True
+    if operation == 'rating':
+        # give the book the rating it already has
+        book_id, rating = rng.choice(library.books)
+        return 'PUT', 'rating/%s/' % (book_id), {'rating': rating}, True
+    if operation == 'auth-token':
+        return 'POST', 'auth-token/', {'username': library.username, 'password': library.password}, False
+    raise ValueError("Unknown endpoint '%s'" % (operation))
+
+
+def run_benchmark(target, library, mix, request_count, concurrency, seed=None):
+    """
+    Send request_count requests, picked at random by weight from mix, from concurrency threads at once.
+
+    Returns (results, elapsed seconds), where results is a list of
+    (operation, seconds, status code, query count or None).
+    """
+    operations = list(mix)
+    weights = [mix[operation] for operation in operations]
+    rng = random.Random(seed)
+    plan = rng.choices(operations, weights=weights, k=request_count)
+    # build every request up front, so that picking them doesn't count towards their latency
+    requests = [(operation, build_request(operation, library, rng)) for operation in plan]
+
+    def work(share):
+        results = []
+        try:
+            for operation, (method, path, data, needs_token) in share:
+                start = time.perf_counter()
+                status_code, _, queries = target.request(method, path, library.token if needs_token else None, data)
+                results.append((operation, time.perf_counter() - start, status_code, queries))
+        finally:
+            if concurrency > 1:
+                target.finish_thread()
+        return results
+
+    shares = [requests[index::concurrency] for index in range(concurrency)]
+    start = time.perf_counter()
+    if concurrency == 1:
+        results = work(shares[0])
+    else:
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            results = [result for share_results in executor.map(work, shares) for result in share_results]
+    elapsed = time.perf_counter() - start
+
+    return results, elapsed
+
+
+def percentile(sorted_values, fraction):
+    """ nearest-rank percentile of an already sorted list """
+    if not sorted_values:
+        return None
+    rank = max(1, math.ceil(fraction * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+def summarize_timings(durations, elapsed):
+    durations = sorted(durations)
+    return {
+        'requests': len(durations),
+        'requests_per_second': round(len(durations) / elapsed, 1) if elapsed else None,
+        'p50_ms': round(percentile(durations, 0.50) * 1000, 2),
+        'p95_ms': round(percentile(durations, 0.95) * 1000, 2),
+        'p99_ms': round(percentile(durations, 0.99) * 1000, 2),
+    }
+
+
+def summarize(results, elapsed, query_totals=None):
+    """
+    Latency percentiles, throughput, errors and queries per request, for each endpoint and overall.
+
+    query_totals, for targets that can't count queries themselves, maps each endpoint
+    to the (queries, requests) the server recorded during the run.
+    """
+    summary = {'endpoints': {}}
+    operations = sorted(set(result[0] for result in results))
+
+    for operation in operations:
+        rows = [result for result in results if result[0] == operation]
+        endpoint = summarize_timings([row[1] for row in rows], elapsed)
+        endpoint['errors'] = len([row for row in rows if row[2] >= 400])
+
+        if rows[0][3] is not None:
+            endpoint['queries_per_request'] = round(sum(row[3] for row in rows) / len(rows), 2)
+        elif query_totals and query_totals.get(operation) and query_totals[operation][1]:
+            queries, count = query_totals[operation]
+            endpoint['queries_per_request'] = round(queries / count, 2)
+        else:
+            endpoint['queries_per_request'] = None
+
+        summary['endpoints'][operation] = endpoint
+
+    summary['overall'] = summarize_timings([result[1] for result in results], elapsed)
+    summary['overall']['errors'] = len([result for result in results if result[2] >= 400])
+    return summary
+
+
+def query_deltas(before, after):
+    """ per-endpoint (queries, requests) recorded in /metrics between two scrapes """
+    if before is None or after is None:
+        return None
+    deltas = {}
+    for operation, labels in METRICS_LABELS.items():
+        start_sum, start_count = before.get(labels, (0, 0))
+        end_sum, end_count = after.get(labels, (0, 0))
+        deltas[operation] = (end_sum - start_sum, end_count - start_count)
+    return deltas
+
+
+def find_regressions(summary, baseline, tolerance):
+    """
+    Compare a summary to a saved one. Latency and throughput may be up to tolerance
+    (a fraction) worse before they count as regressions; query counts should never go up.
+    """
+    regressions = []
+    for operation, endpoint in summary['endpoints'].items():
+        before = baseline.get('endpoints', {}).get(operation)
+        if before is None:
+            continue
+
+        for key in ['p50_ms', 'p95_ms', 'p99_ms']:
+            if before.get(key) and endpoint[key] > before[key] * (1 + tolerance):
+                regressions.append("%s %s: %.2f ms, was %.2f ms" % (operation, key, endpoint[key], before[key]))
+
+        if before.get('queries_per_request') is not None and endpoint['queries_per_request'] is not None:
+            if endpoint['queries_per_request'] > before['queries_per_request']:
+                regressions.append("%s queries_per_request: %s, was %s" % (
+                    operation, endpoint['queries_per_request'], before['queries_per_request']))
+
+    before = baseline.get('overall', {}).get('requests_per_second')
+    now = summary['overall']['requests_per_second']
+    if before and now < before * (1 - tolerance):
+        regressions.append("requests_per_second: %.1f, was %.1f" % (now, before))
+
+    return regressions
+
+
+def time_rendering(build, renderer, repeat):
+    """
+    Build a response body with build() and render it to JSON bytes, repeat times.
+    Returns the fastest (build, render) times in seconds, and the bytes.
+    """
+    best_build = best_render = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        data = build()
+        built = time.perf_counter()
+        body = renderer(data)
+        rendered = time.perf_counter()
+
+        if best_build is None or built - start < best_build:
+            best_build = built - start
+        if best_render is None or rendered - built < best_render:
+            best_render = rendered - built
+    return best_build, best_render, body
+
+
+def compare_rendering(paths, repeat):
+    """
+    Time each of several ways of building and rendering the same response.
+
+    paths maps a name to its (build, renderer) pair; the first is the baseline the others'
+    speedups are measured against. Also reports whether each renders the same bytes as it.
+    """
+    results = {}
+    baseline_body = baseline_total = None
+    for name, (build, renderer) in paths.items():
+        build_time, render_time, body = time_rendering(build, renderer, repeat)
+        total = build_time + render_time
+        if baseline_body is None:
+            baseline_body, baseline_total = body, total
+
+        results[name] = {
+            'build_ms': round(build_time * 1000, 2),
+            'render_ms': round(render_time * 1000, 2),
+            'total_ms': round(total * 1000, 2),
+            'bytes': len(body),
+            'speedup': round(baseline_total / total, 1) if total else None,
+            'identical': body == baseline_body,
+        }
+    return results
@@ -0,0 +1,76 @@
+# api/book_cache.py
+
+from django.conf import settings
+from django.core.cache import cache
+
+from booktracker.metrics import registry, timed_serialization
+
+from .models import Book
+from .fast_serializers import serialize_books
+
+
+# the columns book_documents needs from each book to check the cache
+STUB_FIELDS = ('id', 'user_id', 'updated_at')
+
+
+def book_cache_key(user_id, book_id):
+    return 'book:%s:%s' % (user_id, book_id)
+
+
+def book_stamp(book):
+    return book.updated_at.isoformat()
+
+
+def forget_books(user_id, book_ids):
+    """ drop books from the cache so the next read serializes them again """
+    keys = [book_cache_key(user_id, book_id) for book_id in set(book_ids)]
+    if keys:
+        cache.delete_many(keys)
+
+
+@timed_serialization()
+def book_documents(books):
+    """
+    The BookSerializer output for each of the given books, in the same order.
+
+    The books only need the STUB_FIELDS loaded. Each serialized book is cached per user and
+    book for settings.BOOK_CACHE_TIMEOUT seconds along with the updated_at it was made from,
+    so a book that hasn't changed is neither loaded nor serialized again. The views forget
+    a book when they change it; comparing updated_at (which a database trigger sets on
+    every write, including changes to a book's authors and tags) also catches writes made
+    elsewhere, and a stale entry stored by a request that raced a write.
+
+    Only the missing and stale books are loaded, with their authors and tags, in one batch.
+    The whole lookup is timed as serialization, cache reads included.
+    """
+    books = list(books)
+    if not books:
+        return []
+
+    keys = {book.id: book_cache_key(book.user_id, book.id) for book in books}
+    cached = cache.get_many(list(keys.values()))
+
+    documents = {}
+    for book in books:
+        entry = cached.get(keys[book.id])
+        if entry is not None and entry[0] == book_stamp(book):
+            documents[book.id] = entry[1]
+
+    missing = [book for book in books if book.id not in documents]
+    if missing:
+        stamps = {book.id: book_stamp(book) for book in missing}
+        entries = {}
+        for document in serialize_books(Book.objects.filter(id__in=list(stamps))):
+            # a plain dict, rather than the OrderedDict the serializer hands back
+            document = dict(document)
+            documents[document['id']] = document
+            # the stamp read before the book was reloaded: if it changed in between, the
+            # entry is newer than its stamp and the next read just reloads it again
+            entries[keys[document['id']]] = (stamps[document['id']], document)
+        cache.set_many(entries, settings.BOOK_CACHE_TIMEOUT)
+
+    registry.increment('booktracker_book_cache_hits_total', len(books) - len(missing))
+    registry.increment('booktracker_book_cache_misses_total', len(missing))
+
+    # a book deleted since the stubs were read is left out
+    return [documents[book.id] for book in books if book.id in documents]
@@ -0,0 +1,219 @@
+# api/bulk.py
+
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Book, Author, BookAuthor, Series, Tag, BookTag, BookStatus
+from .authors import book_authors
+from .tags import tag_books
+
+
+# the most books one request to books/bulk/ may create
+MAX_BULK_BOOKS = 5000
+
+# how many rows go into each INSERT
+BATCH_SIZE = 1000
+
+# optional book fields that are copied over as they are given
+TEXT_FIELDS = ['publisher', 'publication_date', 'isbn_10', 'isbn_13', 'description']
+NUMBER_FIELDS = ['position_in_series', 'page_count']
+
+
+def max_length(model, field):
+    return model._meta.get_field(field).max_length
+
+
+def is_name(value, length):
+    """ whether a title, author or tag is a non-empty string that fits its column """
+    return isinstance(value, str) and value.strip() != '' and len(value) <= length
+
+
+def find_field_error(data):
+    """
+    Check the title and optional fields of one book against the columns they are saved in,
+    so a book the database would refuse is reported rather than failing the whole INSERT.
+    Returns an error message, or None if they all fit.
+    """
+    title_length = max_length(Book, 'title')
+    if not is_name(data.get('title'), title_length):
+        return "title must be a non-empty string of at most %s characters" %(title_length)
+
+    for field in TEXT_FIELDS:
+        value = data.get(field)
+        length = max_length(Book, field)
+        if value is None:
+            continue
+        if not isinstance(value, (str, int)) or isinstance(value, bool):
+            return "%s must be a string" %(field)
+        if length is not None and len(str(value)) > length:
+            return "%s must be at most %s characters" %(field, length)
+
+    for field in NUMBER_FIELDS:
+        value = data.get(field)
+        if value is not None:
+            try:
+                number = int(value)
+            except (TypeError, ValueError):
+                return "%s must be an integer" %(field)
+            if number < 0:
+                return "%s must not be negative" %(field)
+
+    return None
+
+
+def find_names_error(authors, tags):
+    """ Check a book's author and tag names. Returns an error message, or None if they all fit. """
+    author_length = max_length(Author, 'name')
+    if not all(is_name(author, author_length) for author in authors):
+        return "every author must be a non-empty string of at most %s characters" %(author_length)
+    tag_length = max_length(Tag, 'name')
+    if not all(is_name(tag, tag_length) for tag in tags):
+        return "every tag must be a non-empty string of at most %s characters" %(tag_length)
+    return None
+
+
+def find_book_error(data, series_ids):
+    """
+    Check one book's data the same way POST books/ does.
+    Returns an error message, or None if the book can be created.
+    """
+    if not isinstance(data, dict):
+        return "Invalid book parameters"
+    if 'title' not in data or 'authors' not in data:
+        return "Invalid book parameters"
+    if not isinstance(data['authors'], list):
+        return "authors must be a list"
+    if 'tags' in data and not isinstance(data['tags'], list):
+        return "tags must be a list"
+
+    error = find_names_error(data['authors'], data.get('tags', [])) or find_field_error(data)
+    if error is not None:
+        return error
+
+    series_id = data.get('series')
+    if series_id is not None:
+        try:
+            found = int(series_id) in series_ids
+        except (TypeError, ValueError):
+            found = False
+        if not found:
+            return "Could not find series with ID: %s" %(series_id)
+
+    return None
+
+
+def build_entry(data, user, date):
+    """
+    Turn one book's data into an unsaved Book with the names and statuses to create for it.
+    """
+    book = Book(
+        title=data['title'],
+        user=user,
+        series_id=None if data.get('series') is None else int(data['series']),
+        current_status=Book.WANTTOREAD,
+        current_status_date=date)
+    for field in TEXT_FIELDS:
+        setattr(book, field, data.get(field))
+    for field in NUMBER_FIELDS:
+        value = data.get(field)
+        setattr(book, field, None if value is None else int(value))
+
+    # remove any duplicate tags, keeping their order
+    tags = []
+    for tag in data.get('tags', []):
+        if tag not in tags:
+            tags.append(tag)
+
+    return {
+        'book': book,
+        'authors': data['authors'],
+        'tags': tags,
+        'statuses': [(Book.WANTTOREAD, date)],
+    }
+
+
+def parse_books(items, user):
+    """
+    Validate every book before anything is written.
+
+    Returns (entries, errors): one entry per item if all are valid,
+    otherwise a list of { 'index': ..., 'error': ... } for each invalid item.
+    """
+    # look up all the referenced series in one query
+    requested_series = set()
+    for data in items:
+        if isinstance(data, dict) and data.get('series') is not None:
+            try:
+                requested_series.add(int(data['series']))
+            except (TypeError, ValueError):
+                pass
+    series_ids = set()
+    if requested_series:
+        series_ids = set(Series.objects.filter(
+            user=user, id__in=requested_series).values_list('id', flat=True))
+
+    errors = []
+    for index, data in enumerate(items):
+        error = find_book_error(data, series_ids)
+        if error:
+            errors.append({
+                "index": index,
+                "error": error,
+            })
+    if errors:
+        return [], errors
+
+    date = timezone.now()
+    entries = [build_entry(data, user, date) for data in items]
+    return entries, []
+
+
+def find_latest_status(statuses):
+    """
+    The (status_code, date) with the latest date, or None if there are none.
+    When dates tie, the status listed last wins.
+    """
+    latest = None
+    for status in statuses:
+        if latest is None or status[1] >= latest[1]:
+            latest = status
+    return latest
+
+
+def create_books(entries, user):
+    """
+    Save books made by build_entry, with their authors, tags and statuses,
+    using one bulk INSERT per table (per BATCH_SIZE rows) inside a single transaction.
+
+    A book's current status is its most recent status.
+    Returns the saved books in the order of the entries.
+    """
+    for entry in entries:
+        latest = find_latest_status(entry['statuses'])
+        if latest is not None:
+            entry['book'].current_status, entry['book'].current_status_date = latest
+
+    with transaction.atomic():
+        # on PostgreSQL, bulk_create sets the primary keys of the new books
+        books = Book.objects.bulk_create(
+            [entry['book'] for entry in entries], batch_size=BATCH_SIZE)
+
+        BookAuthor.objects.bulk_create(book_authors(user, [
+            (entry['book'], author_name)
+            for entry in entries
+            for author_name in entry['authors']
+        ]), batch_size=BATCH_SIZE)
+
+        BookTag.objects.bulk_create(tag_books(user, [
+            (entry['book'], tag_name)
+            for entry in entries
+            for tag_name in entry['tags']
+        ]), batch_size=BATCH_SIZE)
+
+        BookStatus.objects.bulk_create([
+            BookStatus(status_code=status_code, date=date, user=user, book=entry['book'])
+            for entry in entries
+            for status_code, date in entry['statuses']
+        ], batch_size=BATCH_SIZE)
+
+    return books
@@ -0,0 +1,71 @@
+# api/conditional.py
+
+import functools
+
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.utils.http import http_date
+
+from .models import LibraryVersion
+
+
+def library_state(user):
+    """ the user's library version and when it last changed; (0, None) if it never has """
+    state = LibraryVersion.objects.filter(user=user).values_list('version', 'updated_at').first()
+    return state or (0, None)
+
+
+def library_etag(user_id, version, format=None):
+    # weak, because compressing the response changes its bytes but not what it means.
+    # formats other than JSON (like MessagePack or CSV) are different representations,
+    # so they get different tags
+    if format and format != 'json':
+        return 'W/"%s.%s.%s"' % (user_id, version, format)
+    return 'W/"%s.%s"' % (user_id, version)
+
+
+def conditional_library_get(view):
+    """
+    Answer GETs with 304 Not Modified when the client already has the current library.
+
+    Every response is tagged with an ETag made from the user's library version and a
+    Last-Modified date of its last change. When a client sends the ETag back (If-None-Match)
+    and the library hasn't changed since, the view isn't run at all, so the only query is
+    for the version itself.
+    https://developer.mozilla.org/en-US/docs/Web/HTTP/Conditional_requests
+
+    If-Modified-Since is not evaluated: HTTP dates are whole seconds, so a client that saw
+    one change would be told nothing had changed after a second write in the same second.
+    Last-Modified is only there to tell clients when the library last changed.
+
+    This goes under @api_view, so that it runs after DRF has authenticated the user.
+    """
+    @functools.wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if request.method != 'GET':
+            return view(request, *args, **kwargs)
+
+        # read the version before the view reads the library: if a write lands in between,
+        # the response is tagged as older than it is and the client just fetches it again
+        version, updated_at = library_state(request.user)
+        # DRF has already picked the renderer from the Accept header (or ?format=)
+        renderer = getattr(request, 'accepted_renderer', None)
+        etag = library_etag(request.user.id, version, getattr(renderer, 'format', None))
+        last_modified = int(updated_at.timestamp()) if updated_at else None
+
+        # without a last_modified, get_conditional_response ignores If-Modified-Since
+        response = get_conditional_response(request, etag=etag)
+        if response is None:
+            response = view(request, *args, **kwargs)
+            if response.status_code != 200:
+                return response
+
+        response['ETag'] = etag
+        if last_modified is not None:
+            response['Last-Modified'] = http_date(last_modified)
+        # clients may keep the response, but must check it is still current before using it
+        patch_cache_control(response, private=True, no_cache=True)
+        # and must not use one format's response for a request for another
+        patch_vary_headers(response, ('Accept',))
+        return response
+
+    return wrapper
@@ -0,0 +1,107 @@
+# api/export.py
+
+import csv
+import json
+
+from django.db.models import prefetch_related_objects
+from rest_framework import serializers
+
+from .models import Book
+from .serializers import BookSerializer
+
+
+# how many books are held in memory at once while exporting
+CHUNK_SIZE = 500
+
+CSV_COLUMNS = [
+    'id',
+    'title',
+    'authors',
+    'series',
+    'series_name',
+    'position_in_series',
+    'publisher',
+    'publication_date',
+    'isbn_10',
+    'isbn_13',
+    'page_count',
+    'description',
+    'current_status',
+    'current_status_date',
+    'rating',
+    'tags',
+    'status_history',
+]
+
+# separates the items of a list inside one CSV cell
+CSV_LIST_SEPARATOR = '; '
+
+date_field = serializers.DateTimeField()
+
+
+def iter_books(user):
+    """
+    Yield every one of a user's books with its series, authors, tags and statuses loaded.
+
+    The books are read through a server-side cursor (QuerySet.iterator) and their
+    related rows are prefetched one chunk at a time, so only CHUNK_SIZE books are
+    in memory at once, however large the library.
+    """
+    queryset = Book.objects.filter(user=user).select_related('series').order_by('id')
+
+    chunk = []
+    for book in queryset.iterator(chunk_size=CHUNK_SIZE):
+        chunk.append(book)
+        if len(chunk) == CHUNK_SIZE:
+            prefetch_related_objects(chunk, 'authors', 'tags', 'statuses')
+            yield from chunk
+            chunk = []
+
+    prefetch_related_objects(chunk, 'authors', 'tags', 'statuses')
+    yield from chunk
+
+
+def export_document(book):
+    """ everything GET books/<book_id>/ returns, plus the series name and full status history """
+    document = dict(BookSerializer(book).data)
+    document['series_name'] = book.series.name if book.series else None
+    document['status_history'] = [
+        {
+            'id': book_status.id,
+            'status_code': book_status.status_code,
+            'date': date_field.to_representation(book_status.date),
+        }
+        for book_status in sorted(book.statuses.all(), key=lambda book_status: (book_status.date, book_status.id))
+    ]
+    return document
+
+
+def ndjson_lines(user):
+    for book in iter_books(user):
+        yield json.dumps(export_document(book)) + '\n'
+
+
+class Echo:
+    """
+    A file-like object that hands back whatever is written to it, so csv.writer
+    can produce one line at a time,
+    https://docs.djangoproject.com/en/3.0/howto/outputting-csv/#streaming-large-csv-files
+    """
+
+    def write(self, value):
+        return value
+
+
+def csv_lines(user):
+    writer = csv.writer(Echo())
+    yield writer.writerow(CSV_COLUMNS)
+
+    for book in iter_books(user):
+        document = export_document(book)
+        document['authors'] = CSV_LIST_SEPARATOR.join(document['authors'])
+        document['tags'] = CSV_LIST_SEPARATOR.join(document['tags'])
+        document['status_history'] = CSV_LIST_SEPARATOR.join(
+            "%s %s" % (book_status['status_code'], book_status['date'])
+            for book_status in document['status_history']
+        )
+        yield writer.writerow([document[column] for column in CSV_COLUMNS])
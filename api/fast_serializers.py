@@ -0,0 +1,181 @@
+# api/fast_serializers.py
+
+"""
+Plain-dict versions of BookSerializer, SeriesSerializer and BookStatusSerializer for lists.
+
+A ModelSerializer builds a model instance for every row and then runs every field of it
+through its own Field object; for a few thousand books that bookkeeping costs far more than
+the queries do. These functions read the same columns with .values() and build the same
+dicts directly: the same keys in the same order, and the same values, formatted the same way.
+
+They're used instead of the serializers when settings.FAST_RENDERING is on
+(see serialize_books, serialize_series and serialize_statuses below),
+along with FastJSONRenderer in api/renderers.py. Either way, the time they take is
+recorded in booktracker_serialize_duration_seconds (see booktracker/metrics.py).
+"""
+
+from collections import defaultdict
+
+from django.conf import settings
+from django.db.models import Prefetch
+from django.utils import timezone
+
+from booktracker.metrics import timed_serialization
+
+from .models import Book, BookAuthor, BookTag
+from .helper import BOOK_RELATION_ORDER, prefetch_book_relations
+from .serializers import BookSerializer, SeriesSerializer, BookStatusSerializer
+
+
+BOOK_COLUMNS = [
+    'id',
+    'title',
+    'position_in_series',
+    'series_id',
+    'publisher',
+    'publication_date',
+    'isbn_10',
+    'isbn_13',
+    'page_count',
+    'description',
+    'current_status',
+    'current_status_date',
+    'rating',
+]
+
+
+def fast_rendering_enabled():
+    return getattr(settings, 'FAST_RENDERING', False)
+
+
+def datetime_formatter():
+    """
+    A function that formats datetimes like DRF's DateTimeField (with the default ISO 8601
+    format), which looks the current time zone up again for every value it formats.
+    """
+    zone = timezone.get_current_timezone() if settings.USE_TZ else None
+
+    def format_datetime(value):
+        if not value:
+            return None
+        if zone is not None:
+            value = value.astimezone(zone)
+        value = value.isoformat()
+        if value.endswith('+00:00'):
+            value = value[:-6] + 'Z'
+        return value
+
+    return format_datetime
+
+
+def names_by_book(model, name_field, books, ordering=('id',)):
+    """
+    {book id: [names]} for the authors (model=BookAuthor) or tags (model=BookTag)
+    of a queryset of books, in the given order (see BOOK_RELATION_ORDER)
+    """
+    names = defaultdict(list)
+    # a subquery, rather than a list of thousands of ids for Django to prepare one by one
+    rows = model.objects.filter(
+        book__in=books.order_by().values('id')
+    ).order_by(*ordering).values_list('book_id', name_field)
+    for book_id, name in rows:
+        names[book_id].append(name)
+    return names
+
+
+def book_dicts(queryset):
+    """ what BookSerializer(queryset, many=True).data holds, in three queries """
+    rows = list(queryset.values(*BOOK_COLUMNS))
+    if not rows:
+        return []
+    authors = names_by_book(BookAuthor, 'author__name', queryset, BOOK_RELATION_ORDER['authors'])
+    tags = names_by_book(BookTag, 'tag__name', queryset, BOOK_RELATION_ORDER['tags'])
+
+    to_datetime = datetime_formatter()
+    return [
+        {
+            'id': row['id'],
+            'title': row['title'],
+            'authors': authors.get(row['id'], []),
+            'position_in_series': row['position_in_series'],
+            'series': row['series_id'],
+            'publisher': row['publisher'],
+            'publication_date': row['publication_date'],
+            'isbn_10': row['isbn_10'],
+            'isbn_13': row['isbn_13'],
+            'page_count': row['page_count'],
+            'description': row['description'],
+            'current_status': row['current_status'],
+            'current_status_date': to_datetime(row['current_status_date']),
+            'rating': row['rating'],
+            'tags': tags.get(row['id'], []),
+        }
+        for row in rows
+    ]
+
+
+def series_dicts(queryset):
+    """ what SeriesSerializer(queryset, many=True).data holds, in two queries """
+    rows = list(queryset.values('id', 'name', 'planned_count'))
+    if not rows:
+        return []
+    books = defaultdict(list)
+    book_rows = Book.objects.filter(
+        series__in=queryset.order_by().values('id')
+    ).order_by('id').values_list('series_id', 'id')
+    for series_id, book_id in book_rows:
+        books[series_id].append(book_id)
+
+    return [
+        {
+            'id': row['id'],
+            'name': row['name'],
+            'planned_count': row['planned_count'],
+            'books': books.get(row['id'], []),
+        }
+        for row in rows
+    ]
+
+
+def status_dicts(queryset):
+    """ what BookStatusSerializer(queryset, many=True).data holds, in one query """
+    to_datetime = datetime_formatter()
+    return [
+        {
+            'id': row['id'],
+            'status_code': row['status_code'],
+            'book': row['book_id'],
+            'date': to_datetime(row['date']),
+        }
+        for row in queryset.values('id', 'status_code', 'book_id', 'date')
+    ]
+
+
+@timed_serialization()
+def serialize_books(queryset, fast=None):
+    """ a list of books, with or without the serializers; fast=None follows settings.FAST_RENDERING """
+    if fast is None:
+        fast = fast_rendering_enabled()
+    if fast:
+        return book_dicts(queryset)
+    return BookSerializer(prefetch_book_relations(queryset), many=True).data
+
+
+@timed_serialization()
+def serialize_series(queryset, fast=None):
+    if fast is None:
+        fast = fast_rendering_enabled()
+    if fast:
+        return series_dicts(queryset)
+    # series are serialized with the ids of their books, which is all that needs loading
+    books = Book.objects.only('id', 'series_id').order_by('id')
+    return SeriesSerializer(queryset.prefetch_related(Prefetch('books', queryset=books)), many=True).data
+
+
+@timed_serialization()
+def serialize_statuses(queryset, fast=None):
+    if fast is None:
+        fast = fast_rendering_enabled()
+    if fast:
+        return status_dicts(queryset)
+    return BookStatusSerializer(queryset, many=True).data
@@ -0,0 +1,48 @@
+# api/fieldsets.py
+
+from .helper import BOOK_RELATIONS, prefetch_book_relations
+from .serializers import BookSerializer
+
+
+BOOK_FIELDS = BookSerializer.Meta.fields
+
+
+def parse_field_list(text):
+    names = set(name.strip() for name in text.split(',') if name.strip())
+    unknown = sorted(names - set(BOOK_FIELDS))
+    if unknown:
+        raise ValueError("Unknown field: %s" % (", ".join(unknown)))
+    return names
+
+
+def requested_book_fields(params):
+    """
+    The book fields a client asked for with ?fields=id,title (only these)
+    and/or ?exclude=description (all but these), in BookSerializer's order,
+    or None if it asked for neither. id is always included.
+
+    Raises ValueError for a field that books don't have.
+    """
+    if 'fields' not in params and 'exclude' not in params:
+        return None
+
+    wanted = set(BOOK_FIELDS)
+    if 'fields' in params:
+        wanted = parse_field_list(params['fields'])
+    if 'exclude' in params:
+        wanted -= parse_field_list(params['exclude'])
+    wanted.add('id')
+
+    return [field for field in BOOK_FIELDS if field in wanted]
+
+
+def sparse_books(queryset, fields, *extra_columns):
+    """
+    Load only what BookSerializer(fields=fields) reads: the columns behind those fields
+    (plus any extra_columns the view itself needs), and authors and tags only if they
+    were asked for. A list of titles never reads descriptions or runs the tag query.
+    https://docs.djangoproject.com/en/3.0/ref/models/querysets/#only
+    """
+    columns = [field for field in fields if field not in BOOK_RELATIONS]
+    relations = [field for field in fields if field in BOOK_RELATIONS]
+    return prefetch_book_relations(queryset.only(*columns, *extra_columns), relations)
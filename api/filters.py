@@ -0,0 +1,102 @@
+# api/filters.py
+
+import datetime
+
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from .models import Book, BookAuthor, BookTag, Tag
+from .authors import authors_written
+from .tags import subtree_filter
+
+
+STATUS_CODES = [code for code, _ in Book.STATUS_CHOICES]
+RATINGS = [rating for rating, _ in Book.RATING_CHOICES]
+
+
+def parse_list(params, name):
+    """ the comma-separated values of a query parameter, like ?current_status=CURR,PAUS """
+    return [value.strip() for value in params[name].split(',') if value.strip()]
+
+
+def parse_moment(params, name):
+    """
+    A date or datetime query parameter; a bare date (2020-01-31) means midnight at its start,
+    in the server's time zone. Raises ValueError if it is neither.
+    """
+    text = params[name]
+    try:
+        moment = parse_datetime(text)
+        if moment is None:
+            day = parse_date(text)
+            if day is not None:
+                moment = datetime.datetime(day.year, day.month, day.day)
+    except ValueError:
+        moment = None
+    if moment is None:
+        raise ValueError("Invalid %s '%s'; use a date or datetime like 2020-01-31T12:00:00Z" %(name, text))
+
+    if timezone.is_naive(moment):
+        moment = timezone.make_aware(moment)
+    return moment
+
+
+def filter_books(queryset, user, params):
+    """
+    Narrow a queryset of a user's books by the filters in the query parameters:
+
+        current_status=CURR,PAUS            books with any of these current statuses
+        rating=4,5                          books with any of these ratings
+        series=<id>                         books in this series (series=none for books in none)
+        tag=fiction                         books tagged fiction, or anything nested under it
+        author=Ursula K. Le Guin            books by this author, in any case or spacing
+        status_date_after=2020-01-01        books whose current status was set on or after this
+        status_date_before=2021-01-01       ... or before this
+
+    Filters combine with AND. Tags and authors are matched with a subquery on the
+    (tag, book) and (author, book) indexes, so the join never
+    touches other users' rows.
+
+    Raises ValueError with a message for the client if a filter is invalid.
+    """
+    if 'current_status' in params:
+        statuses = parse_list(params, 'current_status')
+        for status_code in statuses:
+            if status_code not in STATUS_CODES:
+                raise ValueError("Invalid current_status '%s'; use one of: %s" %(status_code, ", ".join(STATUS_CODES)))
+        queryset = queryset.filter(current_status__in=statuses)
+
+    if 'rating' in params:
+        try:
+            ratings = [int(rating) for rating in parse_list(params, 'rating')]
+        except ValueError:
+            ratings = [None]
+        if not all(rating in RATINGS for rating in ratings):
+            raise ValueError("Invalid rating '%s'; use whole numbers from 0 through 5" %(params['rating']))
+        queryset = queryset.filter(rating__in=ratings)
+
+    if 'series' in params:
+        if params['series'] == 'none':
+            queryset = queryset.filter(series__isnull=True)
+        else:
+            try:
+                series_id = int(params['series'])
+            except ValueError:
+                raise ValueError("Invalid series '%s'; use a series ID or none" %(params['series']))
+            queryset = queryset.filter(series_id=series_id)
+
+    if 'tag' in params:
+        tags = Tag.objects.filter(subtree_filter(params['tag']), user=user)
+        tagged = BookTag.objects.filter(tag__in=tags).values('book_id')
+        queryset = queryset.filter(id__in=tagged)
+
+    if 'author' in params:
+        written = BookAuthor.objects.filter(author__in=authors_written(user, params['author'])).values('book_id')
+        queryset = queryset.filter(id__in=written)
+
+    if 'status_date_after' in params:
+        queryset = queryset.filter(current_status_date__gte=parse_moment(params, 'status_date_after'))
+    if 'status_date_before' in params:
+        queryset = queryset.filter(current_status_date__lt=parse_moment(params, 'status_date_before'))
+
+    return queryset
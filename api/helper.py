@@ -0,0 +1,92 @@
+from django.db.models import Prefetch
+
+from .models import Author, BookAuthor, Tag, BookTag
+
+
+# the Book relations BookSerializer lists, and the model of each
+BOOK_RELATIONS = {
+    'authors': BookAuthor,
+    'tags': BookTag,
+}
+
+# the order each relation is listed in: authors as they were given, tags as they were added
+BOOK_RELATION_ORDER = {
+    'authors': ['position', 'id'],
+    'tags': ['id'],
+}
+
+# for each relation's model, the field naming the Author or Tag, and how they're found by name
+BOOK_NAMED = {
+    BookAuthor: ('author', Author.objects.named),
+    BookTag: ('tag', Tag.objects.named),
+}
+
+
+def prefetch_book_relations(queryset, relations=BOOK_RELATIONS):
+    """
+    Load everything BookSerializer reads for a list of books up front,
+    or just the given relations (like ['tags']).
+
+    authors and tags are StringRelatedFields, so without this every serialized book
+    fires one query for its authors and another for its tags.
+    prefetch_related fetches each relation for the whole list in a single query,
+    https://docs.djangoproject.com/en/3.0/ref/models/querysets/#prefetch-related
+
+    series is serialized as a primary key, which is read straight off book.series_id,
+    so it doesn't need a join or a prefetch.
+
+    Authors are listed in the order they were given, and tags in the order they were added.
+    """
+    return queryset.prefetch_related(*[
+        Prefetch(name, queryset=BOOK_RELATIONS[name].objects.order_by(*BOOK_RELATION_ORDER[name]))
+        for name in relations
+    ])
+
+
+def replace_book_names(model, book, user, names):
+    """
+    Make the given names a book's complete list of authors (model=BookAuthor) or tags (model=BookTag).
+
+    The names are first looked up as the user's Authors or Tags, creating any they don't have yet.
+    Rows for the ones still wanted are kept; the rest are removed with a single DELETE and the
+    missing ones are added with a single bulk INSERT, so the cost doesn't grow with the number
+    of names. Duplicate names are only stored once (for authors, that includes names that differ
+    only in case or spacing), and authors are renumbered if their order changed.
+    """
+    field, named = BOOK_NAMED[model]
+    positioned = model is BookAuthor
+
+    # the wanted authors or tags, without duplicates, in order
+    found = named(user, names)
+    wanted = list(dict.fromkeys(found[name].id for name in names))
+    wanted_set = set(wanted)
+
+    # keep one existing row per wanted author or tag
+    kept = {}
+    stale_ids = []
+    columns = ['id', field + '_id'] + (['position'] if positioned else [])
+    for row in model.objects.filter(book=book).order_by('id').values_list(*columns):
+        row_id, named_id = row[0], row[1]
+        if named_id in wanted_set and named_id not in kept:
+            kept[named_id] = row
+        else:
+            stale_ids.append(row_id)
+
+    if stale_ids:
+        model.objects.filter(id__in=stale_ids).delete()
+
+    new_rows = []
+    moved_rows = []
+    for position, named_id in enumerate(wanted):
+        values = {field + '_id': named_id}
+        if positioned:
+            values['position'] = position
+        if named_id not in kept:
+            new_rows.append(model(**values, user=user, book=book))
+        elif positioned and kept[named_id][2] != position:
+            moved_rows.append(model(id=kept[named_id][0], **values))
+
+    if moved_rows:
+        model.objects.bulk_update(moved_rows, ['position'])
+    if new_rows:
+        model.objects.bulk_create(new_rows)
@@ -0,0 +1,348 @@
+# api/importer.py
+
+import csv
+import datetime
+import io
+import itertools
+import re
+
+import pytz
+from django.conf import settings
+from django.db import DatabaseError, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import Book, ImportJob
+from .bulk import (
+    BATCH_SIZE, TEXT_FIELDS, NUMBER_FIELDS, create_books, find_latest_status,
+    find_field_error, find_names_error)
+
+
+# only the first errors are kept, so a badly broken file can't bloat the job row
+MAX_RECORDED_ERRORS = 100
+
+# the columns saved as a job makes progress
+PROGRESS_FIELDS = ['rows_processed', 'rows_failed', 'books_created', 'errors']
+
+
+class JobReclaimed(Exception):
+    """ another worker has taken over a job that this one stopped saving progress on for too long """
+
+# the names different exports use for each column, after normalize_header
+TITLE_COLUMNS = ['title']
+AUTHOR_COLUMNS = ['authors', 'author', 'additional_authors']
+ISBN_COLUMNS = ['isbn', 'isbn13', 'isbn/uid']
+SHELF_COLUMNS = ['bookshelves', 'shelves', 'tags']
+READ_STATUS_COLUMNS = ['exclusive_shelf', 'read_status']
+RATING_COLUMNS = ['my_rating', 'star_rating', 'rating']
+DATE_ADDED_COLUMNS = ['date_added']
+DATE_READ_COLUMNS = ['date_read', 'last_date_read']
+DATES_READ_COLUMNS = ['dates_read']
+PUBLISHER_COLUMNS = ['publisher']
+PAGE_COUNT_COLUMNS = ['number_of_pages', 'page_count', 'pages']
+PUBLICATION_DATE_COLUMNS = ['original_publication_year', 'year_published', 'publication_date']
+
+# Goodreads' exclusive shelves and StoryGraph's read statuses
+READ_STATUSES = {
+    'to-read': Book.WANTTOREAD,
+    'currently-reading': Book.CURRENT,
+    'read': Book.COMPLETED,
+    'paused': Book.PAUSED,
+    'did-not-finish': Book.DISCARDED,
+}
+
+
+def normalize_header(header):
+    """ 'My Rating' and 'my_rating' both become 'my_rating' """
+    return header.replace('\ufeff', '').strip().lower().replace(' ', '_')
+
+
+def first_value(row, columns):
+    """ the first non-empty value among the given columns """
+    for column in columns:
+        value = (row.get(column) or '').strip()
+        if value:
+            return value
+    return ''
+
+
+def split_list(value):
+    return [item.strip() for item in value.split(',') if item.strip()]
+
+
+def clean_isbn(value):
+    """ Goodreads wraps ISBNs like ="0441013597" so spreadsheets keep the leading zeros """
+    return re.sub(r'[^0-9Xx]', '', value)
+
+
+def parse_date(value):
+    """ read a 'YYYY/MM/DD' or 'YYYY-MM-DD' date as midnight UTC; None if it can't be read """
+    value = value.strip().replace('/', '-')
+    try:
+        date = datetime.datetime.strptime(value[:10], '%Y-%m-%d')
+    except ValueError:
+        return None
+    return pytz.utc.localize(date)
+
+
+def parse_rating(value):
+    """ ratings are whole stars from 0 to 5; half stars round up """
+    if not value:
+        return Book.UNRATED
+    try:
+        rating = int(float(value) + 0.5)
+    except ValueError:
+        raise ValueError("%s is not a valid rating" %(value))
+    if rating < Book.UNRATED or rating > Book.FIVE:
+        raise ValueError("%s is not a valid rating" %(value))
+    return rating
+
+
+def parse_statuses(row, read_status, date_added):
+    """
+    Build a book's status history from its read dates.
+
+    A book is "want to read" from the date it was added. Each read adds a "currently
+    reading" status on its start date (if known) and a "completed" status on its end date.
+    A book that is shelved as currently reading, paused or discarded ends with that status.
+    """
+    statuses = []
+    if date_added:
+        statuses.append((Book.WANTTOREAD, date_added))
+
+    # StoryGraph lists every read like 2019/05/03-2019/05/20, 2020/01/01-2020/01/10
+    for read in split_list(first_value(row, DATES_READ_COLUMNS)):
+        start, _, end = read.partition('-' if '/' in read else ' - ')
+        start_date = parse_date(start)
+        end_date = parse_date(end)
+        if start_date:
+            statuses.append((Book.CURRENT, start_date))
+        if end_date:
+            statuses.append((Book.COMPLETED, end_date))
+
+    date_read = parse_date(first_value(row, DATE_READ_COLUMNS))
+    if date_read and (Book.COMPLETED, date_read) not in statuses:
+        statuses.append((Book.COMPLETED, date_read))
+
+    if read_status and read_status != Book.WANTTOREAD:
+        latest = find_latest_status(statuses)
+        if latest is None:
+            statuses.append((read_status, timezone.now()))
+        elif latest[0] != read_status:
+            statuses.append((read_status, latest[1]))
+
+    if not statuses:
+        statuses.append((read_status or Book.WANTTOREAD, timezone.now()))
+    return statuses
+
+
+def parse_row(row, user):
+    """
+    Map one CSV row onto an entry for bulk.create_books.
+    Raises ValueError with a message if the row can't be imported.
+    """
+    title = first_value(row, TITLE_COLUMNS)
+    if not title:
+        raise ValueError("Missing title")
+
+    authors = []
+    for column in AUTHOR_COLUMNS:
+        for author in split_list(row.get(column) or ''):
+            if author not in authors:
+                authors.append(author)
+    if not authors:
+        raise ValueError("Missing authors")
+
+    book = Book(title=title, user=user)
+    book.rating = parse_rating(first_value(row, RATING_COLUMNS))
+    book.publisher = first_value(row, PUBLISHER_COLUMNS) or None
+    book.publication_date = first_value(row, PUBLICATION_DATE_COLUMNS) or None
+
+    page_count = first_value(row, PAGE_COUNT_COLUMNS)
+    if page_count:
+        try:
+            book.page_count = int(page_count)
+        except ValueError:
+            raise ValueError("%s is not a valid page count" %(page_count))
+
+    for column in ISBN_COLUMNS:
+        isbn = clean_isbn(row.get(column) or '')
+        if len(isbn) == 10:
+            book.isbn_10 = isbn
+        elif len(isbn) == 13:
+            book.isbn_13 = isbn
+
+    read_status_name = first_value(row, READ_STATUS_COLUMNS)
+    read_status = READ_STATUSES.get(read_status_name)
+
+    # shelves become tags, except for the shelves that stand for a read status
+    tags = []
+    for shelf in split_list(first_value(row, SHELF_COLUMNS)):
+        if shelf not in READ_STATUSES and shelf not in tags:
+            tags.append(shelf)
+
+    # anything the database would refuse is the row's error, not the whole batch's
+    error = find_names_error(authors, tags) or find_field_error(
+        {field: getattr(book, field) for field in ['title'] + TEXT_FIELDS + NUMBER_FIELDS})
+    if error is not None:
+        raise ValueError(error)
+
+    date_added = parse_date(first_value(row, DATE_ADDED_COLUMNS))
+
+    return {
+        'book': book,
+        'authors': authors,
+        'tags': tags,
+        'statuses': parse_statuses(row, read_status, date_added),
+    }
+
+
+def read_rows(source):
+    """
+    Yield (row_number, row) from the CSV text one row at a time,
+    with every header normalized.
+    """
+    reader = csv.reader(io.StringIO(source))
+    try:
+        headers = [normalize_header(header) for header in next(reader)]
+    except StopIteration:
+        return
+    for row_number, values in enumerate(reader, start=2):
+        if not any(values):
+            continue
+        yield row_number, dict(zip(headers, values))
+
+
+def first_line(error):
+    """ the message of a database error, without the DETAIL lines that quote the whole row """
+    return str(error).strip().split('\n')[0]
+
+
+def record_error(job, row_number, message):
+    if len(job.errors) < MAX_RECORDED_ERRORS:
+        job.errors.append({
+            "row": row_number,
+            "error": message,
+        })
+    job.rows_failed += 1
+
+
+def save_progress(job, fields=PROGRESS_FIELDS):
+    """
+    Save the given fields of a running job and mark it as still being worked on.
+
+    The UPDATE only matches if the job's heartbeat is the one this worker last wrote:
+    if the job was given up on and claimed again (see claim_next_job), it raises
+    JobReclaimed instead, so two workers never import the same rows.
+    """
+    heartbeat = timezone.now()
+    values = {field: getattr(job, field) for field in fields}
+    updated = ImportJob.objects.filter(id=job.id, heartbeat_at=job.heartbeat_at).update(
+        heartbeat_at=heartbeat, **values)
+    if updated == 0:
+        raise JobReclaimed()
+    job.heartbeat_at = heartbeat
+
+
+def import_batch(job, rows):
+    """
+    Create the books of a batch of (row_number, entry) and save the job's progress,
+    in one transaction, so a job picked up again carries on from the first row it hadn't saved.
+
+    If the database refuses the batch, its rows are written one at a time instead and
+    the ones it refuses are recorded as errors, so one bad row doesn't lose the rest.
+    """
+    with transaction.atomic():
+        try:
+            create_books([entry for _, entry in rows], job.user)
+            job.books_created += len(rows)
+        except DatabaseError:
+            for row_number, entry in rows:
+                # the failed INSERT may have given the book an id that was rolled back
+                entry['book'].pk = None
+                try:
+                    create_books([entry], job.user)
+                    job.books_created += 1
+                except DatabaseError as error:
+                    record_error(job, row_number, "Could not save row: %s" %(first_line(error)))
+        save_progress(job)
+
+
+def run_import(job):
+    """
+    Import the rows of a claimed job that haven't been imported yet, a batch at a time.
+
+    Each batch is written in its own transaction along with the job's progress, so the
+    status endpoint can report on a running import. A row that can't be read or saved
+    is recorded in job.errors and skipped. However the import ends, the job is finished:
+    DONE, or FAILED if it couldn't be read or stopped on an unexpected error (which is
+    raised again once the job is saved).
+    """
+    rows = []
+    reclaimed = False
+    try:
+        # a job claimed again after its worker stopped skips the rows already imported
+        for row_number, row in itertools.islice(read_rows(job.source), job.rows_processed, None):
+            try:
+                rows.append((row_number, parse_row(row, job.user)))
+            except ValueError as error:
+                record_error(job, row_number, str(error))
+            job.rows_processed += 1
+
+            if len(rows) >= BATCH_SIZE:
+                import_batch(job, rows)
+                rows = []
+
+        if rows:
+            import_batch(job, rows)
+        job.status = ImportJob.DONE
+    except csv.Error as error:
+        job.errors.append({
+            "row": job.rows_processed + 1,
+            "error": "Could not read CSV: %s" %(error),
+        })
+        job.status = ImportJob.FAILED
+    except JobReclaimed:
+        # another worker has the job now and carries on from its last saved batch
+        reclaimed = True
+    except Exception as error:
+        job.errors.append({
+            "row": job.rows_processed + 1,
+            "error": "Import stopped: %s" %(first_line(error)),
+        })
+        raise
+    finally:
+        if not reclaimed:
+            if job.status == ImportJob.RUNNING:
+                job.status = ImportJob.FAILED
+            job.finished_at = timezone.now()
+            try:
+                save_progress(job, PROGRESS_FIELDS + ['status', 'finished_at'])
+            except JobReclaimed:
+                pass
+    return job
+
+
+def claim_next_job():
+    """
+    Mark the oldest waiting job as running and return it, or None if there are none.
+
+    A job is waiting if it is queued, or if it is running but its worker hasn't saved any
+    progress for settings.IMPORT_JOB_TIMEOUT seconds, because the worker died or was
+    restarted part way through; run_import then carries on where that worker stopped.
+
+    SKIP LOCKED lets several workers poll the same table without picking the same job.
+    """
+    now = timezone.now()
+    abandoned = now - datetime.timedelta(seconds=settings.IMPORT_JOB_TIMEOUT)
+    with transaction.atomic():
+        job = ImportJob.objects.select_for_update(skip_locked=True).filter(
+            Q(status=ImportJob.QUEUED) | Q(status=ImportJob.RUNNING, heartbeat_at__lt=abandoned)
+        ).order_by('id').first()
+        if job is not None:
+            job.status = ImportJob.RUNNING
+            if job.started_at is None:
+                job.started_at = now
+            job.heartbeat_at = now
+            job.save(update_fields=['status', 'started_at', 'heartbeat_at'])
+    return job
@@ -0,0 +1,116 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from api.benchmark import (
+    DEFAULT_MIX, ClientTarget, HttpTarget, Library,
+    parse_mix, run_benchmark, summarize, query_deltas, find_regressions,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Replay a mix of API requests at a fixed concurrency and report latency percentiles, "
+        "throughput and queries per request, optionally comparing them to a saved baseline"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--url',
+            help="base URL of a running server, like http://127.0.0.1:8000/; "
+                 "without it, requests go through the Django test client in this process")
+        parser.add_argument(
+            '--username', default='seed_1',
+            help="user whose library is benchmarked (see manage.py seed_library)")
+        parser.add_argument(
+            '--password', default='password')
+        parser.add_argument(
+            '--requests', type=int, default=500,
+            help="how many requests to send")
+        parser.add_argument(
+            '--concurrency', type=int, default=4,
+            help="how many requests are in flight at once")
+        parser.add_argument(
+            '--warmup', type=int, default=20,
+            help="requests sent first and left out of the results")
+        parser.add_argument(
+            '--mix', default=','.join("%s=%s" % (name, weight) for name, weight in DEFAULT_MIX.items()),
+            help="endpoints and their relative weights, like 'books=10,book=30'")
+        parser.add_argument(
+            '--seed', type=int, default=None,
+            help="random seed, for a repeatable sequence of requests")
+        parser.add_argument(
+            '--metrics-token',
+            help="METRICS_TOKEN of the server given by --url, to read its query counts")
+        parser.add_argument(
+            '--baseline',
+            help="JSON file from an earlier --save-baseline to compare against")
+        parser.add_argument(
+            '--tolerance', type=float, default=0.2,
+            help="how much slower (as a fraction) latency and throughput may get before they count as regressions")
+        parser.add_argument(
+            '--save-baseline',
+            help="write the results to this JSON file")
+
+    def handle(self, *args, **options):
+        try:
+            mix = parse_mix(options['mix'])
+        except ValueError as error:
+            raise CommandError(str(error))
+        if options['requests'] < 1 or options['concurrency'] < 1 or options['warmup'] < 0:
+            raise CommandError("--requests and --concurrency must be at least 1, and --warmup at least 0")
+
+        if options['url']:
+            target = HttpTarget(options['url'], options['metrics_token'])
+        else:
+            target = ClientTarget()
+
+        try:
+            library = Library(target, options['username'], options['password'])
+        except ValueError as error:
+            raise CommandError(str(error))
+
+        if options['warmup']:
+            run_benchmark(target, library, mix, options['warmup'], options['concurrency'], options['seed'])
+
+        before = target.query_totals()
+        results, elapsed = run_benchmark(
+            target, library, mix, options['requests'], options['concurrency'], options['seed'])
+        query_totals = query_deltas(before, target.query_totals())
+
+        summary = summarize(results, elapsed, query_totals)
+        summary['settings'] = {
+            'target': options['url'] or 'test client',
+            'username': options['username'],
+            'books': len(library.books),
+            'requests': options['requests'],
+            'concurrency': options['concurrency'],
+            'mix': mix,
+        }
+        self.print_summary(summary)
+
+        if options['save_baseline']:
+            with open(options['save_baseline'], 'w') as baseline_file:
+                json.dump(summary, baseline_file, indent=2, sort_keys=True)
+            self.stdout.write("saved results to %s" % (options['save_baseline']))
+
+        if options['baseline']:
+            with open(options['baseline']) as baseline_file:
+                baseline = json.load(baseline_file)
+            regressions = find_regressions(summary, baseline, options['tolerance'])
+            if regressions:
+                for regression in regressions:
+                    self.stderr.write("regression: %s" % (regression))
+                raise CommandError("%s regressions against %s" % (len(regressions), options['baseline']))
+            self.stdout.write(self.style.SUCCESS("no regressions against %s" % (options['baseline'])))
+
+    def print_summary(self, summary):
+        row = "%-12s %8s %8s %9s %9s %9s %8s %9s"
+        self.stdout.write(row % ('endpoint', 'requests', 'errors', 'p50 ms', 'p95 ms', 'p99 ms', 'req/s', 'queries'))
+
+        rows = sorted(summary['endpoints'].items()) + [('overall', summary['overall'])]
+        for name, endpoint in rows:
+            queries = endpoint.get('queries_per_request')
+            self.stdout.write(row % (
+                name, endpoint['requests'], endpoint['errors'], endpoint['p50_ms'], endpoint['p95_ms'],
+                endpoint['p99_ms'], endpoint['requests_per_second'], '-' if queries is None else queries))
@@ -0,0 +1,69 @@
+from django.apps import apps
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.renderers import JSONRenderer
+
+from api.benchmark import compare_rendering
+from api.fast_serializers import serialize_books, serialize_series, serialize_statuses
+from api.models import Book, Series, BookStatus
+from api.renderers import FastJSONRenderer
+
+
+class Command(BaseCommand):
+    help = (
+        "Time rendering a user's whole library with the DRF serializers and JSONRenderer "
+        "against the FAST_RENDERING path, and check that both produce the same bytes"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--username', default='seed_1',
+            help="user whose library is rendered (see manage.py seed_library)")
+        parser.add_argument(
+            '--repeat', type=int, default=5,
+            help="how many times each path is run; the fastest run is reported")
+
+    def handle(self, *args, **options):
+        if options['repeat'] < 1:
+            raise CommandError("--repeat must be at least 1")
+        User = apps.get_model('userauth', 'User')
+        try:
+            user = User.objects.get(username=options['username'])
+        except User.DoesNotExist:
+            raise CommandError("No user named '%s'" % (options['username']))
+
+        books = Book.objects.filter(user=user).order_by('id')
+        series = Series.objects.filter(user=user).order_by('id')
+        statuses = BookStatus.objects.filter(user=user).order_by('id')
+
+        # JSONRenderer().render is what the API used before FAST_RENDERING existed
+        drf_render = JSONRenderer().render
+        fast_render = FastJSONRenderer().render_fast
+        resources = {
+            'books': {
+                'serializers': (lambda: serialize_books(books, fast=False), drf_render),
+                'fast': (lambda: serialize_books(books, fast=True), fast_render),
+            },
+            'series': {
+                'serializers': (lambda: serialize_series(series, fast=False), drf_render),
+                'fast': (lambda: serialize_series(series, fast=True), fast_render),
+            },
+            'statuses': {
+                'serializers': (lambda: serialize_statuses(statuses, fast=False), drf_render),
+                'fast': (lambda: serialize_statuses(statuses, fast=True), fast_render),
+            },
+        }
+
+        mismatched = []
+        for resource, paths in resources.items():
+            results = compare_rendering(paths, options['repeat'])
+            self.stdout.write("%s (%s bytes)" % (resource, results['serializers']['bytes']))
+            for name, result in results.items():
+                self.stdout.write(
+                    "  %-12s build %9.2f ms  render %8.2f ms  total %9.2f ms  %5.1fx  %s" % (
+                        name, result['build_ms'], result['render_ms'], result['total_ms'], result['speedup'],
+                        "identical" if result['identical'] else "DIFFERENT"))
+                if not result['identical']:
+                    mismatched.append("%s %s" % (resource, name))
+
+        if mismatched:
+            raise CommandError("rendered differently from the serializers: %s" % (", ".join(mismatched)))
@@ -0,0 +1,48 @@
+from django.apps import apps
+from django.core.management.base import BaseCommand, CommandError
+
+from api.query_plans import analyze, check_query_plans
+
+
+class Command(BaseCommand):
+    help = (
+        "EXPLAIN the API's most frequent queries for a user's library, "
+        "and fail if any of them reads a whole table instead of using an index"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--username', default='seed_1',
+            help="user whose library the queries are run against (see manage.py seed_library)")
+        parser.add_argument(
+            '--analyze', action='store_true',
+            help="refresh the planner's statistics first, as after loading a lot of data")
+        parser.add_argument(
+            '--plans', action='store_true',
+            help="print every query's plan, not just the ones that scan a table")
+        parser.add_argument(
+            '--no-seqscan', action='store_true',
+            help="only fail when no index can answer a query, whatever the planner would prefer")
+
+    def handle(self, *args, **options):
+        User = apps.get_model('userauth', 'User')
+        try:
+            user = User.objects.get(username=options['username'])
+        except User.DoesNotExist:
+            raise CommandError("No user named '%s'" % (options['username']))
+
+        if options['analyze']:
+            analyze()
+
+        scanning = []
+        for name, plan, scanned in check_query_plans(user, seqscan=not options['no_seqscan']):
+            if scanned:
+                scanning.append(name)
+                self.stdout.write("%-22s SEQUENTIAL SCAN on %s" % (name, ", ".join(scanned)))
+            else:
+                self.stdout.write("%-22s ok" % (name))
+            if scanned or options['plans']:
+                self.stdout.write("    " + plan.replace("\n", "\n    "))
+
+        if scanning:
+            raise CommandError("answered with a sequential scan: %s" % (", ".join(scanning)))
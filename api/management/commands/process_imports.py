@@ -0,0 +1,37 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from api.importer import claim_next_job, run_import
+
+
+class Command(BaseCommand):
+    help = "Import queued CSV library exports, polling the ImportJob table for new ones"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--once', action='store_true',
+            help="process the jobs that are queued now, then exit")
+        parser.add_argument(
+            '--sleep', type=float, default=2.0,
+            help="seconds to wait between polls when the queue is empty")
+
+    def handle(self, *args, **options):
+        while True:
+            job = claim_next_job()
+
+            if job is None:
+                if options['once']:
+                    return
+                time.sleep(options['sleep'])
+                continue
+
+            self.stdout.write("importing job %s for user %s" % (job.id, job.user_id))
+            try:
+                run_import(job)
+            except Exception as error:
+                # the job has been marked as failed; keep the worker going for the rest
+                self.stderr.write("job %s stopped: %r" % (job.id, error))
+                continue
+            self.stdout.write("job %s %s: %s rows, %s books, %s failed" % (
+                job.id, job.get_status_display().lower(), job.rows_processed, job.books_created, job.rows_failed))
@@ -0,0 +1,84 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from api.seed import LibrarySeeder
+
+
+class Command(BaseCommand):
+    help = "Create users with large, realistic libraries for performance testing"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--users', type=int, default=10,
+            help="how many users to create")
+        parser.add_argument(
+            '--min-books', type=int, default=50,
+            help="the fewest books a user's library can have")
+        parser.add_argument(
+            '--max-books', type=int, default=2000,
+            help="the most books a user's library can have; sizes in between are log-uniform")
+        parser.add_argument(
+            '--authors', type=int, default=5000,
+            help="how many distinct author names to draw from")
+        parser.add_argument(
+            '--tags', type=int, default=300,
+            help="how many distinct (nested) tag names to draw from")
+        parser.add_argument(
+            '--zipf', type=float, default=1.1,
+            help="exponent of the Zipf distribution authors, tags and publishers are drawn from")
+        parser.add_argument(
+            '--series-fraction', type=float, default=0.25,
+            help="share of books that belong to a series")
+        parser.add_argument(
+            '--years', type=int, default=5,
+            help="how many years of reading history to spread statuses over")
+        parser.add_argument(
+            '--batch-size', type=int, default=5000,
+            help="books written per batch")
+        parser.add_argument(
+            '--seed', type=int, default=None,
+            help="random seed, for a repeatable dataset")
+        parser.add_argument(
+            '--prefix', default='seed',
+            help="usernames are <prefix>_<n>")
+        parser.add_argument(
+            '--password', default='password',
+            help="password given to every new user")
+
+    def handle(self, *args, **options):
+        if options['users'] < 1:
+            raise CommandError("--users must be at least 1")
+        if options['min_books'] < 0 or options['max_books'] < options['min_books']:
+            raise CommandError("--min-books must be at least 0 and no more than --max-books")
+        if options['authors'] < 1 or options['tags'] < 1 or options['batch_size'] < 1:
+            raise CommandError("--authors, --tags and --batch-size must be at least 1")
+        if not 0 <= options['series_fraction'] <= 1:
+            raise CommandError("--series-fraction must be between 0 and 1")
+
+        seeder = LibrarySeeder(
+            min_books=options['min_books'],
+            max_books=options['max_books'],
+            author_count=options['authors'],
+            tag_count=options['tags'],
+            zipf_exponent=options['zipf'],
+            series_fraction=options['series_fraction'],
+            years=options['years'],
+            batch_size=options['batch_size'],
+            seed=options['seed'])
+
+        start = time.perf_counter()
+        users = seeder.create_users(options['users'], prefix=options['prefix'], password=options['password'])
+
+        for user in users:
+            size = seeder.seed_library(user)
+            self.stdout.write("%s: %s books" % (user.username, size))
+
+        elapsed = time.perf_counter() - start
+        created = seeder.created
+        rows = sum(created.values())
+        self.stdout.write(self.style.SUCCESS(
+            "created %s users, %s books, %s authors, %s tags, %s statuses and %s series "
+            "(%s rows in %.1fs, %.0f rows/s)" % (
+                created['users'], created['books'], created['authors'], created['tags'],
+                created['statuses'], created['series'], rows, elapsed, rows / elapsed if elapsed else 0)))
@@ -0,0 +1,21 @@
+# Generated by Django 3.0.3 on 2026-10-18 02:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0022_book_rating'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='book',
+            index=models.Index(fields=['user', 'id'], name='book_user_id_index'),
+        ),
+        migrations.AddIndex(
+            model_name='book',
+            index=models.Index(fields=['user', 'current_status_date', 'id'], name='book_user_status_date_index'),
+        ),
+    ]
@@ -0,0 +1,126 @@
+# Generated by Django 3.0.3 on 2026-10-18 02:34
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.db import migrations
+
+
+# A book's search document: its title, then its authors and tags, then its description,
+# weighted in that order so that ts_rank puts title matches first.
+# Tag names are hierarchical (fiction__fantasy), so their parts are indexed as separate words.
+CREATE_SEARCH_DOCUMENT = """
+CREATE FUNCTION api_book_search_document(book_id integer, title text, description text)
+RETURNS tsvector AS $$
+    SELECT
+        setweight(to_tsvector('english', coalesce(title, '')), 'A') ||
+        setweight(to_tsvector('english', coalesce(
+            (SELECT string_agg(author_name, ' ') FROM api_bookauthor WHERE api_bookauthor.book_id = $1), ''
+        )), 'B') ||
+        setweight(to_tsvector('english', coalesce(
+            (SELECT string_agg(replace(tag_name, '__', ' '), ' ') FROM api_booktag WHERE api_booktag.book_id = $1), ''
+        )), 'B') ||
+        setweight(to_tsvector('english', coalesce(description, '')), 'C');
+$$ LANGUAGE sql STABLE;
+"""
+
+# Refresh a book's search_vector whenever its title or description is written.
+CREATE_BOOK_TRIGGER = """
+CREATE FUNCTION api_book_search_vector_trigger() RETURNS trigger AS $$
+BEGIN
+    NEW.search_vector := api_book_search_document(NEW.id, NEW.title, NEW.description);
+    RETURN NEW;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER api_book_search_vector_update
+    BEFORE INSERT OR UPDATE OF title, description ON api_book
+    FOR EACH ROW EXECUTE PROCEDURE api_book_search_vector_trigger();
+"""
+
+# Refresh the search_vector of every book whose authors or tags changed.
+# These are statement-level triggers reading the changed rows from transition tables,
+# so a bulk_create of thousands of authors re-indexes each book once, in one UPDATE.
+CREATE_RELATED_TRIGGERS = """
+CREATE FUNCTION api_book_search_refresh_new_rows() RETURNS trigger AS $$
+BEGIN
+    UPDATE api_book SET search_vector = api_book_search_document(id, title, description)
+    WHERE id IN (SELECT DISTINCT book_id FROM new_rows);
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE FUNCTION api_book_search_refresh_old_rows() RETURNS trigger AS $$
+BEGIN
+    UPDATE api_book SET search_vector = api_book_search_document(id, title, description)
+    WHERE id IN (SELECT DISTINCT book_id FROM old_rows);
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql;
+"""
+
+RELATED_TRIGGERS = """
+CREATE TRIGGER {table}_search_insert
+    AFTER INSERT ON {table} REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE PROCEDURE api_book_search_refresh_new_rows();
+
+CREATE TRIGGER {table}_search_update_new
+    AFTER UPDATE ON {table} REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE PROCEDURE api_book_search_refresh_new_rows();
+
+CREATE TRIGGER {table}_search_update_old
+    AFTER UPDATE ON {table} REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE PROCEDURE api_book_search_refresh_old_rows();
+
+CREATE TRIGGER {table}_search_delete
+    AFTER DELETE ON {table} REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE PROCEDURE api_book_search_refresh_old_rows();
+"""
+
+DROP_RELATED_TRIGGERS = """
+DROP TRIGGER {table}_search_insert ON {table};
+DROP TRIGGER {table}_search_update_new ON {table};
+DROP TRIGGER {table}_search_update_old ON {table};
+DROP TRIGGER {table}_search_delete ON {table};
+"""
+
+BACKFILL = """
+UPDATE api_book SET search_vector = api_book_search_document(id, title, description);
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0024_importjob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='book',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='book',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='book_search_vector_index'),
+        ),
+        migrations.RunSQL(
+            CREATE_SEARCH_DOCUMENT,
+            "DROP FUNCTION api_book_search_document(integer, text, text);",
+        ),
+        migrations.RunSQL(
+            CREATE_BOOK_TRIGGER,
+            "DROP TRIGGER api_book_search_vector_update ON api_book;"
+            "DROP FUNCTION api_book_search_vector_trigger();",
+        ),
+        migrations.RunSQL(
+            CREATE_RELATED_TRIGGERS +
+            RELATED_TRIGGERS.format(table='api_bookauthor') +
+            RELATED_TRIGGERS.format(table='api_booktag'),
+            DROP_RELATED_TRIGGERS.format(table='api_bookauthor') +
+            DROP_RELATED_TRIGGERS.format(table='api_booktag') +
+            "DROP FUNCTION api_book_search_refresh_new_rows();"
+            "DROP FUNCTION api_book_search_refresh_old_rows();",
+        ),
+        migrations.RunSQL(BACKFILL, migrations.RunSQL.noop),
+    ]
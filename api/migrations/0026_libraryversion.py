@@ -0,0 +1,88 @@
+# Generated by Django 3.0.3 on 2026-10-18 02:46
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+# the tables that make up a user's library; every one has a user_id column
+LIBRARY_TABLES = ['api_book', 'api_bookauthor', 'api_booktag', 'api_series', 'api_bookstatus']
+
+# Bump the library version of every user whose rows a statement touched.
+# clock_timestamp() rather than now(), which would be the start of the transaction.
+CREATE_BUMP_FUNCTIONS = """
+CREATE FUNCTION api_bump_library_version_new_rows() RETURNS trigger AS $$
+BEGIN
+    INSERT INTO api_libraryversion (user_id, version, updated_at)
+    SELECT user_id, 1, clock_timestamp() FROM (SELECT DISTINCT user_id FROM new_rows) AS users
+    ON CONFLICT (user_id) DO UPDATE
+        SET version = api_libraryversion.version + 1, updated_at = EXCLUDED.updated_at;
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE FUNCTION api_bump_library_version_old_rows() RETURNS trigger AS $$
+BEGIN
+    INSERT INTO api_libraryversion (user_id, version, updated_at)
+    SELECT user_id, 1, clock_timestamp() FROM (SELECT DISTINCT user_id FROM old_rows) AS users
+    ON CONFLICT (user_id) DO UPDATE
+        SET version = api_libraryversion.version + 1, updated_at = EXCLUDED.updated_at;
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql;
+"""
+
+# a row's user never changes, so UPDATE only needs to look at the new rows
+BUMP_TRIGGERS = """
+CREATE TRIGGER {table}_library_version_insert
+    AFTER INSERT ON {table} REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE PROCEDURE api_bump_library_version_new_rows();
+
+CREATE TRIGGER {table}_library_version_update
+    AFTER UPDATE ON {table} REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE PROCEDURE api_bump_library_version_new_rows();
+
+CREATE TRIGGER {table}_library_version_delete
+    AFTER DELETE ON {table} REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE PROCEDURE api_bump_library_version_old_rows();
+"""
+
+DROP_BUMP_TRIGGERS = """
+DROP TRIGGER {table}_library_version_insert ON {table};
+DROP TRIGGER {table}_library_version_update ON {table};
+DROP TRIGGER {table}_library_version_delete ON {table};
+"""
+
+# start every existing user at version 1
+BACKFILL = """
+INSERT INTO api_libraryversion (user_id, version, updated_at)
+SELECT id, 1, now() FROM userauth_user;
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('userauth', '0001_initial'),
+        ('api', '0025_book_search_vector'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LibraryVersion',
+            fields=[
+                ('user', models.OneToOneField(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, primary_key=True, related_name='library_version', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('version', models.BigIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+        ),
+        migrations.RunSQL(
+            CREATE_BUMP_FUNCTIONS +
+            ''.join(BUMP_TRIGGERS.format(table=table) for table in LIBRARY_TABLES),
+            ''.join(DROP_BUMP_TRIGGERS.format(table=table) for table in LIBRARY_TABLES) +
+            "DROP FUNCTION api_bump_library_version_new_rows();"
+            "DROP FUNCTION api_bump_library_version_old_rows();",
+        ),
+        migrations.RunSQL(BACKFILL, migrations.RunSQL.noop),
+    ]
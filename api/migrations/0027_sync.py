@@ -0,0 +1,173 @@
+# Generated by Django 3.0.3 on 2026-10-18 02:50
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+# Stamp every written book, series and status with the time of the write.
+# This also covers changes to a book's authors and tags: those re-index the book
+# for search (migration 0025), which is an UPDATE of its api_book row.
+CREATE_UPDATED_AT = """
+CREATE FUNCTION api_set_updated_at() RETURNS trigger AS $$
+BEGIN
+    NEW.updated_at := clock_timestamp();
+    RETURN NEW;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER api_book_updated_at BEFORE INSERT OR UPDATE ON api_book
+    FOR EACH ROW EXECUTE PROCEDURE api_set_updated_at();
+CREATE TRIGGER api_series_updated_at BEFORE INSERT OR UPDATE ON api_series
+    FOR EACH ROW EXECUTE PROCEDURE api_set_updated_at();
+CREATE TRIGGER api_bookstatus_updated_at BEFORE INSERT OR UPDATE ON api_bookstatus
+    FOR EACH ROW EXECUTE PROCEDURE api_set_updated_at();
+"""
+
+DROP_UPDATED_AT = """
+DROP TRIGGER api_book_updated_at ON api_book;
+DROP TRIGGER api_series_updated_at ON api_series;
+DROP TRIGGER api_bookstatus_updated_at ON api_bookstatus;
+DROP FUNCTION api_set_updated_at();
+"""
+
+# A series is serialized with the ids of its books, so it has changed whenever
+# a book joins or leaves it.
+CREATE_SERIES_MEMBERSHIP = """
+CREATE FUNCTION api_touch_series_of_new_rows() RETURNS trigger AS $$
+BEGIN
+    UPDATE api_series SET updated_at = clock_timestamp()
+    WHERE id IN (SELECT series_id FROM new_rows);
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE FUNCTION api_touch_series_of_old_rows() RETURNS trigger AS $$
+BEGIN
+    UPDATE api_series SET updated_at = clock_timestamp()
+    WHERE id IN (SELECT series_id FROM old_rows);
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE FUNCTION api_touch_series_of_moved_rows() RETURNS trigger AS $$
+BEGIN
+    UPDATE api_series SET updated_at = clock_timestamp()
+    WHERE id IN (
+        SELECT old_rows.series_id FROM old_rows JOIN new_rows ON new_rows.id = old_rows.id
+        WHERE old_rows.series_id IS DISTINCT FROM new_rows.series_id
+        UNION
+        SELECT new_rows.series_id FROM old_rows JOIN new_rows ON new_rows.id = old_rows.id
+        WHERE old_rows.series_id IS DISTINCT FROM new_rows.series_id
+    );
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER api_book_series_insert
+    AFTER INSERT ON api_book REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE PROCEDURE api_touch_series_of_new_rows();
+CREATE TRIGGER api_book_series_update
+    AFTER UPDATE ON api_book REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE PROCEDURE api_touch_series_of_moved_rows();
+CREATE TRIGGER api_book_series_delete
+    AFTER DELETE ON api_book REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE PROCEDURE api_touch_series_of_old_rows();
+"""
+
+DROP_SERIES_MEMBERSHIP = """
+DROP TRIGGER api_book_series_insert ON api_book;
+DROP TRIGGER api_book_series_update ON api_book;
+DROP TRIGGER api_book_series_delete ON api_book;
+DROP FUNCTION api_touch_series_of_new_rows();
+DROP FUNCTION api_touch_series_of_old_rows();
+DROP FUNCTION api_touch_series_of_moved_rows();
+"""
+
+# Leave a tombstone for every deleted book, series and status.
+CREATE_TOMBSTONES = """
+CREATE FUNCTION api_bury_old_rows() RETURNS trigger AS $$
+BEGIN
+    INSERT INTO api_tombstone (user_id, kind, object_id, deleted_at)
+    SELECT user_id, TG_ARGV[0], id, clock_timestamp() FROM old_rows;
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER api_book_tombstone
+    AFTER DELETE ON api_book REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE PROCEDURE api_bury_old_rows('book');
+CREATE TRIGGER api_series_tombstone
+    AFTER DELETE ON api_series REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE PROCEDURE api_bury_old_rows('series');
+CREATE TRIGGER api_bookstatus_tombstone
+    AFTER DELETE ON api_bookstatus REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE PROCEDURE api_bury_old_rows('status');
+"""
+
+DROP_TOMBSTONES = """
+DROP TRIGGER api_book_tombstone ON api_book;
+DROP TRIGGER api_series_tombstone ON api_series;
+DROP TRIGGER api_bookstatus_tombstone ON api_bookstatus;
+DROP FUNCTION api_bury_old_rows();
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('api', '0026_libraryversion'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Tombstone',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('book', 'Book'), ('series', 'Series'), ('status', 'Status')], max_length=6)),
+                ('object_id', models.IntegerField()),
+                ('deleted_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='book',
+            name='updated_at',
+            field=models.DateTimeField(default=django.utils.timezone.now, editable=False),
+        ),
+        migrations.AddField(
+            model_name='bookstatus',
+            name='updated_at',
+            field=models.DateTimeField(default=django.utils.timezone.now, editable=False),
+        ),
+        migrations.AddField(
+            model_name='series',
+            name='updated_at',
+            field=models.DateTimeField(default=django.utils.timezone.now, editable=False),
+        ),
+        migrations.AddIndex(
+            model_name='book',
+            index=models.Index(fields=['user', 'updated_at'], name='book_user_updated_at_index'),
+        ),
+        migrations.AddIndex(
+            model_name='bookstatus',
+            index=models.Index(fields=['user', 'updated_at'], name='status_user_updated_at_index'),
+        ),
+        migrations.AddIndex(
+            model_name='series',
+            index=models.Index(fields=['user', 'updated_at'], name='series_user_updated_at_index'),
+        ),
+        migrations.AddField(
+            model_name='tombstone',
+            name='user',
+            field=models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddIndex(
+            model_name='tombstone',
+            index=models.Index(fields=['user', 'deleted_at'], name='tombstone_user_deleted_index'),
+        ),
+        migrations.RunSQL(CREATE_UPDATED_AT, DROP_UPDATED_AT),
+        migrations.RunSQL(CREATE_SERIES_MEMBERSHIP, DROP_SERIES_MEMBERSHIP),
+        migrations.RunSQL(CREATE_TOMBSTONES, DROP_TOMBSTONES),
+    ]
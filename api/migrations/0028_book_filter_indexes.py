@@ -0,0 +1,37 @@
+# Generated by Django 3.0.3 on 2026-10-18 03:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0027_sync'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='book',
+            index=models.Index(fields=['user', 'title', 'id'], name='book_user_title_index'),
+        ),
+        migrations.AddIndex(
+            model_name='book',
+            index=models.Index(fields=['user', 'rating', 'id'], name='book_user_rating_index'),
+        ),
+        migrations.AddIndex(
+            model_name='book',
+            index=models.Index(fields=['user', 'position_in_series', 'id'], name='book_user_position_index'),
+        ),
+        migrations.AddIndex(
+            model_name='book',
+            index=models.Index(fields=['user', 'current_status', 'current_status_date'], name='book_user_status_index'),
+        ),
+        migrations.AddIndex(
+            model_name='bookauthor',
+            index=models.Index(fields=['user', 'author_name', 'book'], name='author_user_name_book_index'),
+        ),
+        migrations.AddIndex(
+            model_name='booktag',
+            index=models.Index(fields=['user', 'tag_name', 'book'], name='tag_user_name_book_index', opclasses=['int4_ops', 'varchar_pattern_ops', 'int4_ops']),
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 3.0.3 on 2026-10-18 03:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0028_book_filter_indexes'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='bookauthor',
+            name='author_name_index',
+        ),
+        migrations.RemoveIndex(
+            model_name='bookstatus',
+            name='status_code_index',
+        ),
+        migrations.RemoveIndex(
+            model_name='booktag',
+            name='tag_name_index',
+        ),
+        migrations.AddIndex(
+            model_name='book',
+            index=models.Index(fields=['user', 'series', 'position_in_series'], name='book_user_series_index'),
+        ),
+        migrations.AddIndex(
+            model_name='bookstatus',
+            index=models.Index(fields=['user', 'book', 'date'], name='status_user_book_date_index'),
+        ),
+        migrations.AddIndex(
+            model_name='booktag',
+            index=models.Index(fields=['user', 'tag_name'], name='tag_user_name_index'),
+        ),
+    ]
@@ -0,0 +1,171 @@
+# Generated by Django 3.0.3 on 2026-10-18 03:40
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+TAG_SEPARATOR = '__'
+
+
+def tag_ancestor_names(name):
+    # a copy of api.models.tag_ancestor_names as it was when this migration was written
+    parts = name.split(TAG_SEPARATOR)
+    ancestors = [TAG_SEPARATOR.join(parts[:end]) for end in range(1, len(parts))]
+    return [ancestor for ancestor in ancestors if ancestor]
+
+
+def create_tags(apps, schema_editor):
+    """ a Tag for every tag name in use, and every name it is nested under """
+    Tag = apps.get_model('api', 'Tag')
+    BookTag = apps.get_model('api', 'BookTag')
+
+    wanted = set()
+    for user_id, name in BookTag.objects.values_list('user_id', 'tag_name').distinct().iterator():
+        wanted.add((user_id, name))
+        wanted.update((user_id, ancestor) for ancestor in tag_ancestor_names(name))
+
+    # every user's tags one level of nesting at a time, so that each parent has its id first
+    levels = {}
+    for user_id, name in wanted:
+        levels.setdefault(len(tag_ancestor_names(name)), []).append((user_id, name))
+
+    tag_ids = {}
+    for depth in sorted(levels):
+        new_tags = [
+            Tag(user_id=user_id, name=name, parent_id=tag_ids.get((user_id, (tag_ancestor_names(name) or [None])[-1])))
+            for user_id, name in levels[depth]
+        ]
+        for tag in Tag.objects.bulk_create(new_tags, batch_size=1000):
+            tag_ids[(tag.user_id, tag.name)] = tag.id
+
+
+LINK_BOOK_TAGS = """
+UPDATE api_booktag SET tag_id = api_tag.id
+FROM api_tag
+WHERE api_tag.user_id = api_booktag.user_id AND api_tag.name = api_booktag.tag_name;
+"""
+
+UNLINK_BOOK_TAGS = """
+UPDATE api_booktag SET tag_name = api_tag.name
+FROM api_tag
+WHERE api_tag.id = api_booktag.tag_id;
+"""
+
+# api_book_search_document (migration 0025), reading tag names from api_tag
+SEARCH_DOCUMENT = """
+CREATE OR REPLACE FUNCTION api_book_search_document(book_id integer, title text, description text)
+RETURNS tsvector AS $$
+    SELECT
+        setweight(to_tsvector('english', coalesce(title, '')), 'A') ||
+        setweight(to_tsvector('english', coalesce(
+            (SELECT string_agg(author_name, ' ') FROM api_bookauthor WHERE api_bookauthor.book_id = $1), ''
+        )), 'B') ||
+        setweight(to_tsvector('english', coalesce(
+            (SELECT string_agg(replace(api_tag.name, '__', ' '), ' ')
+             FROM api_booktag JOIN api_tag ON api_tag.id = api_booktag.tag_id
+             WHERE api_booktag.book_id = $1), ''
+        )), 'B') ||
+        setweight(to_tsvector('english', coalesce(description, '')), 'C');
+$$ LANGUAGE sql STABLE;
+"""
+
+OLD_SEARCH_DOCUMENT = """
+CREATE OR REPLACE FUNCTION api_book_search_document(book_id integer, title text, description text)
+RETURNS tsvector AS $$
+    SELECT
+        setweight(to_tsvector('english', coalesce(title, '')), 'A') ||
+        setweight(to_tsvector('english', coalesce(
+            (SELECT string_agg(author_name, ' ') FROM api_bookauthor WHERE api_bookauthor.book_id = $1), ''
+        )), 'B') ||
+        setweight(to_tsvector('english', coalesce(
+            (SELECT string_agg(replace(tag_name, '__', ' '), ' ') FROM api_booktag WHERE api_booktag.book_id = $1), ''
+        )), 'B') ||
+        setweight(to_tsvector('english', coalesce(description, '')), 'C');
+$$ LANGUAGE sql STABLE;
+"""
+
+# Renaming a tag changes every book that has it: refresh their search_vector, which also
+# sets their updated_at (migration 0027) and bumps their user's library version (migration 0026),
+# so the book cache, conditional GETs and sync all see the new name.
+CREATE_RENAME_TRIGGER = """
+CREATE FUNCTION api_tag_renamed() RETURNS trigger AS $$
+BEGIN
+    UPDATE api_book SET search_vector = api_book_search_document(id, title, description)
+    WHERE id IN (
+        SELECT api_booktag.book_id FROM api_booktag
+        JOIN new_rows ON new_rows.id = api_booktag.tag_id
+        JOIN old_rows ON old_rows.id = new_rows.id
+        WHERE old_rows.name <> new_rows.name
+    );
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER api_tag_rename
+    AFTER UPDATE ON api_tag REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE PROCEDURE api_tag_renamed();
+"""
+
+DROP_RENAME_TRIGGER = """
+DROP TRIGGER api_tag_rename ON api_tag;
+DROP FUNCTION api_tag_renamed();
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('api', '0029_per_user_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Tag',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=255)),
+                ('parent', models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='children', to='api.Tag')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='booktag',
+            name='tag',
+            field=models.ForeignKey(db_index=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='book_tags', to='api.Tag'),
+        ),
+        migrations.RunPython(create_tags, migrations.RunPython.noop),
+        migrations.RunSQL(LINK_BOOK_TAGS, UNLINK_BOOK_TAGS),
+        migrations.RunSQL(SEARCH_DOCUMENT, OLD_SEARCH_DOCUMENT),
+        migrations.RemoveIndex(
+            model_name='booktag',
+            name='tag_user_name_book_index',
+        ),
+        migrations.RemoveIndex(
+            model_name='booktag',
+            name='tag_user_name_index',
+        ),
+        migrations.RemoveField(
+            model_name='booktag',
+            name='tag_name',
+        ),
+        migrations.AlterField(
+            model_name='booktag',
+            name='tag',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='book_tags', to='api.Tag'),
+        ),
+        migrations.AddIndex(
+            model_name='booktag',
+            index=models.Index(fields=['tag', 'book'], name='booktag_tag_book_index'),
+        ),
+        migrations.AddIndex(
+            model_name='tag',
+            index=models.Index(fields=['user', 'name'], name='tag_user_name_pattern_index', opclasses=['int4_ops', 'varchar_pattern_ops']),
+        ),
+        migrations.AddConstraint(
+            model_name='tag',
+            constraint=models.UniqueConstraint(fields=['user', 'name'], name='tag_user_name_unique'),
+        ),
+        migrations.RunSQL(CREATE_RENAME_TRIGGER, DROP_RENAME_TRIGGER),
+    ]
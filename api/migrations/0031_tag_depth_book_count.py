@@ -0,0 +1,143 @@
+# Generated by Django 3.0.3 on 2026-10-18 05:10
+
+from django.db import migrations, models
+
+
+# every tag's depth from its chain of parents, counting down from the top-level tags
+SET_DEPTHS = """
+WITH RECURSIVE depths(id, depth) AS (
+    SELECT id, 0 FROM api_tag WHERE parent_id IS NULL
+    UNION ALL
+    SELECT api_tag.id, depths.depth + 1 FROM api_tag JOIN depths ON api_tag.parent_id = depths.id
+)
+UPDATE api_tag SET depth = depths.depth
+FROM depths
+WHERE depths.id = api_tag.id AND depths.depth > 0;
+"""
+
+# A tag's book_count is the number of books that have it or any tag nested under it, each
+# counted once, so a book tagged both fiction and fiction__fantasy is one book of fiction.
+# Whenever books gain or lose tags, or a tag moves to a different parent, the tags involved
+# and every tag they are nested under are recounted, one statement at a time.
+CREATE_BOOK_COUNTS = """
+CREATE FUNCTION api_tag_subtree_book_count(integer) RETURNS integer AS $$
+    WITH RECURSIVE subtree(id) AS (
+        SELECT $1
+        UNION ALL
+        SELECT api_tag.id FROM api_tag JOIN subtree ON api_tag.parent_id = subtree.id
+    )
+    SELECT count(DISTINCT book_id)::integer FROM api_booktag
+    WHERE tag_id IN (SELECT id FROM subtree);
+$$ LANGUAGE sql STABLE;
+
+CREATE FUNCTION api_tag_count_books(tag_ids integer[]) RETURNS void AS $$
+BEGIN
+    -- recounting updates api_tag, which runs api_tag_count_moved_books again; with nothing
+    -- to count it must stop there
+    IF cardinality(tag_ids) = 0 THEN
+        RETURN;
+    END IF;
+    WITH RECURSIVE counted(id, parent_id) AS (
+        SELECT id, parent_id FROM api_tag WHERE id = ANY(tag_ids)
+        UNION
+        SELECT api_tag.id, api_tag.parent_id FROM api_tag JOIN counted ON api_tag.id = counted.parent_id
+    )
+    UPDATE api_tag SET book_count = api_tag_subtree_book_count(api_tag.id)
+    WHERE api_tag.id IN (SELECT id FROM counted);
+END
+$$ LANGUAGE plpgsql;
+
+CREATE FUNCTION api_tag_count_books_of_new_rows() RETURNS trigger AS $$
+BEGIN
+    PERFORM api_tag_count_books(ARRAY(SELECT DISTINCT tag_id FROM new_rows));
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE FUNCTION api_tag_count_books_of_old_rows() RETURNS trigger AS $$
+BEGIN
+    PERFORM api_tag_count_books(ARRAY(SELECT DISTINCT tag_id FROM old_rows));
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE FUNCTION api_tag_count_books_of_moved_rows() RETURNS trigger AS $$
+BEGIN
+    PERFORM api_tag_count_books(ARRAY(
+        SELECT old_rows.tag_id FROM old_rows JOIN new_rows ON new_rows.id = old_rows.id
+        WHERE old_rows.tag_id <> new_rows.tag_id
+        UNION
+        SELECT new_rows.tag_id FROM old_rows JOIN new_rows ON new_rows.id = old_rows.id
+        WHERE old_rows.tag_id <> new_rows.tag_id
+    ));
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE FUNCTION api_tag_count_moved_books() RETURNS trigger AS $$
+BEGIN
+    -- a tag given a new parent leaves the counts of its old ancestors for those of its new ones
+    PERFORM api_tag_count_books(ARRAY(
+        SELECT old_rows.parent_id FROM old_rows JOIN new_rows ON new_rows.id = old_rows.id
+        WHERE old_rows.parent_id IS DISTINCT FROM new_rows.parent_id AND old_rows.parent_id IS NOT NULL
+        UNION
+        SELECT new_rows.parent_id FROM old_rows JOIN new_rows ON new_rows.id = old_rows.id
+        WHERE old_rows.parent_id IS DISTINCT FROM new_rows.parent_id AND new_rows.parent_id IS NOT NULL
+    ));
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER api_booktag_count_insert
+    AFTER INSERT ON api_booktag REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE PROCEDURE api_tag_count_books_of_new_rows();
+CREATE TRIGGER api_booktag_count_update
+    AFTER UPDATE ON api_booktag REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE PROCEDURE api_tag_count_books_of_moved_rows();
+CREATE TRIGGER api_booktag_count_delete
+    AFTER DELETE ON api_booktag REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE PROCEDURE api_tag_count_books_of_old_rows();
+CREATE TRIGGER api_tag_count_move
+    AFTER UPDATE ON api_tag REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE PROCEDURE api_tag_count_moved_books();
+"""
+
+DROP_BOOK_COUNTS = """
+DROP TRIGGER api_booktag_count_insert ON api_booktag;
+DROP TRIGGER api_booktag_count_update ON api_booktag;
+DROP TRIGGER api_booktag_count_delete ON api_booktag;
+DROP TRIGGER api_tag_count_move ON api_tag;
+DROP FUNCTION api_tag_count_books_of_new_rows();
+DROP FUNCTION api_tag_count_books_of_old_rows();
+DROP FUNCTION api_tag_count_books_of_moved_rows();
+DROP FUNCTION api_tag_count_moved_books();
+DROP FUNCTION api_tag_count_books(integer[]);
+DROP FUNCTION api_tag_subtree_book_count(integer);
+"""
+
+COUNT_BOOKS = """
+UPDATE api_tag SET book_count = api_tag_subtree_book_count(id);
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0030_tag'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='tag',
+            name='depth',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='tag',
+            name='book_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunSQL(SET_DEPTHS, migrations.RunSQL.noop),
+        migrations.RunSQL(CREATE_BOOK_COUNTS, DROP_BOOK_COUNTS),
+        migrations.RunSQL(COUNT_BOOKS, migrations.RunSQL.noop),
+    ]
@@ -0,0 +1,200 @@
+# Generated by Django 3.0.3 on 2026-10-18 06:20
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+from psycopg2.extras import execute_values
+
+
+def author_key(name):
+    # a copy of api.models.author_key as it was when this migration was written
+    return ' '.join(name.split()).casefold()
+
+
+def create_authors(apps, schema_editor):
+    """
+    An Author for every name in use, with the names that differ only in case or spacing
+    made one author (named as the earliest of them was written), and every BookAuthor
+    pointed at its author.
+    """
+    Author = apps.get_model('api', 'Author')
+    BookAuthor = apps.get_model('api', 'BookAuthor')
+
+    authors = {}
+    names = {}
+    rows = BookAuthor.objects.order_by('id').values_list('user_id', 'author_name')
+    for user_id, name in rows.iterator():
+        if (user_id, name) not in names:
+            key = author_key(name)
+            authors.setdefault((user_id, key), name)
+            names[(user_id, name)] = key
+
+    author_ids = {}
+    new_authors = [Author(user_id=user_id, key=key, name=name) for (user_id, key), name in authors.items()]
+    for author in Author.objects.bulk_create(new_authors, batch_size=1000):
+        author_ids[(author.user_id, author.key)] = author.id
+
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(
+            "CREATE TEMPORARY TABLE api_author_names "
+            "(user_id integer, author_name varchar(255), author_id integer) ON COMMIT DROP")
+        execute_values(
+            cursor, "INSERT INTO api_author_names VALUES %s",
+            [(user_id, name, author_ids[(user_id, key)]) for (user_id, name), key in names.items()],
+            page_size=1000)
+        cursor.execute("CREATE INDEX ON api_author_names (user_id, author_name)")
+        cursor.execute(LINK_BOOK_AUTHORS)
+
+
+# One UPDATE, so the search and library version triggers run once: every row gets its author,
+# and its position among the book's authors in the order they were added. A second row for
+# the same author of the same book is left without one, and deleted.
+LINK_BOOK_AUTHORS = """
+WITH linked AS (
+    SELECT api_bookauthor.id, api_bookauthor.book_id, api_author_names.author_id,
+           row_number() OVER (
+               PARTITION BY api_bookauthor.book_id, api_author_names.author_id
+               ORDER BY api_bookauthor.id
+           ) AS copy
+    FROM api_bookauthor
+    JOIN api_author_names ON api_author_names.user_id = api_bookauthor.user_id
+        AND api_author_names.author_name = api_bookauthor.author_name
+), positioned AS (
+    SELECT id, author_id, row_number() OVER (PARTITION BY book_id ORDER BY id) - 1 AS position
+    FROM linked
+    WHERE copy = 1
+)
+UPDATE api_bookauthor SET author_id = positioned.author_id, position = positioned.position
+FROM positioned
+WHERE positioned.id = api_bookauthor.id;
+
+DELETE FROM api_bookauthor WHERE author_id IS NULL;
+"""
+
+UNLINK_BOOK_AUTHORS = """
+UPDATE api_bookauthor SET author_name = api_author.name
+FROM api_author
+WHERE api_author.id = api_bookauthor.author_id;
+"""
+
+# api_book_search_document (migrations 0025 and 0030), reading author names from api_author
+SEARCH_DOCUMENT = """
+CREATE OR REPLACE FUNCTION api_book_search_document(book_id integer, title text, description text)
+RETURNS tsvector AS $$
+    SELECT
+        setweight(to_tsvector('english', coalesce(title, '')), 'A') ||
+        setweight(to_tsvector('english', coalesce(
+            (SELECT string_agg(api_author.name, ' ')
+             FROM api_bookauthor JOIN api_author ON api_author.id = api_bookauthor.author_id
+             WHERE api_bookauthor.book_id = $1), ''
+        )), 'B') ||
+        setweight(to_tsvector('english', coalesce(
+            (SELECT string_agg(replace(api_tag.name, '__', ' '), ' ')
+             FROM api_booktag JOIN api_tag ON api_tag.id = api_booktag.tag_id
+             WHERE api_booktag.book_id = $1), ''
+        )), 'B') ||
+        setweight(to_tsvector('english', coalesce(description, '')), 'C');
+$$ LANGUAGE sql STABLE;
+"""
+
+OLD_SEARCH_DOCUMENT = """
+CREATE OR REPLACE FUNCTION api_book_search_document(book_id integer, title text, description text)
+RETURNS tsvector AS $$
+    SELECT
+        setweight(to_tsvector('english', coalesce(title, '')), 'A') ||
+        setweight(to_tsvector('english', coalesce(
+            (SELECT string_agg(author_name, ' ') FROM api_bookauthor WHERE api_bookauthor.book_id = $1), ''
+        )), 'B') ||
+        setweight(to_tsvector('english', coalesce(
+            (SELECT string_agg(replace(api_tag.name, '__', ' '), ' ')
+             FROM api_booktag JOIN api_tag ON api_tag.id = api_booktag.tag_id
+             WHERE api_booktag.book_id = $1), ''
+        )), 'B') ||
+        setweight(to_tsvector('english', coalesce(description, '')), 'C');
+$$ LANGUAGE sql STABLE;
+"""
+
+# As for tags (migration 0030): renaming an author re-indexes the books they wrote, which also
+# sets their updated_at and bumps their user's library version.
+CREATE_RENAME_TRIGGER = """
+CREATE FUNCTION api_author_renamed() RETURNS trigger AS $$
+BEGIN
+    UPDATE api_book SET search_vector = api_book_search_document(id, title, description)
+    WHERE id IN (
+        SELECT api_bookauthor.book_id FROM api_bookauthor
+        JOIN new_rows ON new_rows.id = api_bookauthor.author_id
+        JOIN old_rows ON old_rows.id = new_rows.id
+        WHERE old_rows.name <> new_rows.name
+    );
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER api_author_rename
+    AFTER UPDATE ON api_author REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE PROCEDURE api_author_renamed();
+"""
+
+DROP_RENAME_TRIGGER = """
+DROP TRIGGER api_author_rename ON api_author;
+DROP FUNCTION api_author_renamed();
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('api', '0031_tag_depth_book_count'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Author',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=255)),
+                ('key', models.CharField(max_length=255)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='bookauthor',
+            name='author',
+            field=models.ForeignKey(db_index=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='book_authors', to='api.Author'),
+        ),
+        migrations.AddField(
+            model_name='bookauthor',
+            name='position',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+        migrations.RunPython(create_authors, migrations.RunPython.noop),
+        migrations.RunSQL(migrations.RunSQL.noop, UNLINK_BOOK_AUTHORS),
+        migrations.RunSQL(SEARCH_DOCUMENT, OLD_SEARCH_DOCUMENT),
+        migrations.RemoveIndex(
+            model_name='bookauthor',
+            name='author_user_name_book_index',
+        ),
+        migrations.RemoveField(
+            model_name='bookauthor',
+            name='author_name',
+        ),
+        migrations.AlterField(
+            model_name='bookauthor',
+            name='author',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='book_authors', to='api.Author'),
+        ),
+        migrations.AddIndex(
+            model_name='bookauthor',
+            index=models.Index(fields=['author', 'book'], name='bookauthor_author_book_index'),
+        ),
+        migrations.AddIndex(
+            model_name='author',
+            index=models.Index(fields=['user', 'name'], name='author_user_name_index'),
+        ),
+        migrations.AddConstraint(
+            model_name='author',
+            constraint=models.UniqueConstraint(fields=['user', 'key'], name='author_user_key_unique'),
+        ),
+        migrations.RunSQL(CREATE_RENAME_TRIGGER, DROP_RENAME_TRIGGER),
+    ]
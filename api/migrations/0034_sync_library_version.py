@@ -0,0 +1,162 @@
+# Generated by Django 3.0.3 on 2026-10-18 08:15
+
+from django.db import migrations, models
+
+
+# A write stamps each row with the library version it brings the user to. Reading the
+# version locks the user's LibraryVersion row, which the version bump (migration 0026)
+# would lock anyway, so it is held from the transaction's first write until it commits:
+# writes to one library commit in the order of their versions, and a sync that reads
+# version N can be sure that every change not yet committed will be stamped after N.
+# The statement-level bump that follows adds one, so the stamp is the version plus one.
+CREATE_NEXT_VERSION = """
+CREATE FUNCTION api_next_library_version(integer) RETURNS bigint AS $$
+DECLARE
+    next_version bigint;
+BEGIN
+    SELECT version + 1 INTO next_version FROM api_libraryversion WHERE user_id = $1 FOR UPDATE;
+    IF next_version IS NULL THEN
+        -- the user's first write: the bump that follows makes this version 1
+        INSERT INTO api_libraryversion (user_id, version, updated_at) VALUES ($1, 0, clock_timestamp())
+        ON CONFLICT (user_id) DO NOTHING;
+        SELECT version + 1 INTO next_version FROM api_libraryversion WHERE user_id = $1 FOR UPDATE;
+    END IF;
+    RETURN next_version;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION api_set_updated_at() RETURNS trigger AS $$
+BEGIN
+    NEW.updated_at := clock_timestamp();
+    NEW.library_version := api_next_library_version(NEW.user_id);
+    RETURN NEW;
+END
+$$ LANGUAGE plpgsql;
+"""
+
+DROP_NEXT_VERSION = """
+CREATE OR REPLACE FUNCTION api_set_updated_at() RETURNS trigger AS $$
+BEGIN
+    NEW.updated_at := clock_timestamp();
+    RETURN NEW;
+END
+$$ LANGUAGE plpgsql;
+
+DROP FUNCTION api_next_library_version(integer);
+"""
+
+# Tombstones are stamped the same way. Row-level AFTER triggers run before the statement's
+# version bump, so these are written one row at a time rather than from the statement's
+# old rows as before (migration 0027).
+CREATE_TOMBSTONES = """
+DROP TRIGGER api_book_tombstone ON api_book;
+DROP TRIGGER api_series_tombstone ON api_series;
+DROP TRIGGER api_bookstatus_tombstone ON api_bookstatus;
+DROP FUNCTION api_bury_old_rows();
+
+CREATE FUNCTION api_bury_old_row() RETURNS trigger AS $$
+BEGIN
+    INSERT INTO api_tombstone (user_id, kind, object_id, deleted_at, library_version)
+    VALUES (OLD.user_id, TG_ARGV[0], OLD.id, clock_timestamp(), api_next_library_version(OLD.user_id));
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER api_book_tombstone AFTER DELETE ON api_book
+    FOR EACH ROW EXECUTE PROCEDURE api_bury_old_row('book');
+CREATE TRIGGER api_series_tombstone AFTER DELETE ON api_series
+    FOR EACH ROW EXECUTE PROCEDURE api_bury_old_row('series');
+CREATE TRIGGER api_bookstatus_tombstone AFTER DELETE ON api_bookstatus
+    FOR EACH ROW EXECUTE PROCEDURE api_bury_old_row('status');
+"""
+
+DROP_TOMBSTONES = """
+DROP TRIGGER api_book_tombstone ON api_book;
+DROP TRIGGER api_series_tombstone ON api_series;
+DROP TRIGGER api_bookstatus_tombstone ON api_bookstatus;
+DROP FUNCTION api_bury_old_row();
+
+CREATE FUNCTION api_bury_old_rows() RETURNS trigger AS $$
+BEGIN
+    INSERT INTO api_tombstone (user_id, kind, object_id, deleted_at)
+    SELECT user_id, TG_ARGV[0], id, clock_timestamp() FROM old_rows;
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER api_book_tombstone
+    AFTER DELETE ON api_book REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE PROCEDURE api_bury_old_rows('book');
+CREATE TRIGGER api_series_tombstone
+    AFTER DELETE ON api_series REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE PROCEDURE api_bury_old_rows('series');
+CREATE TRIGGER api_bookstatus_tombstone
+    AFTER DELETE ON api_bookstatus REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE PROCEDURE api_bury_old_rows('status');
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0033_importjob_heartbeat_at'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='book',
+            name='book_user_updated_at_index',
+        ),
+        migrations.RemoveIndex(
+            model_name='bookstatus',
+            name='status_user_updated_at_index',
+        ),
+        migrations.RemoveIndex(
+            model_name='series',
+            name='series_user_updated_at_index',
+        ),
+        migrations.RemoveIndex(
+            model_name='tombstone',
+            name='tombstone_user_deleted_index',
+        ),
+        migrations.AddField(
+            model_name='book',
+            name='library_version',
+            field=models.BigIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='bookstatus',
+            name='library_version',
+            field=models.BigIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='series',
+            name='library_version',
+            field=models.BigIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='tombstone',
+            name='library_version',
+            field=models.BigIntegerField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name='book',
+            index=models.Index(fields=['user', 'library_version'], name='book_user_version_index'),
+        ),
+        migrations.AddIndex(
+            model_name='bookstatus',
+            index=models.Index(fields=['user', 'library_version'], name='status_user_version_index'),
+        ),
+        migrations.AddIndex(
+            model_name='series',
+            index=models.Index(fields=['user', 'library_version'], name='series_user_version_index'),
+        ),
+        migrations.AddIndex(
+            model_name='tombstone',
+            index=models.Index(fields=['user', 'library_version'], name='tombstone_user_version_index'),
+        ),
+        # rows written before this migration keep version 0: every client's next sync
+        # is a full one, since their cursors have no version
+        migrations.RunSQL(CREATE_NEXT_VERSION, DROP_NEXT_VERSION),
+        migrations.RunSQL(CREATE_TOMBSTONES, DROP_TOMBSTONES),
+    ]
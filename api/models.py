@@ -1,5 +1,10 @@
+import itertools
+
 from django.db import models
 import django.utils.timezone
+from django.contrib.postgres.fields import JSONField
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
 
 # Create your models here.
 class Book(models.Model):
@@ -57,20 +62,128 @@ class Book(models.Model):
         default=UNRATED
     )
 
+    # the book's title, authors, tags and description, ready for full-text search.
+    # this is kept up to date by database triggers (see migration 0025), not by Django
+    search_vector = SearchVectorField(null=True, editable=False)
+
+    # when the book, its authors or its tags last changed, and the user's library version
+    # that change was written at (for GET sync/, see api/sync.py).
+    # set by a database trigger (see migrations 0027 and 0034) on every write, including bulk ones
+    updated_at = models.DateTimeField(default=django.utils.timezone.now, editable=False)
+    library_version = models.BigIntegerField(default=0, editable=False)
+
     def __str__(self):
         return self.title
 
+    class Meta:
+        indexes = [
+            # keyset pagination of a user's books
+            models.Index(fields=['user', 'id'], name='book_user_id_index'),
+            models.Index(fields=['user', 'current_status_date', 'id'], name='book_user_status_date_index'),
+            # full-text search
+            GinIndex(fields=['search_vector'], name='book_search_vector_index'),
+            # delta sync
+            models.Index(fields=['user', 'library_version'], name='book_user_version_index'),
+            # sorting a user's books (see api/pagination.py)
+            models.Index(fields=['user', 'title', 'id'], name='book_user_title_index'),
+            models.Index(fields=['user', 'rating', 'id'], name='book_user_rating_index'),
+            models.Index(fields=['user', 'position_in_series', 'id'], name='book_user_position_index'),
+            # filtering a user's books by status, and by when it was set (see api/filters.py)
+            models.Index(fields=['user', 'current_status', 'current_status_date'], name='book_user_status_index'),
+            # the books of a user's series, in order
+            models.Index(fields=['user', 'series', 'position_in_series'], name='book_user_series_index'),
+        ]
+
+def author_key(name):
+    """ how an author's name is matched: 'Ursula K. Le Guin' and 'ursula k.  le guin' are one author """
+    return ' '.join(name.split()).casefold()
+
+
+class AuthorManager(models.Manager):
+    def named(self, user, names):
+        """
+        {name: Author} for the user's authors with the given names, matched by author_key.
+        Authors that don't exist yet are created, in one INSERT, named as they are first written.
+        """
+        keys = {name: author_key(name) for name in names}
+        authors = {author.key: author for author in self.filter(user=user, key__in=set(keys.values()))}
+
+        missing = {}
+        for name, key in keys.items():
+            if key not in authors:
+                missing.setdefault(key, name)
+        if missing:
+            # a request creating the same author at the same time wins, and its author is used
+            self.bulk_create([
+                Author(user=user, name=name, key=key) for key, name in missing.items()
+            ], ignore_conflicts=True)
+            authors.update((author.key, author) for author in self.filter(user=user, key__in=list(missing)))
+
+        return {name: authors[key] for name, key in keys.items()}
+
+
+class Author(models.Model):
+    """
+    One of a user's authors. Books are linked to them through BookAuthor, so each author's
+    name is stored once, however many books they wrote.
+    """
+    user = models.ForeignKey('userauth.User', on_delete=models.CASCADE)
+    # the name as it was first written
+    name = models.CharField(max_length=255)
+    # the name to match on, ignoring case and spacing (see author_key)
+    key = models.CharField(max_length=255)
+
+    objects = AuthorManager()
+
+    def __str__(self):
+        return self.name
+
+    class Meta:
+        constraints = [
+            # also the index for finding an author by name (see api/filters.py)
+            models.UniqueConstraint(fields=['user', 'key'], name='author_user_key_unique'),
+        ]
+        indexes = [
+            # a user's authors in order (GET authors/)
+            models.Index(fields=['user', 'name'], name='author_user_name_index'),
+        ]
+
+
+class BookAuthorManager(models.Manager):
+    def get_queryset(self):
+        # a book's authors are shown by name, in the order they were given
+        return super().get_queryset().select_related('author').order_by('position', 'id')
+
+    def create(self, author_name=None, **kwargs):
+        """ also takes the author by name, as author_name=...; the user's author of that name is created if need be """
+        if author_name is not None:
+            user = kwargs['user'] if 'user' in kwargs else kwargs['book'].user
+            kwargs['author'] = Author.objects.named(user, [author_name])[author_name]
+        return super().create(**kwargs)
+
+
 class BookAuthor(models.Model):
-    author_name = models.CharField(max_length=255)
+    """ a book having an author """
     book = models.ForeignKey(Book, related_name='authors', on_delete=models.CASCADE)
+    author = models.ForeignKey(Author, related_name='book_authors', on_delete=models.CASCADE, db_index=False)
+    # the same as the book's user; kept here for the library version triggers (see migration 0026)
     user = models.ForeignKey('userauth.User', on_delete=models.CASCADE)
+    # where the author comes in the book's list of authors, from 0
+    position = models.PositiveSmallIntegerField(default=0)
+
+    objects = BookAuthorManager()
+
+    @property
+    def author_name(self):
+        return self.author.name
 
     def __str__(self):
-        return self.author_name
+        return self.author.name
 
     class Meta:
         indexes = [
-            models.Index(fields=['author_name'], name='author_name_index'),
+            # the books of an author (GET authors/ and api/filters.py)
+            models.Index(fields=['author', 'book'], name='bookauthor_author_book_index'),
         ]
 
 class Series(models.Model):
@@ -78,20 +191,136 @@ class Series(models.Model):
     planned_count = models.PositiveIntegerField(null=False)
     user = models.ForeignKey('userauth.User', on_delete=models.CASCADE)
 
+    # when the series or its list of books last changed, and the library version it
+    # changed at, set by a database trigger
+    updated_at = models.DateTimeField(default=django.utils.timezone.now, editable=False)
+    library_version = models.BigIntegerField(default=0, editable=False)
+
+    def __str__(self):
+        return self.name
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'library_version'], name='series_user_version_index'),
+        ]
+
+# nested tags are named parent__child, like fiction__fantasy
+TAG_SEPARATOR = '__'
+
+
+def tag_ancestor_names(name):
+    """ the names of the tags a tag is nested under, outermost first: ['a', 'a__b'] for 'a__b__c' """
+    parts = name.split(TAG_SEPARATOR)
+    ancestors = [TAG_SEPARATOR.join(parts[:end]) for end in range(1, len(parts))]
+    return [ancestor for ancestor in ancestors if ancestor]
+
+
+def tag_parent_name(name):
+    ancestors = tag_ancestor_names(name)
+    return ancestors[-1] if ancestors else None
+
+
+def tag_depth(name):
+    """ how many tags a tag is nested under: 0 for 'fiction', 1 for 'fiction__fantasy' """
+    return len(tag_ancestor_names(name))
+
+
+class TagManager(models.Manager):
+    def named(self, user, names):
+        """
+        {name: Tag} for the user's tags with the given names. Tags that don't exist yet are
+        created, along with the tags they're nested under, with one INSERT per level of nesting.
+        """
+        wanted = set()
+        for name in names:
+            wanted.add(name)
+            wanted.update(tag_ancestor_names(name))
+
+        tags = {tag.name: tag for tag in self.filter(user=user, name__in=wanted)}
+
+        # parents before their children, so every new tag's parent already has an id
+        missing = sorted(wanted - set(tags), key=tag_depth)
+        for depth, level in itertools.groupby(missing, key=tag_depth):
+            level = list(level)
+            # a request creating the same tag at the same time wins, and its tag is used
+            self.bulk_create([
+                Tag(user=user, name=name, parent=tags.get(tag_parent_name(name)), depth=depth)
+                for name in level
+            ], ignore_conflicts=True)
+            tags.update((tag.name, tag) for tag in self.filter(user=user, name__in=level))
+
+        return {name: tags[name] for name in names}
+
+
+class Tag(models.Model):
+    """
+    One of a user's tags. Books are tagged through BookTag, so a tag's name is stored once,
+    however many books have it, and renaming it is an UPDATE of one row (plus any tags
+    nested under it), rather than of every book's copy of the name.
+    """
+    user = models.ForeignKey('userauth.User', on_delete=models.CASCADE)
+    # the full name, including the names of the tags it is nested under (fiction__fantasy)
+    name = models.CharField(max_length=255)
+    # the tag it is nested under (fiction, for fiction__fantasy)
+    parent = models.ForeignKey('self', related_name='children', on_delete=models.CASCADE, null=True)
+    # how many tags it is nested under, kept with parent (see tag_depth)
+    depth = models.PositiveSmallIntegerField(default=0)
+    # how many books have it or a tag nested under it, each counted once;
+    # set by database triggers whenever books gain or lose tags (see migration 0031)
+    book_count = models.PositiveIntegerField(default=0, editable=False)
+
+    objects = TagManager()
+
     def __str__(self):
         return self.name
 
+    class Meta:
+        constraints = [
+            # also the index for a user's tags in order, and for finding one by name
+            models.UniqueConstraint(fields=['user', 'name'], name='tag_user_name_unique'),
+        ]
+        indexes = [
+            # a tag and the tags nested under it, with LIKE 'name__%' (see api/filters.py).
+            # the pattern opclass lets LIKE use the index whatever the database's collation
+            models.Index(
+                fields=['user', 'name'], name='tag_user_name_pattern_index',
+                opclasses=['int4_ops', 'varchar_pattern_ops']),
+        ]
+
+
+class BookTagManager(models.Manager):
+    def get_queryset(self):
+        # a book's tags are only ever shown by name, so their Tag comes along in the same query
+        return super().get_queryset().select_related('tag')
+
+    def create(self, tag_name=None, **kwargs):
+        """ also takes the tag by name, as tag_name=...; the user's tag of that name is created if need be """
+        if tag_name is not None:
+            user = kwargs['user'] if 'user' in kwargs else kwargs['book'].user
+            kwargs['tag'] = Tag.objects.named(user, [tag_name])[tag_name]
+        return super().create(**kwargs)
+
+
 class BookTag(models.Model):
-    tag_name = models.CharField(max_length=255)
+    """ a book having a tag """
     book = models.ForeignKey(Book, related_name="tags", on_delete=models.CASCADE)
+    tag = models.ForeignKey(Tag, related_name="book_tags", on_delete=models.CASCADE, db_index=False)
+    # the same as the book's user; kept here for the library version triggers (see migration 0026)
     user = models.ForeignKey('userauth.User', on_delete=models.CASCADE)
 
+    objects = BookTagManager()
+
+    @property
+    def tag_name(self):
+        return self.tag.name
+
     def __str__(self):
-        return self.tag_name
+        return self.tag.name
 
     class Meta:
         indexes = [
-            models.Index(fields=['tag_name'], name='tag_name_index'),
+            # the books with a tag (GET tags/, PUT and DELETE tags/<tag_name>/ and api/filters.py)
+            models.Index(fields=['tag', 'book'], name='booktag_tag_book_index'),
         ]
 
 class BookStatus(models.Model):
@@ -100,10 +329,116 @@ class BookStatus(models.Model):
     date = models.DateTimeField(default=django.utils.timezone.now)
     status_code = models.CharField(max_length=4, choices=Book.STATUS_CHOICES)
 
+    # when the status last changed, and the library version it changed at, set by a database trigger
+    updated_at = models.DateTimeField(default=django.utils.timezone.now, editable=False)
+    library_version = models.BigIntegerField(default=0, editable=False)
+
     def __str__(self):
         return self.status_code
 
     class Meta:
         indexes = [
-            models.Index(fields=['status_code'], name='status_code_index')
-        ]
\ No newline at end of file
+            # a book's status history, in order
+            models.Index(fields=['user', 'book', 'date'], name='status_user_book_date_index'),
+            models.Index(fields=['user', 'library_version'], name='status_user_version_index'),
+        ]
+
+class ImportJob(models.Model):
+    """ a CSV library export waiting to be, or being, imported by the process_imports worker """
+    user = models.ForeignKey('userauth.User', on_delete=models.CASCADE)
+    source = models.TextField()
+
+    QUEUED = 'QUE'
+    RUNNING = 'RUN'
+    DONE = 'DONE'
+    FAILED = 'FAIL'
+    STATUS_CHOICES = [
+        (QUEUED, 'Queued'),
+        (RUNNING, 'Running'),
+        (DONE, 'Done'),
+        (FAILED, 'Failed'),
+    ]
+    status = models.CharField(
+        max_length=4,
+        choices=STATUS_CHOICES,
+        default=QUEUED
+    )
+
+    rows_processed = models.PositiveIntegerField(default=0)
+    rows_failed = models.PositiveIntegerField(default=0)
+    books_created = models.PositiveIntegerField(default=0)
+    errors = JSONField(default=list)
+
+    created_at = models.DateTimeField(default=django.utils.timezone.now)
+    started_at = models.DateTimeField(null=True)
+    finished_at = models.DateTimeField(null=True)
+
+    # when the worker running the job last saved its progress (see api/importer.py)
+    heartbeat_at = models.DateTimeField(null=True)
+
+    def __str__(self):
+        return "import %s (%s)" %(self.id, self.status)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'id'], name='import_job_queue_index'),
+        ]
+
+class LibraryVersion(models.Model):
+    """
+    A counter that goes up whenever anything in a user's library is written,
+    so clients can ask "has anything changed?" without the book tables being read.
+
+    Database triggers (see migration 0026) bump it on every INSERT, UPDATE or DELETE
+    of a user's books, authors, tags, series and statuses, including bulk ones.
+    """
+    # no database foreign key: while a user is being deleted, deleting their books
+    # fires the triggers, which may write this row again after Django has removed it
+    user = models.OneToOneField(
+        'userauth.User',
+        primary_key=True,
+        related_name='library_version',
+        on_delete=models.DO_NOTHING,
+        db_constraint=False
+    )
+    version = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(default=django.utils.timezone.now)
+
+    def __str__(self):
+        return "%s" %(self.version)
+
+class Tombstone(models.Model):
+    """
+    A record that one of a user's books, series or statuses was deleted,
+    so that GET sync/ can tell clients to remove it too.
+
+    Written by database triggers (see migration 0027) and pruned by manage.py prune_tombstones.
+    """
+    # no database foreign key, for the same reason as LibraryVersion
+    user = models.ForeignKey(
+        'userauth.User',
+        on_delete=models.DO_NOTHING,
+        db_constraint=False
+    )
+
+    BOOK = 'book'
+    SERIES = 'series'
+    STATUS = 'status'
+    KIND_CHOICES = [
+        (BOOK, 'Book'),
+        (SERIES, 'Series'),
+        (STATUS, 'Status'),
+    ]
+    kind = models.CharField(max_length=6, choices=KIND_CHOICES)
+    object_id = models.IntegerField()
+    deleted_at = models.DateTimeField(default=django.utils.timezone.now)
+    # the user's library version the deletion was written at, for GET sync/
+    library_version = models.BigIntegerField(default=0)
+
+    def __str__(self):
+        return "%s %s" %(self.kind, self.object_id)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'library_version'], name='tombstone_user_version_index'),
+        ]
@@ -0,0 +1,215 @@
+import base64
+import binascii
+import json
+
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+
+# the fields books can be ordered by, ascending or (prefixed with '-') descending,
+# and how each one's value is read back from a cursor.
+# each has a (user, <field>, id) index on Book, so a page is one short index scan
+ORDERING_FIELDS = {
+    'id': int,
+    'title': str,
+    'rating': int,
+    'current_status_date': parse_datetime,
+    'position_in_series': int,
+}
+
+# the only ordering field that can be null; Postgres sorts nulls last, or first when descending
+NULLABLE_ORDERING_FIELDS = {'position_in_series'}
+
+
+def is_paginated(params):
+    """ pagination is opt-in; it is turned on by passing a page size or a cursor """
+    return 'page_size' in params or 'cursor' in params
+
+
+def parse_ordering(ordering):
+    """ ('title', True) for '-title'; raises ValueError for fields books can't be ordered by """
+    descending = ordering.startswith('-')
+    field = ordering[1:] if descending else ordering
+    if field not in ORDERING_FIELDS:
+        raise ValueError("Invalid ordering '%s'; use one of: %s (prefix with - to reverse)" %(
+            ordering, ", ".join(ORDERING_FIELDS)))
+    return field, descending
+
+
+def ordering_columns(ordering):
+    """
+    The order_by() for an ordering. Every ordering ends with id, in the same direction,
+    so that books sharing a value still have a stable order.
+    """
+    field, descending = parse_ordering(ordering)
+    columns = ['id'] if field == 'id' else [field, 'id']
+    if descending:
+        columns = ['-' + column for column in columns]
+    return columns
+
+
+def get_ordering(params):
+    """ the ordering a request asked for; a cursor carries the ordering of the page it came from """
+    if 'cursor' in params:
+        return decode_cursor(params['cursor'])[0]
+    ordering = params.get('ordering', 'id')
+    parse_ordering(ordering)
+    return ordering
+
+
+def encode_cursor(ordering, book):
+    """
+    Build an opaque cursor pointing just past the given book.
+
+    The cursor holds the ordering and the ordering values of the last book on the page,
+    base64-encoded so that clients treat it as a token rather than something to build.
+    """
+    position = {
+        'ordering': ordering,
+        'id': book.id,
+    }
+    field, _ = parse_ordering(ordering)
+    if field != 'id':
+        value = getattr(book, field)
+        position[field] = value.isoformat() if field == 'current_status_date' else value
+
+    encoded = base64.urlsafe_b64encode(json.dumps(position).encode('utf-8'))
+    return encoded.decode('ascii')
+
+
+def decode_cursor(cursor):
+    """
+    Unpack a cursor made by encode_cursor into (ordering, last id, last value);
+    raises ValueError if it was tampered with.
+    """
+    try:
+        position = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+        ordering = position['ordering']
+        field, _ = parse_ordering(ordering)
+        last_id = int(position['id'])
+        last_value = None
+        if field != 'id':
+            last_value = position[field]
+            if last_value is not None:
+                last_value = ORDERING_FIELDS[field](last_value)
+            if last_value is None and field not in NULLABLE_ORDERING_FIELDS:
+                raise ValueError()
+    except (binascii.Error, UnicodeError, TypeError, KeyError, ValueError, AttributeError):
+        raise ValueError("Invalid cursor")
+
+    return ordering, last_id, last_value
+
+
+def after_position(ordering, last_id, last_value):
+    """ a filter for the books that come after the given one in an ordering """
+    field, descending = parse_ordering(ordering)
+    after = 'lt' if descending else 'gt'
+    after_id = Q(**{'id__' + after: last_id})
+    if field == 'id':
+        return after_id
+
+    if last_value is None:
+        # the last book had no value: the rest of the nulls, then (descending) the non-nulls
+        following = Q(**{field + '__isnull': True}) & after_id
+        if descending:
+            following |= Q(**{field + '__isnull': False})
+        return following
+
+    following = Q(**{field + '__' + after: last_value}) | (Q(**{field: last_value}) & after_id)
+    if field in NULLABLE_ORDERING_FIELDS and not descending:
+        # nulls come after every value
+        following |= Q(**{field + '__isnull': True})
+    return following
+
+
+def get_page_size(params):
+    page_size = params.get('page_size', DEFAULT_PAGE_SIZE)
+    try:
+        page_size = int(page_size)
+    except (TypeError, ValueError):
+        raise ValueError("page_size must be an integer")
+
+    if page_size < 1 or page_size > MAX_PAGE_SIZE:
+        raise ValueError("page_size must be between 1 and %s" %(MAX_PAGE_SIZE))
+    return page_size
+
+
+def paginate_books(queryset, params):
+    """
+    Return one page of books and the cursor for the next page (None on the last page).
+
+    This is keyset pagination: instead of an OFFSET, which makes the database
+    walk past every earlier row, each page starts with a WHERE on the ordering
+    values of the last book seen. With a (user, <field>, id) index on Book for every
+    ordering, page 1000 costs the same as page 1.
+
+    Raises ValueError with a message for the client if the parameters are invalid.
+    """
+    page_size = get_page_size(params)
+
+    if 'cursor' in params:
+        ordering, last_id, last_value = decode_cursor(params['cursor'])
+        queryset = queryset.filter(after_position(ordering, last_id, last_value))
+    else:
+        ordering = get_ordering(params)
+
+    # fetch one extra book to find out whether there is another page
+    books = list(queryset.order_by(*ordering_columns(ordering))[:page_size + 1])
+
+    if len(books) > page_size:
+        books = books[:page_size]
+        next_cursor = encode_cursor(ordering, books[-1])
+    else:
+        next_cursor = None
+
+    return books, next_cursor
+
+
+def encode_offset_cursor(offset):
+    """ an opaque cursor for results that can only be paged by position, like ranked search results """
+    encoded = base64.urlsafe_b64encode(json.dumps({'offset': offset}).encode('utf-8'))
+    return encoded.decode('ascii')
+
+
+def decode_offset_cursor(cursor):
+    try:
+        offset = int(json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))['offset'])
+    except (binascii.Error, UnicodeError, TypeError, KeyError, ValueError):
+        raise ValueError("Invalid cursor")
+
+    if offset < 0:
+        raise ValueError("Invalid cursor")
+    return offset
+
+
+def paginate_by_offset(queryset, params, default_page_size=DEFAULT_PAGE_SIZE):
+    """
+    Return one page of an already-ordered queryset and the cursor for the next page.
+
+    Search results are ordered by a rank that is computed per query, so they have no
+    column to key on; OFFSET is the only way through them. The number of matches
+    is usually small next to the whole library, so this stays cheap.
+
+    Raises ValueError with a message for the client if the parameters are invalid.
+    """
+    params = params.copy()
+    params.setdefault('page_size', default_page_size)
+    page_size = get_page_size(params)
+
+    offset = 0
+    if 'cursor' in params:
+        offset = decode_offset_cursor(params['cursor'])
+
+    # fetch one extra row to find out whether there is another page
+    rows = list(queryset[offset:offset + page_size + 1])
+
+    if len(rows) > page_size:
+        rows = rows[:page_size]
+        next_cursor = encode_offset_cursor(offset + page_size)
+    else:
+        next_cursor = None
+
+    return rows, next_cursor
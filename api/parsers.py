@@ -0,0 +1,47 @@
+# api/parsers.py
+
+import json
+
+from django.conf import settings
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import BaseParser
+
+
+class NDJSONParser(BaseParser):
+    """
+    Parses newline-delimited JSON (one JSON object per line) into a list.
+
+    Blank lines are skipped, so a trailing newline is fine.
+    http://ndjson.org/
+    """
+
+    media_type = 'application/x-ndjson'
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        parser_context = parser_context or {}
+        encoding = parser_context.get('encoding', settings.DEFAULT_CHARSET)
+
+        items = []
+        for line_number, line in enumerate(stream, start=1):
+            line = line.decode(encoding).strip()
+            if not line:
+                continue
+            try:
+                items.append(json.loads(line))
+            except ValueError as error:
+                raise ParseError('NDJSON parse error on line %s - %s' % (line_number, error))
+        return items
+
+
+class CSVParser(BaseParser):
+    """ Reads a text/csv body as one string, for the CSV importer to stream through """
+
+    media_type = 'text/csv'
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        parser_context = parser_context or {}
+        encoding = parser_context.get('encoding', 'utf-8-sig')
+        try:
+            return stream.read().decode(encoding)
+        except UnicodeDecodeError as error:
+            raise ParseError('CSV parse error - %s' % (error))
@@ -0,0 +1,145 @@
+# api/query_plans.py
+
+"""
+The queries the API makes most often, and a check that Postgres answers each one with an index.
+
+Every request reads from one user's library, so every hot query filters by user first and the
+indexes on api/models.py lead with user. A query that the indexes stop covering still returns
+the right answer, just by reading every user's rows; on a small database that's unnoticeable,
+so it's caught by looking at the plan instead (see the check_query_plans command and
+api/test_query_plans.py).
+"""
+
+import re
+
+from django.db import connection, transaction
+from django.db.models import Count
+
+from .models import Book, Author, BookAuthor, Series, Tag, BookTag, BookStatus, Tombstone
+from .pagination import DEFAULT_PAGE_SIZE, ordering_columns
+from .search import build_search_query, search_books
+from .authors import authors_written, author_counts, author_book_ids
+from .tags import subtree_book_ids
+
+
+SEQUENTIAL_SCAN_PATTERN = re.compile(r'Seq Scan on (\w+)')
+
+# reading a table this small in full is as quick as using an index, and the planner knows it
+SMALL_TABLE_ROWS = 1000
+
+
+def sample_values(user):
+    """ a tag, author, series and book from the user's library to fill the queries with """
+    def most_common(queryset, field):
+        row = queryset.filter(user=user).values(field).annotate(
+            count=Count('id')).order_by('-count', field).first()
+        return row[field] if row else None
+
+    tag_name = most_common(BookTag.objects.all(), 'tag__name') or ''
+    return {
+        'tag_name': tag_name,
+        # the top-level tag, like 'fiction' for 'fiction__fantasy'
+        'tag_root': tag_name.split('__')[0],
+        'author_name': most_common(BookAuthor.objects.all(), 'author__name') or '',
+        'author_id': most_common(BookAuthor.objects.all(), 'author') or 0,
+        'series_id': most_common(Book.objects.exclude(series=None), 'series') or 0,
+        'book_id': most_common(BookStatus.objects.all(), 'book') or 0,
+        # the last change, as a client that's nearly up to date would sync from
+        'since_version': Book.objects.filter(user=user).order_by(
+            '-library_version').values_list('library_version', flat=True).first() or 0,
+    }
+
+
+def hot_queries(user):
+    """
+    [(name, queryset)] for the queries behind the most used endpoints, filled in
+    with values from the user's library
+    """
+    values = sample_values(user)
+    books = Book.objects.filter(user=user)
+
+    def first_page(ordering):
+        # a page of books, plus the one that shows whether there's another (see api/pagination.py)
+        return books.order_by(*ordering_columns(ordering))[:DEFAULT_PAGE_SIZE + 1]
+
+    queries = [
+        ('books by id', first_page('id')),
+        ('books by title', first_page('title')),
+        ('books by rating', first_page('-rating')),
+        ('books by status date', first_page('current_status_date')),
+        ('books with a status', books.filter(current_status=Book.CURRENT)),
+        ('books in a series', books.filter(series_id=values['series_id']).order_by('position_in_series')),
+        ('books with a tag', BookTag.objects.filter(
+            tag__in=Tag.objects.filter(user=user, name=values['tag_name'])).values('book_id')),
+        ('books under a tag', subtree_book_ids(user, values['tag_root'])),
+        ('books by an author', BookAuthor.objects.filter(
+            author__in=authors_written(user, values['author_name'])).values('book_id')),
+        ('authors', author_counts(user)),
+        ('books of an author', author_book_ids(user, values['author_id'])),
+        ('tags', Tag.objects.filter(user=user, book_tags__user=user).values('name').annotate(
+            count=Count('book_tags__book', distinct=True)).order_by('name')),
+        ('tag tree', Tag.objects.filter(user=user).order_by('name')),
+        ('series', Series.objects.filter(user=user).order_by('id')),
+        ('status history', BookStatus.objects.filter(user=user, book_id=values['book_id']).order_by('date')),
+        ('current status', BookStatus.objects.filter(user=user, book_id=values['book_id']).order_by('-date')[:1]),
+        ('changed books', books.filter(library_version__gt=values['since_version'])),
+        ('changed series', Series.objects.filter(user=user, library_version__gt=values['since_version'])),
+        ('changed statuses', BookStatus.objects.filter(user=user, library_version__gt=values['since_version'])),
+        ('deleted objects', Tombstone.objects.filter(user=user, library_version__gt=values['since_version'])),
+    ]
+
+    search_query = build_search_query(values['tag_root'] or 'book')
+    if search_query is not None:
+        queries.append(('search', search_books(user, search_query)))
+    return queries
+
+
+def table_sizes():
+    """ {table: rows} for the library tables, as estimated by the last ANALYZE """
+    tables = [model._meta.db_table for model in (Book, Author, BookAuthor, Series, Tag, BookTag, BookStatus, Tombstone)]
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT relname, reltuples FROM pg_class WHERE relname IN %s', [tuple(tables)])
+        return dict(cursor.fetchall())
+
+
+def sequential_scans(plan, sizes=None):
+    """
+    The tables a plan from EXPLAIN reads in full, leaving out tables with fewer than
+    SMALL_TABLE_ROWS rows if given their sizes
+    """
+    tables = SEQUENTIAL_SCAN_PATTERN.findall(plan)
+    if sizes is not None:
+        tables = [table for table in tables if sizes.get(table, 0) >= SMALL_TABLE_ROWS]
+    return tables
+
+
+def check_query_plans(user, seqscan=True):
+    """
+    [(name, plan, tables scanned sequentially)] for each hot query.
+
+    Run ANALYZE after loading a lot of data, so that the planner knows how the rows are
+    spread across users; with stale statistics it may choose a scan that fits the old data.
+
+    With seqscan=False the queries are explained with enable_seqscan off, so Postgres only
+    reads a table in full when no index can answer the query. That checks the indexes
+    rather than the planner's choice between them and a scan, which on a small database is
+    close enough to go either way (api/test_query_plans.py relies on this).
+    """
+    sizes = table_sizes()
+    results = []
+    # SET LOCAL lasts until the end of the transaction
+    with transaction.atomic():
+        if not seqscan:
+            with connection.cursor() as cursor:
+                cursor.execute('SET LOCAL enable_seqscan = off')
+        for name, queryset in hot_queries(user):
+            plan = queryset.explain()
+            results.append((name, plan, sequential_scans(plan, sizes)))
+    return results
+
+
+def analyze():
+    """ refresh the planner's statistics for the library tables """
+    with connection.cursor() as cursor:
+        for model in (Book, Author, BookAuthor, Series, Tag, BookTag, BookStatus, Tombstone):
+            cursor.execute('ANALYZE %s' % (connection.ops.quote_name(model._meta.db_table)))
@@ -0,0 +1,111 @@
+# api/renderers.py
+
+import csv
+import io
+import json
+
+from django.conf import settings
+from rest_framework.utils import encoders
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+
+import msgpack
+import orjson
+
+
+class NDJSONRenderer(BaseRenderer):
+    """
+    Renders newline-delimited JSON. A list becomes one line per item;
+    anything else (like an error message) becomes a single line.
+    """
+
+    media_type = 'application/x-ndjson'
+    format = 'ndjson'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        items = data if isinstance(data, list) else [data]
+        lines = [json.dumps(item) + '\n' for item in items]
+        return ''.join(lines).encode(self.charset)
+
+
+class CSVRenderer(BaseRenderer):
+    """
+    Renders a list of flat dicts as CSV with a header row taken from the first dict's keys.
+    A single dict (like an error message) becomes a one-row table.
+    """
+
+    media_type = 'text/csv'
+    format = 'csv'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        rows = data if isinstance(data, list) else [data]
+        if not rows:
+            return b''
+
+        buffer = io.StringIO()
+        writer = csv.DictWriter(buffer, fieldnames=list(rows[0].keys()))
+        writer.writeheader()
+        writer.writerows(rows)
+        return buffer.getvalue().encode(self.charset)
+
+
+class FastJSONRenderer(JSONRenderer):
+    """
+    JSONRenderer that encodes with orjson, https://github.com/ijl/orjson,
+    when settings.FAST_RENDERING is on.
+
+    The output is the same bytes JSONRenderer would produce: compact, UTF-8,
+    and with \u2028 and \u2029 escaped. Datetimes and anything else orjson doesn't
+    encode itself the way DRF does are handed to DRF's encoder, and pretty-printed
+    responses (like the browsable API's) are left to JSONRenderer.
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+
+        indent = self.get_indent(accepted_media_type, renderer_context or {})
+        if not getattr(settings, 'FAST_RENDERING', False) or indent is not None:
+            return super().render(data, accepted_media_type, renderer_context)
+        return self.render_fast(data)
+
+    def render_fast(self, data):
+        """ compact JSON, encoded with orjson """
+        if self.ensure_ascii:
+            return super().render(data)
+
+        try:
+            ret = orjson.dumps(
+                data,
+                default=self.encoder_class().default,
+                option=orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS)
+        except TypeError:
+            # orjson.JSONEncodeError is a TypeError; e.g. integers over 64 bits
+            return super().render(data)
+
+        return ret.replace('\u2028'.encode(), b'\\u2028').replace('\u2029'.encode(), b'\\u2029')
+
+
+class MessagePackRenderer(BaseRenderer):
+    """
+    Renders MessagePack, https://msgpack.org/, a binary equivalent of JSON, for clients
+    that send 'Accept: application/msgpack'. It is smaller than JSON and quicker to decode.
+
+    Values are the same as in JSON responses: datetimes and anything else MessagePack has
+    no type for are converted by DRF's JSON encoder, so dates are the same strings.
+    """
+
+    media_type = 'application/msgpack'
+    format = 'msgpack'
+    charset = None
+    render_style = 'binary'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        return msgpack.packb(data, default=encoders.JSONEncoder().default, use_bin_type=True)
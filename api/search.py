@@ -0,0 +1,45 @@
+# api/search.py
+
+import re
+
+from django.contrib.postgres.search import SearchQuery, SearchRank
+from django.db.models import F
+
+from .models import Book
+
+
+# the text search configuration used to build Book.search_vector (see migration 0025)
+SEARCH_CONFIG = 'english'
+
+# search words are runs of letters and digits; everything else,
+# including tsquery operators and the __ in tag names, separates them
+WORD_PATTERN = re.compile(r'[^\W_]+')
+
+
+def build_search_query(text):
+    """
+    Turn what the user typed into a tsquery that matches books containing every word,
+    with the last word or any other allowed to be the start of a longer one ('harr pot' finds Harry Potter).
+
+    Returns None if there are no words to search for.
+    """
+    words = WORD_PATTERN.findall(text)
+    if not words:
+        return None
+    raw_query = ' & '.join("%s:*" % (word) for word in words)
+    return SearchQuery(raw_query, config=SEARCH_CONFIG, search_type='raw')
+
+
+def search_books(user, search_query):
+    """
+    A user's books matching the query, best matches first.
+
+    The match itself (search_vector @@ query) is answered by the GIN index on
+    Book.search_vector, so only the matching books are ranked.
+    """
+    return Book.objects.filter(
+        user=user,
+        search_vector=search_query,
+    ).annotate(
+        rank=SearchRank(F('search_vector'), search_query),
+    ).order_by('-rank', 'id')
@@ -0,0 +1,326 @@
+# api/seed.py
+
+import csv
+import datetime
+import io
+import itertools
+import math
+import random
+
+from django.apps import apps
+from django.contrib.auth.hashers import make_password
+from django.db import connection, transaction
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+
+from .models import Book, Author, BookAuthor, Series, Tag, BookTag, BookStatus
+
+
+FIRST_NAMES = [
+    'Ada', 'Alan', 'Anne', 'Arthur', 'Beatrice', 'Bertie', 'Carmen', 'Caspar', 'Clara', 'Daniel',
+    'Dorothy', 'Edgar', 'Elena', 'Emil', 'Frances', 'George', 'Grace', 'Harriet', 'Hugo', 'Ines',
+    'Isaac', 'Jane', 'Jorge', 'Kazuo', 'Leo', 'Louisa', 'Mary', 'Miguel', 'Nadia', 'Neil',
+    'Octavia', 'Orhan', 'Penelope', 'Rainer', 'Rosa', 'Samuel', 'Sylvia', 'Toni', 'Ursula', 'Virginia',
+]
+LAST_NAMES = [
+    'Achebe', 'Adichie', 'Atwood', 'Austen', 'Baldwin', 'Borges', 'Bronte', 'Butler', 'Calvino', 'Carter',
+    'Chandler', 'Christie', 'Dickens', 'Dostoevsky', 'Eliot', 'Faulkner', 'Ferrante', 'Gaiman', 'Garcia', 'Gibson',
+    'Hardy', 'Hemingway', 'Hurston', 'Ishiguro', 'James', 'Jemisin', 'Joyce', 'Kafka', 'Le Guin', 'Lessing',
+    'Mantel', 'Marquez', 'Morrison', 'Murakami', 'Nabokov', 'Okorafor', 'Orwell', 'Pamuk', 'Plath', 'Pratchett',
+    'Rilke', 'Rushdie', 'Saramago', 'Shelley', 'Smith', 'Tolkien', 'Tolstoy', 'Twain', 'Vonnegut', 'Woolf',
+]
+TITLE_WORDS = [
+    'Autumn', 'Bones', 'Cities', 'Clockwork', 'Crown', 'Dark', 'Dragon', 'Dreams', 'Dust', 'Echoes',
+    'Empire', 'Fire', 'Forest', 'Garden', 'Ghost', 'Glass', 'Gods', 'Golden', 'Harbor', 'House',
+    'Hunger', 'Iron', 'Island', 'Kingdom', 'Last', 'Light', 'Lost', 'Machine', 'Midnight', 'Moon',
+    'Night', 'Ocean', 'Paper', 'Queen', 'River', 'Salt', 'Secret', 'Shadow', 'Silent', 'Silver',
+    'Sky', 'Song', 'Stars', 'Stone', 'Storm', 'Summer', 'Thief', 'Tide', 'Time', 'Tower',
+    'Wall', 'Water', 'Wild', 'Wind', 'Winter', 'Wolf', 'World', 'Years',
+]
+PUBLISHERS = [
+    'Penguin', 'Vintage', 'Tor', 'Orbit', 'HarperCollins', 'Macmillan', 'Scholastic', 'Del Rey',
+    'Knopf', 'Faber & Faber', 'Bloomsbury', 'Graywolf', 'Small Beer Press', 'Subterranean', 'Gollancz',
+]
+ROOT_TAGS = ['fiction', 'nonfiction', 'poetry', 'comics', 'reference']
+TAG_WORDS = [
+    'fantasy', 'science', 'history', 'mystery', 'romance', 'horror', 'classic', 'literary', 'biography',
+    'essays', 'travel', 'cooking', 'politics', 'philosophy', 'nature', 'art', 'music', 'humor', 'war',
+    'space', 'epic', 'urban', 'cozy', 'gothic', 'satire', 'memoir', 'adventure', 'thriller', 'queer',
+    'translated', 'young-adult', 'short-stories', 'economics', 'psychology', 'religion', 'sport',
+]
+
+# how a book's reading went; each path is the order its statuses were added in
+STATUS_PATHS = [
+    ([Book.WANTTOREAD], 30),
+    ([Book.WANTTOREAD, Book.CURRENT], 10),
+    ([Book.WANTTOREAD, Book.CURRENT, Book.COMPLETED], 45),
+    ([Book.WANTTOREAD, Book.CURRENT, Book.PAUSED], 8),
+    ([Book.WANTTOREAD, Book.CURRENT, Book.DISCARDED], 7),
+]
+
+# most books have a single author and a few tags
+AUTHOR_COUNTS = ([1, 2, 3], [82, 15, 3])
+TAG_COUNTS = ([0, 1, 2, 3, 4, 5], [10, 25, 30, 20, 10, 5])
+RATINGS = ([Book.UNRATED, Book.ONE, Book.TWO, Book.THREE, Book.FOUR, Book.FIVE], [30, 3, 7, 20, 25, 15])
+
+
+class ZipfSampler:
+    """
+    Picks items so that the k-th item is chosen in proportion to 1 / k**exponent,
+    like real author and tag popularity: a few are everywhere, most are rare.
+    https://en.wikipedia.org/wiki/Zipf%27s_law
+    """
+
+    def __init__(self, population, exponent, rng):
+        self.population = population
+        self.rng = rng
+        weights = (1 / (rank ** exponent) for rank in range(1, len(population) + 1))
+        self.cum_weights = list(itertools.accumulate(weights))
+
+    def sample(self, count):
+        """ count distinct items (fewer if the population is smaller) """
+        picked = []
+        for item in self.rng.choices(self.population, cum_weights=self.cum_weights, k=count):
+            if item not in picked:
+                picked.append(item)
+        return picked
+
+
+def author_names(count):
+    """ count distinct author names, adding middle initials once first and last names run out """
+    names = []
+    combinations = len(FIRST_NAMES) * len(LAST_NAMES)
+    for index in range(count):
+        first = FIRST_NAMES[index % len(FIRST_NAMES)]
+        last = LAST_NAMES[(index // len(FIRST_NAMES)) % len(LAST_NAMES)]
+        round_number = index // combinations
+        if round_number:
+            middle = ''.join(chr(ord('A') + int(digit)) for digit in str(round_number))
+            names.append("%s %s. %s" % (first, middle, last))
+        else:
+            names.append("%s %s" % (first, last))
+    return names
+
+
+def tag_names(count):
+    """
+    count distinct nested tag names: the root genres first, then their parent__child tags,
+    then parent__child__grandchild tags, so that Zipf sampling makes broad tags the most common.
+    """
+    names = list(ROOT_TAGS)
+    level = list(ROOT_TAGS)
+    while len(names) < count:
+        next_level = []
+        for word in TAG_WORDS:
+            for parent in level:
+                if word not in parent.split('__'):
+                    next_level.append("%s__%s" % (parent, word))
+        names.extend(next_level)
+        level = next_level
+    return names[:count]
+
+
+def library_size(rng, min_books, max_books):
+    """ log-uniform between min_books and max_books: many small libraries and a few huge ones """
+    if min_books >= max_books:
+        return min_books
+    low = math.log(max(1, min_books))
+    high = math.log(max_books + 1)
+    return max(min_books, min(max_books, int(math.exp(rng.uniform(low, high)))))
+
+
+class LibrarySeeder:
+    """
+    Creates users with randomly generated but realistic libraries.
+
+    Users, tokens and series are written with bulk_create; the books and everything in them,
+    which make up nearly all of the rows, are written with COPY in batches of batch_size books.
+    Each library is written in its own transaction.
+    """
+
+    def __init__(self, min_books=50, max_books=2000, author_count=5000, tag_count=300,
+                 zipf_exponent=1.1, series_fraction=0.25, years=5, batch_size=5000, seed=None):
+        self.rng = random.Random(seed)
+        self.min_books = max(0, min_books)
+        self.max_books = max(self.min_books, max_books)
+        self.series_fraction = series_fraction
+        self.batch_size = batch_size
+        self.now = timezone.now()
+        self.start = self.now - datetime.timedelta(days=365 * years)
+
+        self.authors = ZipfSampler(author_names(author_count), zipf_exponent, self.rng)
+        self.tags = ZipfSampler(tag_names(tag_count), zipf_exponent, self.rng)
+        self.publishers = ZipfSampler(PUBLISHERS, zipf_exponent, self.rng)
+
+        self.status_paths = [path for path, weight in STATUS_PATHS]
+        self.status_weights = [weight for path, weight in STATUS_PATHS]
+
+        # running totals of created rows, by model name
+        self.created = {'users': 0, 'books': 0, 'authors': 0, 'tags': 0, 'statuses': 0, 'series': 0}
+
+    def create_users(self, count, prefix='seed', password='password'):
+        """
+        Create count users named <prefix>_<n>, all with the given password, and their tokens.
+
+        Hashing a password is deliberately slow, so it is done once and shared.
+        bulk_create skips the post_save signal that normally makes each user's token,
+        so the tokens are bulk created here too.
+        """
+        User = apps.get_model('userauth', 'User')
+        first_number = User.objects.filter(username__startswith=prefix + '_').count() + 1
+        hashed_password = make_password(password)
+
+        users = [
+            User(username="%s_%s" % (prefix, number), password=hashed_password)
+            for number in range(first_number, first_number + count)
+        ]
+        User.objects.bulk_create(users, batch_size=self.batch_size)
+        tokens = [Token(user=user) for user in users]
+        for token in tokens:
+            token.key = token.generate_key()
+        Token.objects.bulk_create(tokens, batch_size=self.batch_size)
+
+        self.created['users'] += len(users)
+        return users
+
+    def seed_library(self, user):
+        """ fill one user's library; returns how many books it was given """
+        size = library_size(self.rng, self.min_books, self.max_books)
+
+        with transaction.atomic():
+            series_slots = self.create_series(user, size)
+
+            for batch_start in range(0, size, self.batch_size):
+                batch_size = min(self.batch_size, size - batch_start)
+                self.create_books(user, batch_size, series_slots)
+
+        return size
+
+    def create_series(self, user, size):
+        """
+        Create the user's series and return the (series, position) slots books can fill,
+        in the order they'll be used.
+        """
+        in_series = int(size * self.series_fraction)
+        slots = []
+        series_list = []
+        while len(slots) < in_series:
+            planned_count = self.rng.randint(2, 7)
+            series = Series(
+                name="The %s Cycle" % (' '.join(self.rng.sample(TITLE_WORDS, 2))),
+                planned_count=planned_count,
+                user=user)
+            series_list.append(series)
+            slots.extend((series, position) for position in range(1, planned_count + 1))
+
+        Series.objects.bulk_create(series_list, batch_size=self.batch_size)
+        self.created['series'] += len(series_list)
+        self.rng.shuffle(slots)
+        return slots[:in_series]
+
+    def random_date(self, after=None):
+        start = after or self.start
+        span = (self.now - start).total_seconds()
+        if after is not None:
+            # the next status comes a few days to a few months later
+            span = min(span, 90 * 24 * 60 * 60)
+        return start + datetime.timedelta(seconds=self.rng.uniform(0, span))
+
+    def create_books(self, user, count, series_slots):
+        rng = self.rng
+        book_ids = reserve_ids(Book, count)
+        books = []
+        authors = []
+        tags = []
+        statuses = []
+
+        for book_id in book_ids:
+            path = rng.choices(self.status_paths, weights=self.status_weights)[0]
+            date = None
+            for status_code in path:
+                date = self.random_date(after=date)
+                statuses.append((status_code, date, book_id, user.id))
+            current_status = path[-1]
+
+            series_id, position = None, None
+            if series_slots:
+                series, position = series_slots.pop()
+                series_id = series.id
+
+            if current_status in (Book.COMPLETED, Book.DISCARDED):
+                rating = rng.choices(*RATINGS)[0]
+            else:
+                rating = Book.UNRATED
+
+            books.append((
+                book_id,
+                ' '.join(rng.sample(TITLE_WORDS, rng.randint(1, 4))),
+                user.id,
+                series_id,
+                position,
+                rng.randint(80, 900),
+                self.publishers.sample(1)[0],
+                str(rng.randint(1850, self.now.year)),
+                current_status,
+                date,
+                rating,
+            ))
+            for position, name in enumerate(self.authors.sample(rng.choices(*AUTHOR_COUNTS)[0])):
+                authors.append((name, book_id, user.id, position))
+            for name in self.tags.sample(rng.choices(*TAG_COUNTS)[0]):
+                tags.append((name, book_id, user.id))
+
+        # Django makes foreign keys DEFERRABLE INITIALLY DEFERRED, so the books can be written
+        # after the rows that point at them. That way the search trigger on api_book
+        # builds each book's search_vector once, with its authors and tags already there.
+        author_ids = {name: author.id for name, author in Author.objects.named(user, {row[0] for row in authors}).items()}
+        authors = [(author_ids[name], book_id, user_id, position) for name, book_id, user_id, position in authors]
+        copy_rows(BookAuthor, ['author_id', 'book_id', 'user_id', 'position'], authors)
+        tag_ids = {name: tag.id for name, tag in Tag.objects.named(user, {row[0] for row in tags}).items()}
+        tags = [(tag_ids[name], book_id, user_id) for name, book_id, user_id in tags]
+        copy_rows(BookTag, ['tag_id', 'book_id', 'user_id'], tags)
+        copy_rows(BookStatus, ['status_code', 'date', 'book_id', 'user_id'], statuses)
+        copy_rows(Book, BOOK_COLUMNS, books)
+
+        self.created['books'] += len(books)
+        self.created['authors'] += len(authors)
+        self.created['tags'] += len(tags)
+        self.created['statuses'] += len(statuses)
+
+
+# the order of the values in each book row built by LibrarySeeder.create_books
+BOOK_COLUMNS = [
+    'id', 'title', 'user_id', 'series_id', 'position_in_series', 'page_count', 'publisher',
+    'publication_date', 'current_status', 'current_status_date', 'rating',
+]
+
+
+def reserve_ids(model, count):
+    """ take count ids from the model's id sequence, so rows can be written with their ids already set """
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT nextval(pg_get_serial_sequence(%s, 'id')) FROM generate_series(1, %s)",
+            [model._meta.db_table, count])
+        return [row[0] for row in cursor.fetchall()]
+
+
+def copy_rows(model, columns, rows):
+    """
+    Write rows (tuples of values in the order of columns) to the model's table with COPY.
+
+    bulk_create spends most of its time building model instances and SQL in Python;
+    COPY streams plain CSV to PostgreSQL, which is many times faster for millions of rows.
+    https://www.postgresql.org/docs/current/sql-copy.html
+    Empty strings are never generated, so an empty CSV field can safely mean NULL.
+    """
+    if not rows:
+        return
+    buffer = io.StringIO()
+    csv.writer(buffer).writerows(rows)
+    buffer.seek(0)
+
+    quote = connection.ops.quote_name
+    sql = "COPY %s (%s) FROM STDIN WITH (FORMAT csv)" % (
+        quote(model._meta.db_table), ', '.join(quote(column) for column in columns))
+    with connection.cursor() as cursor:
+        cursor.copy_expert(sql, buffer)
@@ -1,46 +1,82 @@
 # api/serializers.py
                              
 from rest_framework import serializers
+from django.utils import timezone
          
-from .models import Book, BookAuthor, Series, BookTag, BookStatus
+from booktracker.metrics import timed_serialization
 
+from .models import Book, BookAuthor, Series, BookTag, BookStatus, ImportJob
 
-class BookAuthorSerializer(serializers.ModelSerializer):
+
+class TimedListSerializer(serializers.ListSerializer):
+    """ a ListSerializer whose .data is timed as a whole (see booktracker/metrics.py) """
+
+    @property
+    def data(self):
+        with timed_serialization():
+            return super().data
+
+
+class TimedModelSerializer(serializers.ModelSerializer):
+    """
+    a ModelSerializer whose .data is timed (see booktracker/metrics.py); with many=True,
+    the serializers below are timed by TimedListSerializer, set in their Meta
+    """
+
+    @property
+    def data(self):
+        with timed_serialization():
+            return super().data
+
+
+
+class BookAuthorSerializer(TimedModelSerializer):
     """ serializer for the BookAuthor model """
 
     book = serializers.StringRelatedField()
 
     class Meta:
         model = BookAuthor
+        list_serializer_class = TimedListSerializer
         fields = ['author_name', 'book']
 
-class BookTagSerializer(serializers.ModelSerializer):
+class BookTagSerializer(TimedModelSerializer):
     """ serializer for the BookTag model """
 
     book = serializers.PrimaryKeyRelatedField(read_only=True)
 
     class Meta:
         model = BookTag
+        list_serializer_class = TimedListSerializer
         fields = ['tag_name', 'book']
 
-class BookStatusSerializer(serializers.ModelSerializer):
+class BookStatusSerializer(TimedModelSerializer):
     """ serializer for the BookStatus model """
 
     book = serializers.PrimaryKeyRelatedField(read_only=True)
 
     class Meta:
         model = BookStatus
+        list_serializer_class = TimedListSerializer
         fields = ['id', 'status_code', 'book', 'date']
 
-class BookSerializer(serializers.ModelSerializer):
+class BookSerializer(TimedModelSerializer):
     """ serializer for the Book model """
 
     authors = serializers.StringRelatedField(many=True)
     series = serializers.PrimaryKeyRelatedField(read_only=True)
     tags = serializers.StringRelatedField(many=True)
 
+    def __init__(self, *args, fields=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        # leave out any fields the client didn't ask for (see api/fieldsets.py)
+        if fields is not None:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
+
     class Meta:
         model = Book
+        list_serializer_class = TimedListSerializer
         fields = ['id', 
         'title', 
         'authors', 
@@ -57,11 +93,41 @@ class BookSerializer(serializers.ModelSerializer):
         'rating',
         'tags']
 
-class SeriesSerializer(serializers.ModelSerializer):
+class SeriesSerializer(TimedModelSerializer):
     """ serializer for the Series model """
 
     books = serializers.PrimaryKeyRelatedField(many=True, read_only=True)
 
     class Meta:
         model = Series
+        list_serializer_class = TimedListSerializer
         fields = ['id', 'name', 'planned_count', 'books']
+
+class ImportJobSerializer(TimedModelSerializer):
+    """ serializer for the ImportJob model """
+
+    rows_per_second = serializers.SerializerMethodField()
+
+    class Meta:
+        model = ImportJob
+        list_serializer_class = TimedListSerializer
+        fields = ['id', 
+        'status', 
+        'rows_processed', 
+        'rows_failed', 
+        'books_created', 
+        'rows_per_second', 
+        'errors', 
+        'created_at', 
+        'started_at', 
+        'finished_at']
+
+    def get_rows_per_second(self, job):
+        """ the import's speed so far, or overall once it has finished """
+        if job.started_at is None:
+            return 0
+        end = job.finished_at or timezone.now()
+        seconds = (end - job.started_at).total_seconds()
+        if seconds <= 0:
+            return job.rows_processed
+        return round(job.rows_processed / seconds, 1)
@@ -0,0 +1,96 @@
+# api/sync.py
+
+import base64
+import binascii
+import datetime
+import json
+
+from django.conf import settings
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .models import Book, Series, BookStatus, Tombstone, LibraryVersion
+
+
+def tombstone_retention():
+    """ how long deletions are remembered; a cursor older than this gets a full sync """
+    return datetime.timedelta(days=getattr(settings, 'SYNC_TOMBSTONE_DAYS', 90))
+
+
+def encode_sync_cursor(version, moment):
+    cursor = {'version': version, 'since': moment.isoformat()}
+    return base64.urlsafe_b64encode(json.dumps(cursor).encode('utf-8')).decode('ascii')
+
+
+def decode_sync_cursor(cursor):
+    """
+    Unpack a cursor made by encode_sync_cursor into (library version, time of the sync);
+    raises ValueError if it was tampered with. A cursor from before syncs were keyed on
+    the library version has None for it, and gets a full sync.
+    """
+    try:
+        data = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+        since = parse_datetime(data['since'])
+        version = data.get('version')
+    except (binascii.Error, UnicodeError, TypeError, KeyError, AttributeError, ValueError):
+        raise ValueError("Invalid cursor")
+    if since is None or timezone.is_naive(since):
+        raise ValueError("Invalid cursor")
+    if version is not None and (not isinstance(version, int) or isinstance(version, bool) or version < 0):
+        raise ValueError("Invalid cursor")
+    return version, since
+
+
+def library_changes(user, cursor=None):
+    """
+    Everything in a user's library created, changed or deleted since the sync that
+    returned the given cursor, or the whole library if there is no cursor or it is older
+    than the tombstones go back.
+
+    Returns a dict of the changed books, series and statuses (as querysets, for
+    api/fast_serializers.py to serialize), the ids of the deleted ones,
+    whether this is a full sync, and the cursor for the next sync.
+    Each query is answered by a (user, library_version) index.
+
+    Changes are found by the library version they were written at rather than by when:
+    a write locks the user's LibraryVersion row until its transaction commits (see
+    migration 0034), so a change that isn't committed yet when the version is read here
+    is stamped with a later version, however long its transaction runs and whatever the
+    clocks of the app and database servers say. A record committed while a sync runs may
+    be sent again by the next one.
+    """
+    # taken before reading anything, so the next sync starts from here
+    version = LibraryVersion.objects.filter(user=user).values_list('version', flat=True).first() or 0
+    now = timezone.now()
+
+    since_version, since = cursor if cursor is not None else (None, None)
+    full = since_version is None or since < now - tombstone_retention()
+
+    books = Book.objects.filter(user=user)
+    series = Series.objects.filter(user=user)
+    statuses = BookStatus.objects.filter(user=user)
+    deleted = {
+        Tombstone.BOOK: [],
+        Tombstone.SERIES: [],
+        Tombstone.STATUS: [],
+    }
+
+    if not full:
+        books = books.filter(library_version__gt=since_version)
+        series = series.filter(library_version__gt=since_version)
+        statuses = statuses.filter(library_version__gt=since_version)
+
+        tombstones = Tombstone.objects.filter(
+            user=user, library_version__gt=since_version
+        ).values_list('kind', 'object_id').distinct().order_by('kind', 'object_id')
+        for kind, object_id in tombstones:
+            deleted[kind].append(object_id)
+
+    return {
+        'books': books.order_by('id'),
+        'series': series.order_by('id'),
+        'statuses': statuses.order_by('id'),
+        'deleted': deleted,
+        'full': full,
+        'next': encode_sync_cursor(version, now),
+    }
@@ -0,0 +1,109 @@
+# api/tags.py
+
+from django.db.models import Q
+
+from .models import BookTag, Tag, TAG_SEPARATOR, tag_parent_name, tag_depth
+
+
+def subtree_filter(name):
+    """ a tag and every tag nested under it: 'fiction' also matches 'fiction__fantasy' """
+    return Q(name=name) | Q(name__startswith=name + TAG_SEPARATOR)
+
+
+def tag_books(user, books_and_names):
+    """
+    Unsaved BookTags giving each (book, tag name) pair its tag, for a bulk_create.
+    Any tags that don't exist yet are created, in one INSERT per level of nesting.
+    """
+    tags = Tag.objects.named(user, {name for _, name in books_and_names})
+    return [BookTag(book=book, tag=tags[name], user=user) for book, name in books_and_names]
+
+
+def rename_tag(tag, new_name):
+    """
+    Give a tag a new name, along with every tag nested under it (fiction__fantasy becomes
+    books__fantasy when fiction becomes books), and return the tag that now has the name.
+
+    If the user already has a tag with the new name, the two are merged: books are moved
+    over to it, keeping their BookTag rows, and the old tag is deleted.
+
+    Raises ValueError if the new name is nested under the old one.
+    """
+    old_name = tag.name
+    if new_name == old_name:
+        return tag
+    if new_name.startswith(old_name + TAG_SEPARATOR):
+        raise ValueError("Can't nest the tag '%s' under itself" %(old_name))
+
+    # taken before the tag moves, since its new parent may be one of them
+    children = list(tag.children.all())
+
+    target = Tag.objects.filter(user_id=tag.user_id, name=new_name).first()
+    if target is None:
+        parent_name = tag_parent_name(new_name)
+        tag.name = new_name
+        tag.parent = None if parent_name is None else Tag.objects.named(tag.user_id, [parent_name])[parent_name]
+        tag.depth = tag_depth(new_name)
+        # not book_count: the triggers keep it, and the copy loaded here may be out of date
+        tag.save(update_fields=['name', 'parent', 'depth'])
+        target = tag
+    else:
+        # a book that already has the target tag just loses this one
+        tagged = BookTag.objects.filter(tag=target).values('book_id')
+        BookTag.objects.filter(tag=tag, book_id__in=tagged).delete()
+        BookTag.objects.filter(tag=tag).update(tag=target)
+
+    for child in children:
+        rename_tag(child, new_name + child.name[len(old_name):])
+
+    if target != tag:
+        tag.delete()
+    return target
+
+
+def prune_tags(user):
+    """
+    Delete the user's tags that neither they, nor any tag nested under them, give a book.
+    Tags are kept while books have them, so that their names can be reused.
+    """
+    # book_count covers the tags nested under a tag too, so a tag with none has none below it
+    Tag.objects.filter(user=user, book_count=0).delete()
+
+
+def subtree_book_ids(user, name):
+    """
+    The ids of the user's books that have a tag or a tag nested under it, in order, each once.
+    One query: the tags come from the (user, name) prefix index, their books from (tag, book).
+    """
+    tags = Tag.objects.filter(subtree_filter(name), user=user)
+    return BookTag.objects.filter(tag__in=tags).values_list(
+        'book_id', flat=True).distinct().order_by('book_id')
+
+
+def tag_tree(user):
+    """
+    The user's tags nested into a tree, from one query of their Tag rows:
+    [{ 'tag_name': 'fiction', 'depth': 0, 'book_count': 12, 'children': [...] }]
+    with each level in order of name.
+    """
+    nodes = {}
+    roots = []
+    rows = Tag.objects.filter(user=user).order_by('name').values_list(
+        'id', 'parent_id', 'name', 'depth', 'book_count')
+    for tag_id, parent_id, name, depth, book_count in rows:
+        nodes[tag_id] = (parent_id, {
+            'tag_name': name,
+            'depth': depth,
+            'book_count': book_count,
+            'children': [],
+        })
+
+    # a child's name starts with its parent's, so parents sort first; attaching children only
+    # once every node exists just doesn't depend on the collation agreeing. Either way each
+    # level keeps the order of the rows
+    for parent_id, node in nodes.values():
+        if parent_id is None:
+            roots.append(node)
+        else:
+            nodes[parent_id][1]['children'].append(node)
+    return roots
@@ -0,0 +1,88 @@
+from django.urls import reverse
+from django.test import TestCase
+from rest_framework.test import APITestCase
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from unittest import skip
+
+from .models import Book, Author, BookAuthor
+
+from django.apps import apps
+User = apps.get_model('userauth','User')
+
+
+class GetAuthorBooksTest(APITestCase):
+    """ Test module for getting the books of one of a User's Authors """
+
+    def setUp(self):
+        self.user = User.objects.create(
+            username="AuthorUser", password="password")
+        self.token = str(self.user.auth_token)
+
+    def test_can_get_an_authors_books(self):
+        book_one = Book.objects.create(
+            title="AuthorTestBookOne", user=self.user)
+        book_two = Book.objects.create(
+            title="AuthorTestBookTwo", user=self.user)
+        other_book = Book.objects.create(
+            title="AuthorTestBookThree", user=self.user)
+        author = BookAuthor.objects.create(
+            author_name="Ursula K. Le Guin", user=self.user, book=book_two)
+        BookAuthor.objects.create(
+            author_name="Ursula K. Le Guin", user=self.user, book=book_one)
+        BookAuthor.objects.create(
+            author_name="Octavia E. Butler", user=self.user, book=other_book)
+
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.token)
+        url = reverse('author_books', kwargs={"author_id": author.author_id})
+        response = self.client.get(url, format='json')
+
+        expected_data = {
+            "authors": [{
+                "id": author.author_id,
+                "name": "Ursula K. Le Guin",
+                "count": 2,
+                "books": [book_one.id, book_two.id]
+            }]
+        }
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data, expected_data)
+
+    def test_returns_an_empty_list_for_an_author_without_books(self):
+        book = Book.objects.create(
+            title="AuthorTestBook", user=self.user)
+        author = BookAuthor.objects.create(
+            author_name="Ursula K. Le Guin", user=self.user, book=book)
+        book.delete()
+
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.token)
+        url = reverse('author_books', kwargs={"author_id": author.author_id})
+        response = self.client.get(url, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["authors"][0]["count"], 0)
+        self.assertEqual(response.data["authors"][0]["books"], [])
+
+    def test_cannot_get_another_users_author(self):
+        other_user = User.objects.create(
+            username="OtherAuthorUser", password="password")
+        other_book = Book.objects.create(
+            title="OtherUsersBook", user=other_user)
+        author = BookAuthor.objects.create(
+            author_name="Ursula K. Le Guin", user=other_user, book=other_book)
+
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.token)
+        url = reverse('author_books', kwargs={"author_id": author.author_id})
+        response = self.client.get(url, format='json')
+
+        expected_data = {
+            "error": "Could not find author with ID: %s" %(author.author_id)
+        }
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data, expected_data)
+
+    def test_returns_error_if_unauthorized(self):
+        url = reverse('author_books', kwargs={"author_id": 1})
+        response = self.client.get(url, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
@@ -0,0 +1,88 @@
+from django.urls import reverse
+from django.test import TestCase
+from rest_framework.test import APITestCase
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from unittest import skip
+
+from .models import Book, Author, BookAuthor
+
+from django.apps import apps
+User = apps.get_model('userauth','User')
+
+
+class GetAuthorsTest(APITestCase):
+    """ Test module for getting a list of a User's Authors """
+
+    def setUp(self):
+        self.user = User.objects.create(
+            username="AuthorUser", password="password")
+        self.token = str(self.user.auth_token)
+
+    def test_can_access_a_users_authors_with_book_counts(self):
+        book_one = Book.objects.create(
+            title="AuthorTestBookOne", user=self.user)
+        book_two = Book.objects.create(
+            title="AuthorTestBookTwo", user=self.user)
+        le_guin = BookAuthor.objects.create(
+            author_name="Ursula K. Le Guin", user=self.user, book=book_one)
+        BookAuthor.objects.create(
+            author_name="ursula k. le guin", user=self.user, book=book_two)
+        butler = BookAuthor.objects.create(
+            author_name="Octavia E. Butler", user=self.user, book=book_two)
+
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.token)
+        url = reverse('authors')
+        response = self.client.get(url, format='json')
+
+        expected_data = {
+            "authors": [
+                {
+                    "id": butler.author_id,
+                    "name": "Octavia E. Butler",
+                    "count": 1
+                },
+                {
+                    "id": le_guin.author_id,
+                    "name": "Ursula K. Le Guin",
+                    "count": 2
+                },
+            ]
+        }
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data, expected_data)
+
+    def test_leaves_out_authors_without_books(self):
+        book = Book.objects.create(
+            title="AuthorTestBook", user=self.user)
+        BookAuthor.objects.create(
+            author_name="Ursula K. Le Guin", user=self.user, book=book)
+        book.delete()
+
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.token)
+        url = reverse('authors')
+        response = self.client.get(url, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data, {"authors": []})
+
+    def test_only_returns_the_users_authors(self):
+        other_user = User.objects.create(
+            username="OtherAuthorUser", password="password")
+        other_book = Book.objects.create(
+            title="OtherUsersBook", user=other_user)
+        BookAuthor.objects.create(
+            author_name="Ursula K. Le Guin", user=other_user, book=other_book)
+
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.token)
+        url = reverse('authors')
+        response = self.client.get(url, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data, {"authors": []})
+
+    def test_returns_error_if_unauthorized(self):
+        url = reverse('authors')
+        response = self.client.get(url, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
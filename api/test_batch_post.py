@@ -0,0 +1,175 @@
+from django.urls import reverse
+from django.test import TestCase
+from rest_framework.test import APITestCase
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from unittest import skip
+import datetime
+import pytz
+
+from .models import Book, BookTag, BookStatus
+from .batch import MAX_BATCH_OPERATIONS
+
+from django.apps import apps
+User = apps.get_model('userauth','User')
+
+
+class PostBatchTest(APITestCase):
+    """ Test module for running several operations in one request """
+
+    def setUp(self):
+        self.user = User.objects.create(
+            username='Bertie', password='password')
+        self.token = str(self.user.auth_token)
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.token)
+        self.url = reverse('batch')
+        self.book = Book.objects.create(
+            title="Batch Book", user=self.user,
+            current_status_date=pytz.utc.localize(datetime.datetime(2021, 1, 1)))
+
+    def finish_book_operations(self):
+        date = pytz.utc.localize(datetime.datetime(2021, 1, 16)).isoformat()
+        return [
+            {
+                "method": "POST",
+                "path": "status/%s/" %(self.book.id),
+                "body": {"status_code": Book.COMPLETED, "date": date}
+            },
+            {
+                "method": "PUT",
+                "path": "rating/%s/" %(self.book.id),
+                "body": {"rating": 4}
+            },
+            {
+                "method": "PUT",
+                "path": "books/%s/" %(self.book.id),
+                "body": {"tags": ["finished"]}
+            },
+        ]
+
+    def test_can_run_several_operations_in_order(self):
+        data = {"operations": self.finish_book_operations()}
+
+        response = self.client.post(self.url, data, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [result['status'] for result in response.data['results']],
+            [status.HTTP_201_CREATED, status.HTTP_200_OK, status.HTTP_200_OK])
+        self.assertEqual(response.data['results'][1]['body']['books'][0]['rating'], 4)
+        # the last operation sees what the ones before it did
+        final_book = response.data['results'][2]['body']['books'][0]
+        self.assertEqual(final_book['current_status'], Book.COMPLETED)
+        self.assertEqual(final_book['rating'], 4)
+        self.assertEqual(final_book['tags'], ["finished"])
+
+        book = Book.objects.get(id=self.book.id)
+        self.assertEqual(book.current_status, Book.COMPLETED)
+        self.assertEqual(book.rating, 4)
+
+    def test_can_read_in_a_batch(self):
+        data = {
+            "operations": [
+                {"method": "PUT", "path": "rating/%s/" %(self.book.id), "body": {"rating": 5}},
+                {"method": "GET", "path": "books/?fields=id,rating"},
+            ]
+        }
+
+        response = self.client.post(self.url, data, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['results'][1]['status'], status.HTTP_200_OK)
+        self.assertEqual(
+            response.data['results'][1]['body']['books'], [{"id": self.book.id, "rating": 5}])
+
+    def test_a_failed_operation_undoes_the_whole_batch(self):
+        operations = self.finish_book_operations()
+        operations[2] = {
+            "method": "PUT",
+            "path": "rating/%s/" %(self.book.id),
+            "body": {"rating": 11}
+        }
+        data = {"operations": operations}
+
+        response = self.client.post(self.url, data, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data['error'], "Operation 2 failed, so no changes were saved")
+        self.assertEqual(
+            [result['status'] for result in response.data['results']],
+            [status.HTTP_201_CREATED, status.HTTP_200_OK, status.HTTP_400_BAD_REQUEST])
+        self.assertEqual(response.data['results'][2]['body'], {"error": "11 is not a valid rating"})
+
+        book = Book.objects.get(id=self.book.id)
+        self.assertNotEqual(book.current_status, Book.COMPLETED)
+        self.assertNotEqual(book.rating, 4)
+        self.assertFalse(BookStatus.objects.filter(book=book, status_code=Book.COMPLETED).exists())
+
+    def test_operations_run_as_the_batchs_user(self):
+        other_user = User.objects.create(
+            username='OtherBatchUser', password='password')
+        other_book = Book.objects.create(
+            title="Other Batch Book", user=other_user)
+        data = {
+            "operations": [
+                {"method": "PUT", "path": "rating/%s/" %(other_book.id), "body": {"rating": 1}},
+            ]
+        }
+
+        response = self.client.post(self.url, data, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(
+            response.data['results'][0]['body'], {"error": "Could not find book with ID: %s" %(other_book.id)})
+
+    def test_checks_every_operation_before_running_any(self):
+        operations = self.finish_book_operations()
+        operations.append({"method": "GET", "path": "nowhere/"})
+        data = {"operations": operations}
+
+        response = self.client.post(self.url, data, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data, {"error": "Operation 3: No endpoint matches 'nowhere/'"})
+        self.assertEqual(Book.objects.get(id=self.book.id).rating, self.book.rating)
+
+    def test_returns_error_for_invalid_operations(self):
+        invalid = [
+            ("not an operation", "Invalid operation"),
+            ({"method": "PATCH", "path": "books/"}, "method must be one of GET, POST, PUT, DELETE"),
+            ({"method": "GET"}, "path must be a string"),
+            ({"method": "POST", "path": "batch/"}, "batch/ can't be run in a batch"),
+            ({"method": "GET", "path": "export/"}, "export/ can't be run in a batch"),
+        ]
+        for operation, error in invalid:
+            with self.subTest(operation=operation):
+                response = self.client.post(self.url, {"operations": [operation]}, format='json')
+
+                self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+                self.assertEqual(response.data, {"error": "Operation 0: %s" %(error)})
+
+    def test_returns_error_if_not_given_operations(self):
+        for data in [{}, {"operations": []}, {"operations": "books/"}, []]:
+            with self.subTest(data=data):
+                response = self.client.post(self.url, data, format='json')
+
+                self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+                self.assertEqual(response.data, {"error": "Expected a list of operations"})
+
+    def test_returns_error_if_given_too_many_operations(self):
+        data = {
+            "operations": [{"method": "GET", "path": "books/"}] * (MAX_BATCH_OPERATIONS + 1)
+        }
+
+        response = self.client.post(self.url, data, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(
+            response.data,
+            {"error": "Too many operations; at most %s can be run at once" %(MAX_BATCH_OPERATIONS)})
+
+    def test_returns_error_if_unauthorized(self):
+        self.client.credentials()
+        response = self.client.post(self.url, {"operations": self.finish_book_operations()}, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
@@ -0,0 +1,126 @@
+from django.test import TestCase
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from io import StringIO
+import json
+import os
+import tempfile
+
+from .models import Book, BookAuthor, BookTag
+from .benchmark import parse_mix, percentile, find_regressions
+
+from django.apps import apps
+User = apps.get_model('userauth','User')
+
+
+class BenchmarkApiCommandTest(TestCase):
+    """ Test module for the benchmark_api management command """
+
+    def setUp(self):
+        self.user = User.objects.create(username='Bertie')
+        self.user.set_password('password')
+        self.user.save()
+        for i in range(5):
+            book = Book.objects.create(title="Book %s" % (i), user=self.user)
+            BookAuthor.objects.create(author_name="Author %s" % (i), book=book, user=self.user)
+            BookTag.objects.create(tag_name="fiction__fantasy", book=book, user=self.user)
+
+        baseline_file, self.baseline_path = tempfile.mkstemp(suffix='.json')
+        os.close(baseline_file)
+        self.addCleanup(os.remove, self.baseline_path)
+
+    def benchmark(self, *args):
+        out = StringIO()
+        call_command(
+            'benchmark_api', '--username', 'Bertie', '--concurrency', '1', '--warmup', '0', '--seed', '1',
+            *args, stdout=out, stderr=StringIO())
+        return out.getvalue()
+
+    def test_reports_every_endpoint_in_the_mix(self):
+        output = self.benchmark('--requests', '80', '--save-baseline', self.baseline_path)
+
+        with open(self.baseline_path) as baseline_file:
+            summary = json.load(baseline_file)
+
+        self.assertEqual(summary['overall']['requests'], 80)
+        self.assertEqual(summary['overall']['errors'], 0)
+        self.assertEqual(
+            sorted(summary['endpoints']),
+            sorted(['auth-token', 'book', 'books', 'rating', 'series', 'status', 'tag', 'tags']))
+        # library version and books, plus the rest of the books, their authors and tags whenever
+        # a write has dropped one from the book cache; the token was cached while the library was loaded
+        self.assertGreaterEqual(summary['endpoints']['books']['queries_per_request'], 2)
+        self.assertLessEqual(summary['endpoints']['books']['queries_per_request'], 5)
+        for key in ['p50_ms', 'p95_ms', 'p99_ms', 'requests_per_second']:
+            self.assertGreater(summary['overall'][key], 0)
+        self.assertIn('overall', output)
+
+    def test_writes_leave_the_library_unchanged(self):
+        ratings = list(Book.objects.order_by('id').values_list('rating', flat=True))
+
+        self.benchmark('--requests', '40', '--mix', 'tag=1,rating=1')
+
+        self.assertEqual(list(Book.objects.order_by('id').values_list('rating', flat=True)), ratings)
+        self.assertEqual(BookTag.objects.filter(tag__name="fiction__fantasy").count(), 5)
+
+    def test_passes_against_its_own_baseline(self):
+        self.benchmark('--requests', '20', '--mix', 'books=1', '--save-baseline', self.baseline_path)
+
+        output = self.benchmark('--requests', '20', '--mix', 'books=1',
+                                '--baseline', self.baseline_path, '--tolerance', '100')
+
+        self.assertIn('no regressions', output)
+
+    def test_fails_when_queries_go_up(self):
+        self.benchmark('--requests', '5', '--mix', 'books=1', '--save-baseline', self.baseline_path)
+        with open(self.baseline_path) as baseline_file:
+            baseline = json.load(baseline_file)
+        baseline['endpoints']['books']['queries_per_request'] = 1
+        with open(self.baseline_path, 'w') as baseline_file:
+            json.dump(baseline, baseline_file)
+
+        with self.assertRaises(CommandError):
+            self.benchmark('--requests', '5', '--mix', 'books=1',
+                           '--baseline', self.baseline_path, '--tolerance', '100')
+
+    def test_rejects_unknown_users_and_endpoints(self):
+        with self.assertRaises(CommandError):
+            self.benchmark('--mix', 'bookz=1')
+        with self.assertRaises(CommandError):
+            call_command('benchmark_api', '--username', 'Nobody', stdout=StringIO())
+
+
+class BenchmarkHelpersTest(TestCase):
+    """ Test module for the statistics behind benchmark_api """
+
+    def test_parse_mix(self):
+        self.assertEqual(parse_mix('books=3, book=1'), {'books': 3, 'book': 1})
+        with self.assertRaises(ValueError):
+            parse_mix('books=0')
+        with self.assertRaises(ValueError):
+            parse_mix('books=many')
+
+    def test_percentile_uses_nearest_rank(self):
+        values = list(range(1, 101))
+
+        self.assertEqual(percentile(values, 0.50), 50)
+        self.assertEqual(percentile(values, 0.95), 95)
+        self.assertEqual(percentile(values, 0.99), 99)
+        self.assertEqual(percentile([7], 0.99), 7)
+
+    def test_find_regressions_allows_for_tolerance(self):
+        baseline = {
+            'endpoints': {'book': {'p50_ms': 10, 'p95_ms': 20, 'p99_ms': 30, 'queries_per_request': 3}},
+            'overall': {'requests_per_second': 100},
+        }
+        summary = {
+            'endpoints': {'book': {'p50_ms': 11, 'p95_ms': 30, 'p99_ms': 30, 'queries_per_request': 3}},
+            'overall': {'requests_per_second': 70},
+        }
+
+        regressions = find_regressions(summary, baseline, 0.2)
+
+        self.assertEqual(regressions, [
+            "book p95_ms: 30.00 ms, was 20.00 ms",
+            "requests_per_second: 70.0, was 100.0",
+        ])
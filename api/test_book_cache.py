@@ -0,0 +1,143 @@
+from django.urls import reverse
+from django.test import TestCase
+from django.core.cache import cache
+from rest_framework.test import APITestCase
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from unittest import skip
+import json
+
+from .models import Book, BookAuthor, Series, BookTag, BookStatus
+from .book_cache import book_cache_key
+from booktracker.metrics import registry
+
+from django.apps import apps
+User = apps.get_model('userauth','User')
+
+
+class BookCacheTest(APITestCase):
+    """ Test module for the per-user cache of serialized books """
+
+    def setUp(self):
+        cache.clear()
+        registry.reset()
+        self.user = User.objects.create(
+            username='Bertie', password='password')
+        self.token = str(self.user.auth_token)
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.token)
+
+        self.series = Series.objects.create(name="Cached Series", planned_count=2, user=self.user)
+        self.book = Book.objects.create(title="Cached Book", series=self.series, user=self.user)
+        BookAuthor.objects.create(author_name="Cached Author", book=self.book, user=self.user)
+        BookTag.objects.create(tag_name="fiction", book=self.book, user=self.user)
+        BookTag.objects.create(tag_name="fiction__fantasy", book=self.book, user=self.user)
+
+    def get_book(self):
+        response = self.client.get(reverse('book', kwargs={'book_id': self.book.id}))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.data['book']
+
+    def cached_entry(self):
+        return cache.get(book_cache_key(self.user.id, self.book.id))
+
+    def test_repeated_gets_are_served_from_the_cache(self):
+        first = self.get_book()
+        second = self.client.get(reverse('books')).data['books'][0]
+
+        self.assertEqual(first, second)
+        self.assertEqual(registry.counters['booktracker_book_cache_misses_total'], 1)
+        self.assertEqual(registry.counters['booktracker_book_cache_hits_total'], 1)
+
+        # library version, then the count and the row for the book; the token and the book are cached
+        with self.assertNumQueries(3):
+            self.get_book()
+
+    def test_book_put_replaces_the_cached_book(self):
+        self.get_book()
+
+        url = reverse('book', kwargs={'book_id': self.book.id})
+        response = self.client.put(url, {'title': "New Title", 'authors': ["New Author"]}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIsNone(self.cached_entry())
+
+        book = self.get_book()
+        self.assertEqual(book['title'], "New Title")
+        self.assertEqual(book['authors'], ["New Author"])
+
+    def test_book_delete_forgets_the_cached_book(self):
+        self.get_book()
+
+        response = self.client.delete(reverse('book', kwargs={'book_id': self.book.id}))
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIsNone(self.cached_entry())
+        self.assertEqual(self.client.get(reverse('books')).data['books'], [])
+
+    def test_rating_put_replaces_the_cached_book(self):
+        self.get_book()
+
+        url = reverse('rating', kwargs={'book_id': self.book.id})
+        self.client.put(url, {'rating': Book.FIVE}, format='json')
+
+        self.assertIsNone(self.cached_entry())
+        self.assertEqual(self.get_book()['rating'], Book.FIVE)
+
+    def test_tag_rename_replaces_the_cached_books(self):
+        self.get_book()
+
+        url = reverse('tag', kwargs={'tag_name': 'fiction'})
+        self.client.put(url, {'new_name': 'novels', 'books': [self.book.id]}, format='json')
+
+        self.assertIsNone(self.cached_entry())
+        self.assertEqual(sorted(self.get_book()['tags']), ['novels', 'novels__fantasy'])
+
+    def test_tag_delete_replaces_the_cached_books(self):
+        self.get_book()
+
+        self.client.delete(reverse('tag', kwargs={'tag_name': 'fiction__fantasy'}))
+
+        self.assertIsNone(self.cached_entry())
+        self.assertEqual(self.get_book()['tags'], ['fiction'])
+
+    def test_status_post_and_delete_replace_the_cached_book(self):
+        self.get_book()
+
+        url = reverse('bookstatus', kwargs={'id': self.book.id})
+        data = {'status_code': Book.CURRENT, 'date': '2100-01-01T00:00:00Z'}
+        response = self.client.post(url, data, format='json')
+        self.assertIsNone(self.cached_entry())
+        self.assertEqual(self.get_book()['current_status'], Book.CURRENT)
+
+        url = reverse('bookstatus', kwargs={'id': response.data['status']['id']})
+        self.client.delete(url)
+        self.assertIsNone(self.cached_entry())
+        self.book.refresh_from_db()
+        self.assertEqual(self.get_book()['current_status'], self.book.current_status)
+
+    def test_series_delete_replaces_the_cached_books(self):
+        self.get_book()
+
+        self.client.delete(reverse('series_details', kwargs={'series_id': self.series.id}))
+
+        self.assertIsNone(self.cached_entry())
+        self.assertIsNone(self.get_book()['series'])
+
+    def test_writes_outside_the_views_are_not_served_stale(self):
+        self.get_book()
+
+        # nothing forgets the cached book, but its updated_at no longer matches
+        Book.objects.filter(id=self.book.id).update(title="Changed Elsewhere")
+        BookAuthor.objects.create(author_name="Second Author", book=self.book, user=self.user)
+
+        book = self.get_book()
+        self.assertEqual(book['title'], "Changed Elsewhere")
+        self.assertEqual(book['authors'], ["Cached Author", "Second Author"])
+
+    def test_cache_is_kept_per_user(self):
+        self.get_book()
+        other_user = User.objects.create(username='Wooster', password='password')
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + str(other_user.auth_token))
+
+        response = self.client.get(reverse('book', kwargs={'book_id': self.book.id}))
+
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
@@ -403,3 +403,38 @@ class GetBookDetailsTest(APITestCase):
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertEqual(response.data['book']['id'], book.id)
         self.assertEqual(response.data['book']['rating'], rating)
+
+    def test_can_get_only_some_fields(self):
+        book = Book.objects.create(title="Sparse Book", description="Long", user=self.user)
+        BookTag.objects.create(tag_name="fiction", user=self.user, book=book)
+
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.token)
+        url = reverse('book', kwargs={'book_id': book.id})
+        response = self.client.get(url, {'fields': 'title,tags'})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['book'], {'id': book.id, 'title': "Sparse Book", 'tags': ["fiction"]})
+
+        response = self.client.get(url, {'exclude': 'description'})
+        self.assertNotIn('description', response.data['book'])
+        self.assertEqual(response.data['book']['tags'], ["fiction"])
+
+    def test_sparse_fields_still_check_ownership(self):
+        other_user = User.objects.create(username='Wooster', password='password')
+        book = Book.objects.create(title="Someone Else's Book", user=other_user)
+
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.token)
+        url = reverse('book', kwargs={'book_id': book.id})
+        response = self.client.get(url, {'fields': 'title'})
+
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_unknown_fields_return_error(self):
+        book = Book.objects.create(title="Sparse Book", user=self.user)
+
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.token)
+        url = reverse('book', kwargs={'book_id': book.id})
+        response = self.client.get(url, {'exclude': 'nonsense'})
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data, {"error": "Unknown field: nonsense"})
@@ -57,15 +57,15 @@ class UpdateBookTests(APITestCase):
 
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         # should have generated two bookauthor rows
-        filtered_authors_one = BookAuthor.objects.filter(author_name=author_one, book=self.first_book)
-        filtered_authors_two = BookAuthor.objects.filter(author_name=author_two, book=self.first_book)
+        filtered_authors_one = BookAuthor.objects.filter(author__name=author_one, book=self.first_book)
+        filtered_authors_two = BookAuthor.objects.filter(author__name=author_two, book=self.first_book)
         self.assertTrue(filtered_authors_one.exists())
         self.assertTrue(filtered_authors_two.exists())
         self.assertEqual(filtered_authors_one[0].author_name, author_one)
         self.assertEqual(filtered_authors_two[0].author_name, author_two)
         # should have generated two booktag row
-        filtered_tags_one = BookTag.objects.filter(tag_name=tag_one, user=self.user, book=self.first_book)
-        filtered_tags_two = BookTag.objects.filter(tag_name=tag_two, user=self.user, book=self.first_book)
+        filtered_tags_one = BookTag.objects.filter(tag__name=tag_one, user=self.user, book=self.first_book)
+        filtered_tags_two = BookTag.objects.filter(tag__name=tag_two, user=self.user, book=self.first_book)
         self.assertTrue(filtered_tags_one.exists())
         self.assertTrue(filtered_tags_two.exists())
         self.assertEqual(filtered_tags_one[0].tag_name, tag_one)
@@ -82,7 +82,7 @@ class UpdateBookTests(APITestCase):
 
         # find authors of this book
         authors = BookAuthor.objects.filter(book=updated_book)
-        author_values = authors.values_list('author_name', flat=True)
+        author_values = authors.values_list('author__name', flat=True)
         
         self.assertEqual(authors.count(), 2)
         self.assertTrue("New Author" in author_values)
@@ -111,7 +111,7 @@ class UpdateBookTests(APITestCase):
 
         # find authors of this book
         authors = BookAuthor.objects.filter(book=updated_book)
-        author_values = authors.values_list('author_name', flat=True)
+        author_values = authors.values_list('author__name', flat=True)
         
         self.assertEqual(authors.count(), 2)
         self.assertTrue(author_one in author_values)
@@ -201,7 +201,7 @@ class UpdateBookTests(APITestCase):
         BookTag.objects.create(
             tag_name=tag_name, user=self.user, book=book)
 
-        filtered_tags_before = BookTag.objects.filter(tag_name=tag_name, user=self.user, book=book)
+        filtered_tags_before = BookTag.objects.filter(tag__name=tag_name, user=self.user, book=book)
         self.assertTrue(filtered_tags_before.exists())
         self.assertEqual(filtered_tags_before.count(), 1)
 
@@ -217,7 +217,7 @@ class UpdateBookTests(APITestCase):
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         
         # should NOT have generated a booktag row
-        filtered_tags_after = BookTag.objects.filter(tag_name=tag_name, user=self.user, book=book)
+        filtered_tags_after = BookTag.objects.filter(tag__name=tag_name, user=self.user, book=book)
 
         self.assertTrue(filtered_tags_after.exists())
         self.assertEqual(filtered_tags_after.count(), 1)
@@ -244,7 +244,7 @@ class UpdateBookTests(APITestCase):
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         
         # should NOT have generated a booktag row
-        filtered_tags_after = BookTag.objects.filter(tag_name=tag_name, user=self.user, book=book)
+        filtered_tags_after = BookTag.objects.filter(tag__name=tag_name, user=self.user, book=book)
 
         self.assertTrue(filtered_tags_after.exists())
         self.assertEqual(filtered_tags_after.count(), 1)
@@ -261,7 +261,7 @@ class UpdateBookTests(APITestCase):
         BookTag.objects.create(
             tag_name=tag_name, user=self.user, book=book)
 
-        filtered_tags_before = BookTag.objects.filter(tag_name=tag_name, user=self.user, book=book)
+        filtered_tags_before = BookTag.objects.filter(tag__name=tag_name, user=self.user, book=book)
         self.assertTrue(filtered_tags_before.exists())
         self.assertEqual(filtered_tags_before.count(), 1)
 
@@ -280,12 +280,12 @@ class UpdateBookTests(APITestCase):
         self.assertEqual(all_tags_for_book.count(), 1)
         
         # should have generated a booktag row
-        filtered_tags_after = BookTag.objects.filter(tag_name=new_tag_name, user=self.user, book=book)
+        filtered_tags_after = BookTag.objects.filter(tag__name=new_tag_name, user=self.user, book=book)
         self.assertTrue(filtered_tags_after.exists())
         self.assertEqual(filtered_tags_after.count(), 1)
 
         # should have removed old tag
-        filtered_tags_after_2 = BookTag.objects.filter(tag_name=tag_name, user=self.user, book=book)
+        filtered_tags_after_2 = BookTag.objects.filter(tag__name=tag_name, user=self.user, book=book)
         self.assertFalse(filtered_tags_after_2.exists())
         
         self.assertEqual(response.data['books'][0]['id'], book.id)
@@ -517,4 +517,84 @@ class UpdateBookTests(APITestCase):
 
         # find book in database
         updated_book = Book.objects.get(id=self.book_id)
-        self.assertEqual(updated_book.page_count, None)
\ No newline at end of file
+        self.assertEqual(updated_book.page_count, None)
+
+class UpdateBookQueryCountTests(APITestCase):
+    """ test module for the number of queries made when updating a book's authors and tags """
+
+    def setUp(self):
+        self.user = User.objects.create(
+            username='Bertie', password='password')
+        self.token = str(self.user.auth_token)
+        self.book = Book.objects.create(
+            title="First Book", user=self.user)
+        for index in range(30):
+            BookTag.objects.create(
+                tag_name="old tag %s" % (index), user=self.user, book=self.book)
+            BookAuthor.objects.create(
+                author_name="Old Author %s" % (index), user=self.user, book=self.book)
+
+    def test_replacing_many_tags_and_authors_takes_a_constant_number_of_queries(self):
+        new_tags = ["old tag %s" % (index) for index in range(15)] + \
+            ["new tag %s" % (index) for index in range(15)]
+        new_authors = ["New Author %s" % (index) for index in range(30)]
+        data = {
+            "authors": new_authors,
+            "tags": new_tags
+        }
+
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.token)
+        url = reverse('book', args=[self.book.id])
+        # token, book, savepoint, (select, delete, insert) for authors and for tags,
+        # book update, savepoint release, and the updated book with its authors and tags;
+        # plus finding the user's authors and tags, and creating (and reading back) the missing ones
+        with self.assertNumQueries(20):
+            response = self.client.put(url, data, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertCountEqual(response.data['books'][0]['tags'], new_tags)
+        self.assertCountEqual(response.data['books'][0]['authors'], new_authors)
+        self.assertEqual(BookTag.objects.filter(book=self.book).count(), 30)
+        self.assertEqual(BookAuthor.objects.filter(book=self.book).count(), 30)
+
+    def test_removes_duplicate_existing_names(self):
+        BookTag.objects.create(
+            tag_name="old tag 0", user=self.user, book=self.book)
+        data = {
+            "tags": ["old tag 0", "old tag 0"]
+        }
+
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.token)
+        url = reverse('book', args=[self.book.id])
+        response = self.client.put(url, data, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['books'][0]['tags'], ["old tag 0"])
+        self.assertEqual(BookTag.objects.filter(book=self.book).count(), 1)
+
+    def test_keeps_the_order_authors_are_given_in(self):
+        data = {
+            "authors": ["Old Author 2", "New Author", "Old Author 0"]
+        }
+
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.token)
+        url = reverse('book', args=[self.book.id])
+        response = self.client.put(url, data, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['books'][0]['authors'], data["authors"])
+        self.assertEqual(
+            list(BookAuthor.objects.filter(book=self.book).values_list('author__name', flat=True)),
+            data["authors"])
+
+    def test_stores_an_author_written_differently_once(self):
+        data = {
+            "authors": ["Ursula K. Le Guin", "ursula k.  le guin"]
+        }
+
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.token)
+        url = reverse('book', args=[self.book.id])
+        response = self.client.put(url, data, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['books'][0]['authors'], ["Ursula K. Le Guin"])
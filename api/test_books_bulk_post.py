@@ -0,0 +1,207 @@
+from django.urls import reverse
+from django.test import TestCase
+from rest_framework.test import APITestCase
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from unittest import skip
+import json
+
+from .models import Book, BookAuthor, Series, BookTag, BookStatus
+from .bulk import MAX_BULK_BOOKS
+
+from django.apps import apps
+User = apps.get_model('userauth','User')
+
+
+class PostBooksBulkTest(APITestCase):
+    """ Test module for posting many books to the database at once """
+
+    def setUp(self):
+        self.user = User.objects.create(
+            username='Bertie', password='password')
+        self.token = str(self.user.auth_token)
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.token)
+        self.url = reverse('books_bulk')
+
+    def test_can_add_a_list_of_books(self):
+        series = Series.objects.create(
+            name="Cool Series", planned_count=3, user=self.user)
+        data = [
+            {
+                "title": "First Bulk Book",
+                "authors": ["New Author"],
+                "tags": ["fiction", "fiction"],
+                "series": series.id,
+                "position_in_series": 1,
+            },
+            {
+                "title": "Second Bulk Book",
+                "authors": ["Other Author", "Third Author"],
+                "page_count": 300,
+            },
+        ]
+
+        response = self.client.post(self.url, data, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(len(response.data['books']), 2)
+        first_book = Book.objects.get(title="First Bulk Book")
+        second_book = Book.objects.get(title="Second Bulk Book")
+        self.assertEqual(response.data['books'][0]['id'], first_book.id)
+        self.assertEqual(response.data['books'][0]['series'], series.id)
+        self.assertEqual(response.data['books'][0]['position_in_series'], 1)
+        self.assertEqual(response.data['books'][0]['tags'], ["fiction"])
+        self.assertEqual(response.data['books'][1]['id'], second_book.id)
+        self.assertEqual(response.data['books'][1]['page_count'], 300)
+        self.assertCountEqual(response.data['books'][1]['authors'], ["Other Author", "Third Author"])
+
+        self.assertEqual(BookAuthor.objects.filter(user=self.user).count(), 3)
+        self.assertEqual(BookTag.objects.filter(user=self.user).count(), 1)
+
+    def test_books_are_given_a_status_and_status_history(self):
+        data = [{"title": "First Bulk Book", "authors": ["New Author"]}]
+
+        response = self.client.post(self.url, data, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        new_book = Book.objects.get(title="First Bulk Book")
+        self.assertEqual(new_book.current_status, Book.WANTTOREAD)
+        statuses = BookStatus.objects.filter(user=self.user, book=new_book)
+        self.assertEqual(statuses.count(), 1)
+        self.assertEqual(statuses[0].status_code, Book.WANTTOREAD)
+        self.assertEqual(statuses[0].date, new_book.current_status_date)
+
+    def test_can_add_books_wrapped_in_a_books_key(self):
+        data = {"books": [{"title": "First Bulk Book", "authors": ["New Author"]}]}
+
+        response = self.client.post(self.url, data, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['books'][0]['title'], "First Bulk Book")
+
+    def test_can_add_books_as_ndjson(self):
+        lines = [
+            json.dumps({"title": "First Bulk Book", "authors": ["New Author"]}),
+            json.dumps({"title": "Second Bulk Book", "authors": ["New Author"]}),
+        ]
+        body = "\n".join(lines) + "\n"
+
+        response = self.client.post(self.url, body, content_type='application/x-ndjson')
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(
+            [book['title'] for book in response.data['books']],
+            ["First Bulk Book", "Second Bulk Book"])
+
+    def test_rejects_invalid_ndjson(self):
+        body = '{"title": "First Bulk Book", "authors": ["New Author"]}\n{"title": \n'
+
+        response = self.client.post(self.url, body, content_type='application/x-ndjson')
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(Book.objects.count(), 0)
+
+    def test_creates_nothing_if_any_book_is_invalid(self):
+        other_user = User.objects.create(
+            username='Caspar', password='password')
+        other_series = Series.objects.create(
+            name="Not Your Series", planned_count=3, user=other_user)
+        data = [
+            {"title": "Valid Book", "authors": ["New Author"]},
+            {"title": "Missing Authors"},
+            {"title": "Other User's Series", "authors": ["New Author"], "series": other_series.id},
+            {"title": "Bad Page Count", "authors": ["New Author"], "page_count": "many"},
+        ]
+
+        response = self.client.post(self.url, data, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data['error'], "Invalid book parameters")
+        self.assertEqual([error['index'] for error in response.data['errors']], [1, 2, 3])
+        self.assertEqual(Book.objects.count(), 0)
+        self.assertEqual(BookAuthor.objects.count(), 0)
+
+    def test_rejects_books_the_database_would_refuse(self):
+        long_name = "x" * 256
+        invalid = [
+            ({"title": long_name}, "title must be a non-empty string of at most 255 characters"),
+            ({"title": ""}, "title must be a non-empty string of at most 255 characters"),
+            ({"title": 5}, "title must be a non-empty string of at most 255 characters"),
+            ({"publisher": long_name}, "publisher must be at most 255 characters"),
+            ({"publication_date": "x" * 51}, "publication_date must be at most 50 characters"),
+            ({"isbn_10": "1" * 21}, "isbn_10 must be at most 20 characters"),
+            ({"isbn_13": "1" * 21}, "isbn_13 must be at most 20 characters"),
+            ({"page_count": -1}, "page_count must not be negative"),
+            ({"position_in_series": -1}, "position_in_series must not be negative"),
+            ({"authors": [5]}, "every author must be a non-empty string of at most 255 characters"),
+            ({"authors": [""]}, "every author must be a non-empty string of at most 255 characters"),
+            ({"authors": [long_name]}, "every author must be a non-empty string of at most 255 characters"),
+            ({"tags": [5]}, "every tag must be a non-empty string of at most 255 characters"),
+            ({"tags": [" "]}, "every tag must be a non-empty string of at most 255 characters"),
+            ({"tags": [long_name]}, "every tag must be a non-empty string of at most 255 characters"),
+        ]
+        for fields, error in invalid:
+            with self.subTest(fields=fields):
+                book = {"title": "Valid Book", "authors": ["New Author"]}
+                book.update(fields)
+                data = [{"title": "Another Valid Book", "authors": ["New Author"]}, book]
+
+                response = self.client.post(self.url, data, format='json')
+
+                self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+                self.assertEqual(response.data['errors'], [{"index": 1, "error": error}])
+                self.assertEqual(Book.objects.count(), 0)
+
+    def test_accepts_fields_as_long_as_their_columns(self):
+        data = [{
+            "title": "x" * 255,
+            "authors": ["a" * 255],
+            "tags": ["t" * 255],
+            "publisher": "p" * 255,
+            "publication_date": "d" * 50,
+            "isbn_10": "1" * 20,
+            "isbn_13": "1" * 20,
+            "page_count": 0,
+            "position_in_series": 0,
+        }]
+
+        response = self.client.post(self.url, data, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(Book.objects.get(user=self.user).page_count, 0)
+
+    def test_rejects_an_empty_list(self):
+        response = self.client.post(self.url, [], format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data, {"error": "Expected a list of books"})
+
+    def test_rejects_too_many_books(self):
+        data = [{"title": "Book", "authors": ["Author"]}] * (MAX_BULK_BOOKS + 1)
+
+        response = self.client.post(self.url, data, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(Book.objects.count(), 0)
+
+    def test_query_count_does_not_grow_with_book_count(self):
+        data = [
+            {"title": "Book %s" % (index), "authors": ["Author"], "tags": ["tag"]}
+            for index in range(200)
+        ]
+
+        # token lookup, savepoint, four inserts, savepoint release, authors, tags;
+        # plus finding the user's authors and tags, and creating (and reading back) the missing ones
+        with self.assertNumQueries(15):
+            response = self.client.post(self.url, data, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(Book.objects.filter(user=self.user).count(), 200)
+
+    def test_returns_error_if_unauthorized(self):
+        self.client.credentials()
+        data = [{"title": "First Bulk Book", "authors": ["New Author"]}]
+
+        response = self.client.post(self.url, data, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
@@ -1,5 +1,7 @@
 from django.urls import reverse
-from django.test import TestCase
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.db import connection
 from rest_framework.test import APITestCase
 from rest_framework import status
 from rest_framework.authtoken.models import Token
@@ -8,7 +10,7 @@ from django.utils import timezone
 import datetime
 import pytz
 
-from .models import Book, BookAuthor
+from .models import Book, Author, BookAuthor, Tag, BookTag, Series
 from .serializers import BookSerializer, BookAuthorSerializer
 
 from django.apps import apps
@@ -146,3 +148,422 @@ class GetBooksTest(APITestCase):
         self.assertEqual(response.data['books'][0]['isbn_13'], new_book.isbn_13)
         self.assertEqual(response.data['books'][0]['page_count'], new_book.page_count)
         self.assertEqual(response.data['books'][0]['authors'][0], new_author.author_name)
+
+
+# the first request for a large library can outlast the token cache's few seconds
+@override_settings(TOKEN_CACHE_TIMEOUT=300)
+class GetBooksQueryCountTest(APITestCase):
+    """ Test module for the number of queries made when getting a User's books """
+
+    # token lookup, library version, books; then, for books not yet in the book cache,
+    # the rest of their columns, their authors and their tags
+    QUERY_BUDGET = 6
+    # library version, books; the token and every book are cached by the first request
+    WARM_QUERY_BUDGET = 2
+
+    def setUp(self):
+        self.user = User.objects.create(
+            username='Bertie', password='password')
+        self.token = str(self.user.auth_token)
+
+    def create_library(self, book_count):
+        # bulk_create keeps setting up a large library quick
+        books = Book.objects.bulk_create([
+            Book(title="Book %s" % (index), user=self.user)
+            for index in range(book_count)
+        ])
+        authors = Author.objects.named(self.user, ["Author %s" % (book.id) for book in books])
+        BookAuthor.objects.bulk_create([
+            BookAuthor(author=authors["Author %s" % (book.id)], user=self.user, book=book)
+            for book in books
+        ])
+        tags = Tag.objects.named(self.user, ["tag %s" % (index) for index in range(10)])
+        BookTag.objects.bulk_create([
+            BookTag(tag=tags["tag %s" % (book.id % 10)], user=self.user, book=book)
+            for book in books
+        ])
+
+    def assert_books_within_query_budget(self, book_count):
+        self.create_library(book_count)
+
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.token)
+        url = reverse('books')
+        with self.assertNumQueries(self.QUERY_BUDGET):
+            response = self.client.get(url, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data['books']), book_count)
+        self.assertEqual(len(response.data['books'][0]['authors']), 1)
+        self.assertEqual(len(response.data['books'][0]['tags']), 1)
+
+        with self.assertNumQueries(self.WARM_QUERY_BUDGET):
+            warm_response = self.client.get(url, format='json')
+
+        self.assertEqual(warm_response.data, response.data)
+
+    def test_query_count_with_ten_books(self):
+        self.assert_books_within_query_budget(10)
+
+    def test_query_count_with_one_thousand_books(self):
+        self.assert_books_within_query_budget(1000)
+
+    def test_query_count_with_ten_thousand_books(self):
+        self.assert_books_within_query_budget(10000)
+
+
+class GetBooksPaginationTest(APITestCase):
+    """ Test module for getting a User's books one page at a time """
+
+    def setUp(self):
+        self.user = User.objects.create(
+            username='Bertie', password='password')
+        self.token = str(self.user.auth_token)
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.token)
+
+    def get_all_pages(self, params):
+        url = reverse('books')
+        pages = []
+        response = self.client.get(url, params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        pages.append(response.data['books'])
+        while response.data['next'] is not None:
+            response = self.client.get(url, {'cursor': response.data['next'], 'page_size': params['page_size']})
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            pages.append(response.data['books'])
+        return pages
+
+    def test_unpaginated_response_has_no_cursor(self):
+        Book.objects.create(title="First Book", user=self.user)
+
+        url = reverse('books')
+        response = self.client.get(url, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotIn('next', response.data)
+
+    def test_can_page_through_books_by_id(self):
+        books = [Book.objects.create(title="Book %s" % (index), user=self.user) for index in range(5)]
+
+        pages = self.get_all_pages({'page_size': 2})
+
+        self.assertEqual([len(page) for page in pages], [2, 2, 1])
+        returned_ids = [book['id'] for page in pages for book in page]
+        self.assertEqual(returned_ids, [book.id for book in books])
+
+    def test_can_page_through_books_by_status_date(self):
+        same_date = pytz.utc.localize(datetime.datetime(2020, 1, 16))
+        book_one = Book.objects.create(
+            title="Newest", user=self.user, 
+            current_status_date=pytz.utc.localize(datetime.datetime(2020, 2, 1)))
+        book_two = Book.objects.create(
+            title="Tied One", user=self.user, current_status_date=same_date)
+        book_three = Book.objects.create(
+            title="Tied Two", user=self.user, current_status_date=same_date)
+        book_four = Book.objects.create(
+            title="Oldest", user=self.user, 
+            current_status_date=pytz.utc.localize(datetime.datetime(2019, 1, 1)))
+
+        pages = self.get_all_pages({'page_size': 1, 'ordering': 'current_status_date'})
+
+        returned_ids = [book['id'] for page in pages for book in page]
+        self.assertEqual(returned_ids, [book_four.id, book_two.id, book_three.id, book_one.id])
+
+    def test_last_page_has_no_next_cursor(self):
+        Book.objects.create(title="First Book", user=self.user)
+
+        url = reverse('books')
+        response = self.client.get(url, {'page_size': 1})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data['books']), 1)
+        self.assertIsNone(response.data['next'])
+
+    def test_only_pages_through_a_users_own_books(self):
+        other_user = User.objects.create(
+            username='Caspar', password='password')
+        Book.objects.create(title="Other Book", user=other_user)
+        own_book = Book.objects.create(title="Own Book", user=self.user)
+
+        pages = self.get_all_pages({'page_size': 1})
+
+        returned_ids = [book['id'] for page in pages for book in page]
+        self.assertEqual(returned_ids, [own_book.id])
+
+    def test_returns_error_for_invalid_cursor(self):
+        url = reverse('books')
+        response = self.client.get(url, {'cursor': 'not-a-cursor'})
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data, {"error": "Invalid cursor"})
+
+    def test_returns_error_for_invalid_page_size(self):
+        url = reverse('books')
+        response = self.client.get(url, {'page_size': 0})
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_returns_error_for_invalid_ordering(self):
+        url = reverse('books')
+        response = self.client.get(url, {'page_size': 10, 'ordering': 'description'})
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class GetBooksFieldsTest(APITestCase):
+    """ Test module for choosing which fields of a User's books are returned """
+
+    def setUp(self):
+        self.user = User.objects.create(
+            username='Bertie', password='password')
+        self.token = str(self.user.auth_token)
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.token)
+
+        for index in range(3):
+            book = Book.objects.create(
+                title="Book %s" % (index), description="A long description", user=self.user)
+            BookAuthor.objects.create(author_name="Author %s" % (index), user=self.user, book=book)
+            BookTag.objects.create(tag_name="fiction", user=self.user, book=book)
+
+    def test_returns_only_the_fields_asked_for(self):
+        url = reverse('books')
+        # token lookup, library version, books; no author or tag queries
+        with self.assertNumQueries(3):
+            response = self.client.get(url, {'fields': 'title,current_status'})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data['books']), 3)
+        for book in response.data['books']:
+            self.assertEqual(list(book.keys()), ['id', 'title', 'current_status'])
+
+    def test_does_not_load_unrequested_columns(self):
+        url = reverse('books')
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(url, {'fields': 'id,title'})
+
+        book_query = [query['sql'] for query in queries if 'FROM "api_book"' in query['sql']][0]
+        self.assertNotIn('"description"', book_query)
+
+    def test_loads_only_the_relations_asked_for(self):
+        url = reverse('books')
+        # token lookup, library version, books, tags
+        with self.assertNumQueries(4):
+            response = self.client.get(url, {'fields': 'title,tags'})
+
+        self.assertEqual(response.data['books'][0], {'id': response.data['books'][0]['id'], 'title': "Book 0", 'tags': ["fiction"]})
+
+    def test_can_exclude_fields(self):
+        url = reverse('books')
+        full = self.client.get(url).data['books'][0]
+        response = self.client.get(url, {'exclude': 'description,tags'})
+
+        book = response.data['books'][0]
+        self.assertNotIn('description', book)
+        self.assertNotIn('tags', book)
+        self.assertEqual(len(book), len(full) - 2)
+        self.assertEqual(book['authors'], full['authors'])
+
+    def test_fields_work_with_pagination(self):
+        url = reverse('books')
+        response = self.client.get(url, {'fields': 'title', 'page_size': 2, 'ordering': 'current_status_date'})
+
+        self.assertEqual(len(response.data['books']), 2)
+        self.assertEqual(list(response.data['books'][0].keys()), ['id', 'title'])
+
+        response = self.client.get(url, {'fields': 'title', 'page_size': 2, 'cursor': response.data['next']})
+        self.assertEqual(len(response.data['books']), 1)
+
+    def test_returns_error_for_unknown_fields(self):
+        url = reverse('books')
+        response = self.client.get(url, {'fields': 'title,password_hash'})
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data, {"error": "Unknown field: password_hash"})
+
+
+class GetBooksFilterTest(APITestCase):
+    """ Test module for filtering a User's books with query parameters """
+
+    def setUp(self):
+        self.user = User.objects.create(
+            username='Bertie', password='password')
+        self.token = str(self.user.auth_token)
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.token)
+
+        self.series = Series.objects.create(name="Earthsea", planned_count=2, user=self.user)
+        self.wizard = Book.objects.create(
+            title="A Wizard of Earthsea", user=self.user,
+            series=self.series, position_in_series=1,
+            current_status=Book.COMPLETED, rating=Book.FIVE,
+            current_status_date=pytz.utc.localize(datetime.datetime(2020, 1, 10)))
+        self.tombs = Book.objects.create(
+            title="The Tombs of Atuan", user=self.user,
+            series=self.series, position_in_series=2,
+            current_status=Book.CURRENT, rating=Book.FOUR,
+            current_status_date=pytz.utc.localize(datetime.datetime(2020, 2, 10)))
+        self.dune = Book.objects.create(
+            title="Dune", user=self.user,
+            current_status=Book.PAUSED, rating=Book.FOUR,
+            current_status_date=pytz.utc.localize(datetime.datetime(2020, 3, 10)))
+
+        BookAuthor.objects.create(author_name="Ursula K. Le Guin", book=self.wizard, user=self.user)
+        BookAuthor.objects.create(author_name="Ursula K. Le Guin", book=self.tombs, user=self.user)
+        BookAuthor.objects.create(author_name="Frank Herbert", book=self.dune, user=self.user)
+
+        BookTag.objects.create(tag_name="fiction__fantasy", book=self.wizard, user=self.user)
+        BookTag.objects.create(tag_name="fiction", book=self.tombs, user=self.user)
+        BookTag.objects.create(tag_name="fiction__science", book=self.dune, user=self.user)
+        # shares a prefix with 'fiction' without being nested under it
+        BookTag.objects.create(tag_name="fictional", book=self.dune, user=self.user)
+
+        # another user's book that matches every filter
+        other_user = User.objects.create(username='Caspar', password='password')
+        other_book = Book.objects.create(
+            title="Other Book", user=other_user,
+            current_status=Book.COMPLETED, rating=Book.FIVE,
+            current_status_date=pytz.utc.localize(datetime.datetime(2020, 1, 10)))
+        BookAuthor.objects.create(author_name="Ursula K. Le Guin", book=other_book, user=other_user)
+        BookTag.objects.create(tag_name="fiction__fantasy", book=other_book, user=other_user)
+
+    def get_ids(self, params):
+        url = reverse('books')
+        response = self.client.get(url, params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return sorted(book['id'] for book in response.data['books'])
+
+    def test_can_filter_by_current_status(self):
+        self.assertEqual(self.get_ids({'current_status': Book.CURRENT}), [self.tombs.id])
+        self.assertEqual(
+            self.get_ids({'current_status': '%s,%s' % (Book.CURRENT, Book.PAUSED)}),
+            [self.tombs.id, self.dune.id])
+
+    def test_can_filter_by_rating(self):
+        self.assertEqual(self.get_ids({'rating': 5}), [self.wizard.id])
+        self.assertEqual(self.get_ids({'rating': '4,5'}), [self.wizard.id, self.tombs.id, self.dune.id])
+
+    def test_can_filter_by_series(self):
+        self.assertEqual(self.get_ids({'series': self.series.id}), [self.wizard.id, self.tombs.id])
+        self.assertEqual(self.get_ids({'series': 'none'}), [self.dune.id])
+
+    def test_can_filter_by_tag_and_its_nested_tags(self):
+        self.assertEqual(self.get_ids({'tag': 'fiction'}), [self.wizard.id, self.tombs.id, self.dune.id])
+        self.assertEqual(self.get_ids({'tag': 'fiction__fantasy'}), [self.wizard.id])
+        self.assertEqual(self.get_ids({'tag': 'fictional'}), [self.dune.id])
+        self.assertEqual(self.get_ids({'tag': 'fict'}), [])
+
+    def test_can_filter_by_author(self):
+        self.assertEqual(self.get_ids({'author': 'Ursula K. Le Guin'}), [self.wizard.id, self.tombs.id])
+        self.assertEqual(self.get_ids({'author': 'ursula k.  le guin'}), [self.wizard.id, self.tombs.id])
+
+    def test_can_filter_by_status_date_range(self):
+        self.assertEqual(self.get_ids({'status_date_after': '2020-02-10'}), [self.tombs.id, self.dune.id])
+        self.assertEqual(self.get_ids({'status_date_before': '2020-02-10'}), [self.wizard.id])
+        self.assertEqual(
+            self.get_ids({'status_date_after': '2020-02-01T00:00:00Z', 'status_date_before': '2020-03-01'}),
+            [self.tombs.id])
+
+    def test_filters_combine(self):
+        self.assertEqual(self.get_ids({'rating': 4, 'author': 'Ursula K. Le Guin'}), [self.tombs.id])
+        self.assertEqual(self.get_ids({'rating': 4, 'tag': 'fiction__fantasy'}), [])
+
+    def test_filters_work_with_pagination(self):
+        url = reverse('books')
+        params = {'tag': 'fiction', 'ordering': 'title', 'page_size': 2}
+        response = self.client.get(url, params)
+
+        self.assertEqual([book['id'] for book in response.data['books']], [self.wizard.id, self.dune.id])
+
+        # the filters are sent again with the cursor
+        params = {'tag': 'fiction', 'page_size': 2, 'cursor': response.data['next']}
+        response = self.client.get(url, params)
+        self.assertEqual([book['id'] for book in response.data['books']], [self.tombs.id])
+        self.assertIsNone(response.data['next'])
+
+    def test_returns_errors_for_invalid_filters(self):
+        url = reverse('books')
+        invalid_params = [
+            {'current_status': 'READ'},
+            {'rating': 6},
+            {'rating': 'five'},
+            {'series': 'first'},
+            {'status_date_after': 'yesterday'},
+            {'status_date_before': '2020-13-01'},
+        ]
+        for params in invalid_params:
+            response = self.client.get(url, params)
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST, params)
+            self.assertIn('error', response.data)
+
+
+class GetBooksOrderingTest(APITestCase):
+    """ Test module for sorting a User's books with ?ordering= """
+
+    def setUp(self):
+        self.user = User.objects.create(
+            username='Bertie', password='password')
+        self.token = str(self.user.auth_token)
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.token)
+
+        series = Series.objects.create(name="Series", planned_count=3, user=self.user)
+        self.second = Book.objects.create(
+            title="Beta", user=self.user, rating=Book.THREE, series=series, position_in_series=2)
+        self.unplaced = Book.objects.create(
+            title="Delta", user=self.user, rating=Book.FIVE)
+        self.first = Book.objects.create(
+            title="Alpha", user=self.user, rating=Book.THREE, series=series, position_in_series=1)
+        self.also_unplaced = Book.objects.create(
+            title="Gamma", user=self.user, rating=Book.ONE)
+
+    def get_ids(self, params):
+        url = reverse('books')
+        response = self.client.get(url, params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [book['id'] for book in response.data['books']]
+
+    def get_all_page_ids(self, ordering):
+        url = reverse('books')
+        response = self.client.get(url, {'ordering': ordering, 'page_size': 1})
+        ids = [book['id'] for book in response.data['books']]
+        while response.data['next'] is not None:
+            response = self.client.get(url, {'cursor': response.data['next'], 'page_size': 1})
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            ids += [book['id'] for book in response.data['books']]
+        return ids
+
+    def test_can_sort_by_title(self):
+        expected = [self.first.id, self.second.id, self.unplaced.id, self.also_unplaced.id]
+
+        self.assertEqual(self.get_ids({'ordering': 'title'}), expected)
+        self.assertEqual(self.get_ids({'ordering': '-title'}), expected[::-1])
+        self.assertEqual(self.get_all_page_ids('title'), expected)
+        self.assertEqual(self.get_all_page_ids('-title'), expected[::-1])
+
+    def test_can_sort_by_rating_with_ties_in_id_order(self):
+        expected = [self.also_unplaced.id, self.second.id, self.first.id, self.unplaced.id]
+
+        self.assertEqual(self.get_ids({'ordering': 'rating'}), expected)
+        self.assertEqual(self.get_ids({'ordering': '-rating'}), expected[::-1])
+        self.assertEqual(self.get_all_page_ids('rating'), expected)
+        self.assertEqual(self.get_all_page_ids('-rating'), expected[::-1])
+
+    def test_can_sort_by_position_in_series_with_unplaced_books_last(self):
+        expected = [self.first.id, self.second.id, self.unplaced.id, self.also_unplaced.id]
+
+        self.assertEqual(self.get_ids({'ordering': 'position_in_series'}), expected)
+        self.assertEqual(self.get_ids({'ordering': '-position_in_series'}), expected[::-1])
+        self.assertEqual(self.get_all_page_ids('position_in_series'), expected)
+        self.assertEqual(self.get_all_page_ids('-position_in_series'), expected[::-1])
+
+    def test_can_sort_by_id_descending(self):
+        expected = sorted(self.get_ids({}), reverse=True)
+
+        self.assertEqual(self.get_ids({'ordering': '-id'}), expected)
+        self.assertEqual(self.get_all_page_ids('-id'), expected)
+
+    def test_returns_error_for_invalid_ordering_without_pagination(self):
+        url = reverse('books')
+        response = self.client.get(url, {'ordering': '-description'})
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data, {
+            "error": "Invalid ordering '-description'; use one of: id, title, rating, current_status_date, position_in_series (prefix with - to reverse)"
+        })
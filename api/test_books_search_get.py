@@ -0,0 +1,152 @@
+from django.urls import reverse
+from django.test import TestCase
+from rest_framework.test import APITestCase
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from unittest import skip
+import json
+
+from .models import Book, BookAuthor, Series, BookTag, BookStatus
+
+from django.apps import apps
+User = apps.get_model('userauth','User')
+
+
+class GetBooksSearchTest(APITestCase):
+    """ Test module for searching a user's books """
+
+    def setUp(self):
+        self.user = User.objects.create(
+            username='Bertie', password='password')
+        self.token = str(self.user.auth_token)
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.token)
+        self.url = reverse('books_search')
+
+        self.dragons = Book.objects.create(
+            title="Dragons of Autumn Twilight", user=self.user,
+            description="Old friends reunite at an inn.")
+        BookAuthor.objects.create(author_name="Margaret Weis", book=self.dragons, user=self.user)
+        BookTag.objects.create(tag_name="fiction__fantasy", book=self.dragons, user=self.user)
+
+        self.lighthouse = Book.objects.create(
+            title="To the Lighthouse", user=self.user,
+            description="A family and their dragons of memory.")
+        BookAuthor.objects.create(author_name="Virginia Woolf", book=self.lighthouse, user=self.user)
+        BookTag.objects.create(tag_name="fiction__classic", book=self.lighthouse, user=self.user)
+
+        self.cookbook = Book.objects.create(title="Salt Fat Acid Heat", user=self.user)
+        BookAuthor.objects.create(author_name="Samin Nosrat", book=self.cookbook, user=self.user)
+        BookTag.objects.create(tag_name="cooking", book=self.cookbook, user=self.user)
+
+    def search(self, params):
+        response = self.client.get(self.url, params)
+        return response, response.data
+
+    def found_ids(self, data):
+        return [book['id'] for book in data['books']]
+
+    def test_finds_books_by_title(self):
+        response, data = self.search({'q': 'lighthouse'})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(self.found_ids(data), [self.lighthouse.id])
+        self.assertEqual(data['books'][0]['authors'], ["Virginia Woolf"])
+        self.assertEqual(data['next'], None)
+
+    def test_finds_books_by_author(self):
+        response, data = self.search({'q': 'woolf'})
+
+        self.assertEqual(self.found_ids(data), [self.lighthouse.id])
+
+    def test_finds_books_by_tag_and_tag_parent(self):
+        response, data = self.search({'q': 'cooking'})
+        self.assertEqual(self.found_ids(data), [self.cookbook.id])
+
+        response, data = self.search({'q': 'fiction'})
+        self.assertEqual(sorted(self.found_ids(data)), sorted([self.dragons.id, self.lighthouse.id]))
+
+    def test_finds_books_by_description(self):
+        response, data = self.search({'q': 'inn'})
+
+        self.assertEqual(self.found_ids(data), [self.dragons.id])
+
+    def test_title_matches_rank_above_description_matches(self):
+        response, data = self.search({'q': 'dragons'})
+
+        self.assertEqual(self.found_ids(data), [self.dragons.id, self.lighthouse.id])
+
+    def test_every_word_must_match_and_words_can_be_prefixes(self):
+        response, data = self.search({'q': 'marg twil'})
+        self.assertEqual(self.found_ids(data), [self.dragons.id])
+
+        response, data = self.search({'q': 'margaret lighthouse'})
+        self.assertEqual(self.found_ids(data), [])
+
+    def test_query_operators_are_treated_as_plain_text(self):
+        response, data = self.search({'q': "salt | !heat & ('"})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(self.found_ids(data), [self.cookbook.id])
+
+    def test_results_follow_author_and_tag_changes(self):
+        book_url = reverse('book', args=[self.cookbook.id])
+        response = self.client.put(book_url, {
+            'authors': ["Julia Child"],
+            'tags': ["baking"],
+        }, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        response, data = self.search({'q': 'nosrat'})
+        self.assertEqual(self.found_ids(data), [])
+        response, data = self.search({'q': 'julia baking'})
+        self.assertEqual(self.found_ids(data), [self.cookbook.id])
+
+    def test_results_follow_title_changes(self):
+        self.cookbook.title = "Kitchen Confidential"
+        self.cookbook.save()
+
+        response, data = self.search({'q': 'kitchen'})
+        self.assertEqual(self.found_ids(data), [self.cookbook.id])
+
+    def test_does_not_find_other_users_books(self):
+        other_user = User.objects.create(username="Other", password="password")
+        Book.objects.create(title="Another Lighthouse", user=other_user)
+
+        response, data = self.search({'q': 'lighthouse'})
+
+        self.assertEqual(self.found_ids(data), [self.lighthouse.id])
+
+    def test_can_page_through_results(self):
+        response, data = self.search({'q': 'fiction', 'page_size': 1})
+        first_page = self.found_ids(data)
+        self.assertEqual(len(first_page), 1)
+        self.assertNotEqual(data['next'], None)
+
+        response, data = self.search({'q': 'fiction', 'page_size': 1, 'cursor': data['next']})
+        second_page = self.found_ids(data)
+        self.assertEqual(len(second_page), 1)
+        self.assertEqual(data['next'], None)
+
+        self.assertEqual(sorted(first_page + second_page), sorted([self.dragons.id, self.lighthouse.id]))
+
+    def test_missing_query_returns_error(self):
+        response, data = self.search({'q': ' ?! '})
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(data, {"error": "No search terms provided"})
+
+    def test_invalid_cursor_returns_error(self):
+        response, data = self.search({'q': 'fiction', 'cursor': 'nonsense'})
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(data, {"error": "Invalid cursor"})
+
+    def test_search_uses_a_fixed_number_of_queries(self):
+        for i in range(30):
+            book = Book.objects.create(title="Fiction Book %s" % (i), user=self.user)
+            BookAuthor.objects.create(author_name="Author %s" % (i), book=book, user=self.user)
+
+        # token, library version, search, then the uncached books, their authors and their tags
+        with self.assertNumQueries(6):
+            response, data = self.search({'q': 'fiction', 'page_size': 25})
+        self.assertEqual(len(data['books']), 25)
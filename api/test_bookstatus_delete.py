@@ -184,3 +184,81 @@ class DeleteBookStatusTest(APITestCase):
             "error": "Could not find status with ID: %s" %(fake_status_id)
         }
         self.assertEqual(response.data, expected_error)
+
+    def test_deleting_an_older_bookstatus_leaves_book(self):
+        date_one = pytz.utc.localize(datetime.datetime(2011, 1, 1))
+        bookstatus_one = BookStatus.objects.create(
+            status_code=Book.CURRENT,
+            book=self.book,
+            user=self.user,
+            date=date_one
+        )
+        date_two = pytz.utc.localize(datetime.datetime(2012, 1, 1))
+        BookStatus.objects.create(
+            status_code=Book.COMPLETED,
+            book=self.book,
+            user=self.user,
+            date=date_two
+        )
+        self.book.current_status = Book.COMPLETED
+        self.book.current_status_date = date_two
+        self.book.save()
+
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.token)
+        url = reverse('bookstatus', kwargs={"id": bookstatus_one.id})
+        response = self.client.delete(url, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["current_status"], Book.COMPLETED)
+        self.assertEqual(response.data["current_status_date"], date_two)
+
+        matching_book_after = Book.objects.get(id=self.book.id)
+        self.assertEqual(matching_book_after.current_status, Book.COMPLETED)
+        self.assertEqual(matching_book_after.current_status_date, date_two)
+
+    def test_deleting_a_books_last_bookstatus_leaves_book(self):
+        date_one = pytz.utc.localize(datetime.datetime(2011, 1, 1))
+        bookstatus = BookStatus.objects.create(
+            status_code=Book.DISCARDED,
+            book=self.book,
+            user=self.user,
+            date=date_one
+        )
+        matching_book_before = Book.objects.get(id=self.book.id)
+
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.token)
+        url = reverse('bookstatus', kwargs={"id": bookstatus.id})
+        response = self.client.delete(url, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["current_status"], matching_book_before.current_status)
+        self.assertEqual(response.data["current_status_date"], matching_book_before.current_status_date)
+
+        matching_book_after = Book.objects.get(id=self.book.id)
+        self.assertEqual(matching_book_after.current_status, matching_book_before.current_status)
+        self.assertEqual(matching_book_after.current_status_date, matching_book_before.current_status_date)
+
+    def test_finds_the_new_current_status_in_one_query(self):
+        for year in range(2000, 2010):
+            BookStatus.objects.create(
+                status_code=Book.CURRENT,
+                book=self.book,
+                user=self.user,
+                date=pytz.utc.localize(datetime.datetime(year, 1, 1))
+            )
+        latest = BookStatus.objects.create(
+            status_code=Book.COMPLETED,
+            book=self.book,
+            user=self.user,
+            date=pytz.utc.localize(datetime.datetime(2011, 1, 1))
+        )
+
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.token)
+        url = reverse('bookstatus', kwargs={"id": latest.id})
+        # token, status (counted, then read), savepoint, locked book, most recent other status,
+        # delete, book update, release: however long the history is
+        with self.assertNumQueries(9):
+            response = self.client.delete(url, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["current_status_date"], pytz.utc.localize(datetime.datetime(2009, 1, 1)))
@@ -0,0 +1,165 @@
+from django.urls import reverse
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.db import connection
+from rest_framework.test import APITestCase
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from unittest import skip
+import json
+import datetime
+import pytz
+
+from .models import Book, BookAuthor, Series, Tag, BookTag, BookStatus, LibraryVersion
+
+from django.apps import apps
+User = apps.get_model('userauth','User')
+
+
+class ConditionalGetTest(APITestCase):
+    """ Test module for answering unchanged-library GETs with 304 Not Modified """
+
+    def setUp(self):
+        self.user = User.objects.create(
+            username='Bertie', password='password')
+        self.token = str(self.user.auth_token)
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.token)
+
+        self.book = Book.objects.create(title="Cached Book", user=self.user)
+        BookAuthor.objects.create(author_name="Cached Author", book=self.book, user=self.user)
+        BookTag.objects.create(tag_name="fiction", book=self.book, user=self.user)
+        BookStatus.objects.create(status_code=Book.WANTTOREAD, book=self.book, user=self.user)
+        self.series = Series.objects.create(name="Cached Series", planned_count=2, user=self.user)
+
+    def etag(self, url):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response['ETag']
+
+    def test_responses_carry_validators(self):
+        response = self.client.get(reverse('books'))
+
+        self.assertTrue(response['ETag'].startswith('W/"%s.' % (self.user.id)))
+        self.assertIn('Last-Modified', response)
+        self.assertIn('private', response['Cache-Control'])
+        self.assertIn('no-cache', response['Cache-Control'])
+
+    def test_unchanged_library_returns_304_without_reading_books(self):
+        url = reverse('books')
+        etag = self.etag(url)
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response.content, b'')
+        self.assertEqual(response['ETag'], etag)
+        # just the library version; the token is cached
+        self.assertEqual(len(queries), 1)
+        self.assertIn('api_libraryversion', queries[0]['sql'])
+
+    def test_every_read_endpoint_returns_304(self):
+        urls = [
+            reverse('books'),
+            reverse('book', args=[self.book.id]),
+            reverse('series_list'),
+            reverse('tags'),
+            reverse('bookstatus', args=[self.book.id]),
+            reverse('books_search') + '?q=cached',
+            reverse('export'),
+        ]
+        for url in urls:
+            etag = self.etag(url)
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED, url)
+
+    def test_if_modified_since_is_not_evaluated(self):
+        url = reverse('series_list')
+        last_modified = self.client.get(url)['Last-Modified']
+
+        response = self.client.get(url, HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_a_second_write_in_the_same_second_is_not_missed(self):
+        url = reverse('series_list')
+        first_write = datetime.datetime(2021, 1, 1, 12, 0, 0, 300000, tzinfo=pytz.utc)
+        LibraryVersion.objects.filter(user=self.user).update(updated_at=first_write)
+        seen = self.client.get(url)
+        self.assertEqual(seen['Last-Modified'], 'Fri, 01 Jan 2021 12:00:00 GMT')
+
+        Series.objects.create(name="Same Second Series", planned_count=1, user=self.user)
+        second_write = datetime.datetime(2021, 1, 1, 12, 0, 0, 800000, tzinfo=pytz.utc)
+        LibraryVersion.objects.filter(user=self.user).update(updated_at=second_write)
+
+        for headers in [
+            {'HTTP_IF_MODIFIED_SINCE': seen['Last-Modified']},
+            {'HTTP_IF_MODIFIED_SINCE': seen['Last-Modified'], 'HTTP_IF_NONE_MATCH': seen['ETag']},
+        ]:
+            with self.subTest(headers=headers):
+                response = self.client.get(url, **headers)
+
+                self.assertEqual(response.status_code, status.HTTP_200_OK)
+                self.assertEqual(response['Last-Modified'], seen['Last-Modified'])
+                self.assertIn("Same Second Series", [series['name'] for series in response.data['series']])
+
+    def test_writes_through_the_api_change_the_etag(self):
+        url = reverse('books')
+        writes = [
+            lambda: self.client.post(url, {'title': "New Book", 'authors': ["New Author"]}, format='json'),
+            lambda: self.client.put(reverse('book', args=[self.book.id]), {'title': "Renamed"}, format='json'),
+            lambda: self.client.put(reverse('rating', args=[self.book.id]), {'rating': 4}, format='json'),
+            lambda: self.client.put(reverse('tag', args=['fiction']),
+                                    {'new_name': 'novels', 'books': [self.book.id]}, format='json'),
+            lambda: self.client.post(reverse('bookstatus', args=[self.book.id]),
+                                     {'status_code': Book.CURRENT, 'date': '2020-05-01T00:00:00Z'}, format='json'),
+            lambda: self.client.post(reverse('series_list'), {'name': "New Series", 'planned_count': 3}, format='json'),
+            lambda: self.client.delete(reverse('book', args=[self.book.id])),
+        ]
+        for write in writes:
+            etag = self.etag(url)
+            response = write()
+            self.assertLess(response.status_code, 300)
+
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertNotEqual(response['ETag'], etag)
+
+    def test_bulk_writes_change_the_etag(self):
+        url = reverse('tags')
+        writes = [
+            lambda: BookTag.objects.bulk_create([
+                BookTag(tag=Tag.objects.create(name="bulk", user=self.user), book=self.book, user=self.user)]),
+            lambda: Tag.objects.filter(name="fiction", user=self.user).update(name="updated"),
+            lambda: BookStatus.objects.filter(user=self.user).delete(),
+            lambda: Series.objects.filter(user=self.user).update(planned_count=5),
+        ]
+        for write in writes:
+            etag = self.etag(url)
+            write()
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_other_users_writes_do_not_change_the_etag(self):
+        url = reverse('books')
+        etag = self.etag(url)
+
+        other_user = User.objects.create(username="Other", password="password")
+        Book.objects.create(title="Someone Else's Book", user=other_user)
+
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_new_user_without_writes_still_gets_an_etag(self):
+        new_user = User.objects.create(username="New", password="password")
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + str(new_user.auth_token))
+
+        response = self.client.get(reverse('books'))
+        self.assertEqual(response['ETag'], 'W/"%s.0"' % (new_user.id))
+
+        response = self.client.get(reverse('books'), HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_deleting_a_user_with_a_library_still_works(self):
+        self.user.delete()
+
+        self.assertFalse(Book.objects.exists())
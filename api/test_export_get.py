@@ -0,0 +1,127 @@
+from django.urls import reverse
+from django.test import TestCase
+from rest_framework.test import APITestCase
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from unittest import skip
+import csv
+import datetime
+import io
+import json
+import pytz
+
+from .models import Book, BookAuthor, Series, BookTag, BookStatus
+from . import export
+
+from django.apps import apps
+User = apps.get_model('userauth','User')
+
+
+class GetExportTest(APITestCase):
+    """ Test module for exporting a User's library """
+
+    def setUp(self):
+        self.user = User.objects.create(
+            username='Bertie', password='password')
+        self.token = str(self.user.auth_token)
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.token)
+        self.url = reverse('export')
+
+        self.series = Series.objects.create(
+            name="Earthsea", planned_count=6, user=self.user)
+        self.book = Book.objects.create(
+            title="A Wizard of Earthsea",
+            user=self.user,
+            series=self.series,
+            position_in_series=1,
+            current_status=Book.COMPLETED,
+            current_status_date=pytz.utc.localize(datetime.datetime(2020, 2, 1)))
+        BookAuthor.objects.create(
+            author_name="Ursula K. Le Guin", user=self.user, book=self.book)
+        BookTag.objects.create(
+            tag_name="fantasy", user=self.user, book=self.book)
+        BookStatus.objects.create(
+            status_code=Book.COMPLETED, 
+            date=pytz.utc.localize(datetime.datetime(2020, 2, 1)), 
+            user=self.user, book=self.book)
+        BookStatus.objects.create(
+            status_code=Book.WANTTOREAD, 
+            date=pytz.utc.localize(datetime.datetime(2020, 1, 1)), 
+            user=self.user, book=self.book)
+
+    def read_body(self, response):
+        self.assertTrue(response.streaming)
+        return b''.join(response.streaming_content).decode('utf-8')
+
+    def test_can_export_as_ndjson(self):
+        response = self.client.get(self.url, {'format': 'ndjson'})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        lines = self.read_body(response).splitlines()
+        self.assertEqual(len(lines), 1)
+        document = json.loads(lines[0])
+        self.assertEqual(document['id'], self.book.id)
+        self.assertEqual(document['title'], self.book.title)
+        self.assertEqual(document['authors'], ["Ursula K. Le Guin"])
+        self.assertEqual(document['tags'], ["fantasy"])
+        self.assertEqual(document['series'], self.series.id)
+        self.assertEqual(document['series_name'], "Earthsea")
+        self.assertEqual(
+            [book_status['status_code'] for book_status in document['status_history']],
+            [Book.WANTTOREAD, Book.COMPLETED])
+        self.assertEqual(document['status_history'][0]['date'], "2020-01-01T00:00:00Z")
+
+    def test_exports_ndjson_by_default(self):
+        response = self.client.get(self.url)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        self.assertIn('library.ndjson', response['Content-Disposition'])
+
+    def test_can_export_as_csv(self):
+        response = self.client.get(self.url, {'format': 'csv'})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response['Content-Type'], 'text/csv')
+        self.assertIn('library.csv', response['Content-Disposition'])
+        rows = list(csv.DictReader(io.StringIO(self.read_body(response))))
+        self.assertEqual(len(rows), 1)
+        self.assertEqual(rows[0]['title'], self.book.title)
+        self.assertEqual(rows[0]['authors'], "Ursula K. Le Guin")
+        self.assertEqual(rows[0]['series_name'], "Earthsea")
+        self.assertEqual(
+            rows[0]['status_history'], 
+            "WTR 2020-01-01T00:00:00Z; COMP 2020-02-01T00:00:00Z")
+
+    def test_only_exports_a_users_own_books(self):
+        other_user = User.objects.create(
+            username='Caspar', password='password')
+        Book.objects.create(title="Not Yours", user=other_user)
+
+        response = self.client.get(self.url, {'format': 'ndjson'})
+
+        titles = [json.loads(line)['title'] for line in self.read_body(response).splitlines()]
+        self.assertEqual(titles, [self.book.title])
+
+    def test_exports_books_across_chunks(self):
+        for index in range(export.CHUNK_SIZE + 5):
+            Book.objects.create(title="Book %s" % (index), user=self.user)
+
+        response = self.client.get(self.url, {'format': 'ndjson'})
+
+        lines = self.read_body(response).splitlines()
+        self.assertEqual(len(lines), export.CHUNK_SIZE + 6)
+        ids = [json.loads(line)['id'] for line in lines]
+        self.assertEqual(ids, sorted(ids))
+
+    def test_returns_error_for_unknown_format(self):
+        response = self.client.get(self.url, {'format': 'xml'})
+
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_returns_error_if_unauthorized(self):
+        self.client.credentials()
+        response = self.client.get(self.url)
+
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
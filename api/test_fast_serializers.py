@@ -0,0 +1,124 @@
+from django.urls import reverse
+from django.test import TestCase, override_settings
+from django.core.management import call_command
+from django.core.cache import cache
+from rest_framework.test import APITestCase
+from rest_framework import status
+from rest_framework.renderers import JSONRenderer
+from unittest import skip
+from io import StringIO
+import datetime
+import pytz
+
+from .models import Book, BookAuthor, Series, BookTag, BookStatus
+from .fast_serializers import book_dicts, series_dicts, status_dicts, serialize_books, serialize_series, serialize_statuses
+from .renderers import FastJSONRenderer
+
+from django.apps import apps
+User = apps.get_model('userauth','User')
+
+
+class FastSerializersTest(APITestCase):
+    """ Test module for the FAST_RENDERING list serializers and renderer """
+
+    def setUp(self):
+        self.user = User.objects.create(
+            username='Bertie', password='password')
+        self.token = str(self.user.auth_token)
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.token)
+
+        self.series = Series.objects.create(name="Les Misérables", planned_count=3, user=self.user)
+        self.empty_series = Series.objects.create(name="Empty", planned_count=1, user=self.user)
+        self.book = Book.objects.create(
+            title="Fantine",
+            series=self.series,
+            position_in_series=1,
+            publisher="A. Lacroix",
+            publication_date="1862",
+            isbn_10="0000000000",
+            page_count=400,
+            description="line\u2028separated “quoted”",
+            current_status=Book.COMPLETED,
+            current_status_date=datetime.datetime(2020, 3, 4, 5, 6, 7, 890, tzinfo=pytz.utc),
+            rating=Book.FIVE,
+            user=self.user)
+        self.bare_book = Book.objects.create(title="Untitled", user=self.user)
+        for name in ["Victor Hugo", "Translator"]:
+            BookAuthor.objects.create(author_name=name, book=self.book, user=self.user)
+        for name in ["fiction", "fiction__french"]:
+            BookTag.objects.create(tag_name=name, book=self.book, user=self.user)
+        BookStatus.objects.create(
+            status_code=Book.COMPLETED, date=datetime.datetime(2020, 1, 2, tzinfo=pytz.utc),
+            book=self.book, user=self.user)
+        BookStatus.objects.create(status_code=Book.CURRENT, book=self.book, user=self.user)
+
+    def test_books_match_the_serializer(self):
+        books = Book.objects.filter(user=self.user).order_by('id')
+
+        with self.assertNumQueries(3):
+            fast = book_dicts(books)
+
+        self.assertEqual(fast, serialize_books(books, fast=False))
+        self.assertEqual(list(fast[0].keys()), list(serialize_books(books, fast=False)[0].keys()))
+
+    def test_series_match_the_serializer(self):
+        series = Series.objects.filter(user=self.user).order_by('id')
+
+        with self.assertNumQueries(2):
+            fast = series_dicts(series)
+
+        self.assertEqual(fast, serialize_series(series, fast=False))
+
+    def test_statuses_match_the_serializer(self):
+        statuses = BookStatus.objects.filter(user=self.user).order_by('id')
+
+        with self.assertNumQueries(1):
+            fast = status_dicts(statuses)
+
+        self.assertEqual(fast, serialize_statuses(statuses, fast=False))
+
+    def test_empty_lists(self):
+        self.assertEqual(book_dicts(Book.objects.none()), [])
+        self.assertEqual(series_dicts(Series.objects.none()), [])
+        self.assertEqual(status_dicts(BookStatus.objects.none()), [])
+
+    def test_renderer_matches_json_renderer(self):
+        data = {
+            'books': book_dicts(Book.objects.filter(user=self.user).order_by('id')),
+            'date': datetime.datetime(2020, 1, 2, tzinfo=pytz.utc),
+            'big': 2 ** 70,
+        }
+
+        fast = FastJSONRenderer().render_fast(data)
+
+        self.assertEqual(fast, JSONRenderer().render(data))
+        self.assertIn(b'\\u2028', fast)
+
+    def test_endpoints_respond_the_same_either_way(self):
+        urls = [
+            reverse('books'),
+            reverse('series_list'),
+            reverse('bookstatus', kwargs={'id': self.book.id}),
+            reverse('sync'),
+        ]
+        for url in urls:
+            slow = self.client.get(url)
+            # so that books are serialized again, rather than read from the book cache
+            cache.clear()
+            with override_settings(FAST_RENDERING=True):
+                fast = self.client.get(url)
+            if url == reverse('sync'):
+                # the sync cursor is the time of the request
+                slow.data.pop('next')
+                fast.data.pop('next')
+                self.assertEqual(fast.data, slow.data)
+            else:
+                self.assertEqual(fast.content, slow.content, url)
+
+    def test_benchmark_rendering_command_reports_identical_output(self):
+        out = StringIO()
+        call_command('benchmark_rendering', '--username', 'Bertie', '--repeat', '1', stdout=out)
+
+        output = out.getvalue()
+        self.assertEqual(output.count('identical'), 6)
+        self.assertNotIn('DIFFERENT', output)
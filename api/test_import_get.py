@@ -0,0 +1,68 @@
+from django.urls import reverse
+from django.test import TestCase
+from rest_framework.test import APITestCase
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from unittest import skip
+from django.utils import timezone
+import datetime
+
+from .models import ImportJob
+
+from django.apps import apps
+User = apps.get_model('userauth','User')
+
+
+class GetImportTest(APITestCase):
+    """ Test module for checking on the progress of an import """
+
+    def setUp(self):
+        self.user = User.objects.create(
+            username='Bertie', password='password')
+        self.token = str(self.user.auth_token)
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.token)
+
+    def test_can_get_an_imports_progress(self):
+        started_at = timezone.now() - datetime.timedelta(seconds=10)
+        job = ImportJob.objects.create(
+            user=self.user,
+            source="Title,Author\n",
+            status=ImportJob.DONE,
+            rows_processed=500,
+            rows_failed=1,
+            books_created=499,
+            errors=[{"row": 7, "error": "Missing title"}],
+            started_at=started_at,
+            finished_at=started_at + datetime.timedelta(seconds=4))
+
+        url = reverse('import_job', args=[job.id])
+        response = self.client.get(url, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['import']['status'], ImportJob.DONE)
+        self.assertEqual(response.data['import']['rows_processed'], 500)
+        self.assertEqual(response.data['import']['books_created'], 499)
+        self.assertEqual(response.data['import']['rows_per_second'], 125.0)
+        self.assertEqual(response.data['import']['errors'], [{"row": 7, "error": "Missing title"}])
+        self.assertNotIn('source', response.data['import'])
+
+    def test_queued_import_has_no_speed_yet(self):
+        job = ImportJob.objects.create(user=self.user, source="Title,Author\n")
+
+        url = reverse('import_job', args=[job.id])
+        response = self.client.get(url, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['import']['status'], ImportJob.QUEUED)
+        self.assertEqual(response.data['import']['rows_per_second'], 0)
+
+    def test_cannot_get_another_users_import(self):
+        other_user = User.objects.create(
+            username='Caspar', password='password')
+        job = ImportJob.objects.create(user=other_user, source="Title,Author\n")
+
+        url = reverse('import_job', args=[job.id])
+        response = self.client.get(url, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data, {"error": "Could not find import with ID: %s" %(job.id)})
@@ -0,0 +1,248 @@
+from django.urls import reverse
+from django.test import TestCase
+from django.core.management import call_command
+from django.core.files.uploadedfile import SimpleUploadedFile
+from rest_framework.test import APITestCase
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from unittest import skip
+from io import StringIO
+from unittest.mock import patch
+import datetime
+import pytz
+
+from django.utils import timezone
+
+from .models import Book, BookAuthor, BookTag, BookStatus, ImportJob
+from .importer import JobReclaimed, claim_next_job, save_progress
+from .bulk import create_books
+
+from django.apps import apps
+User = apps.get_model('userauth','User')
+
+
+GOODREADS_CSV = (
+    'Book Id,Title,Author,Additional Authors,ISBN,ISBN13,My Rating,Publisher,Number of Pages,'
+    'Original Publication Year,Date Read,Date Added,Bookshelves,Exclusive Shelf\n'
+    '1,The Left Hand of Darkness,Ursula K. Le Guin,,"=""0441478123""","=""9780441478125""",5,Ace,304,'
+    '1969,2019/05/20,2019/01/02,"fiction, to-read, read",read\n'
+    '2,Good Omens,Terry Pratchett,Neil Gaiman,,,0,,,,,2020/03/04,"humor, currently-reading",currently-reading\n'
+)
+
+STORYGRAPH_CSV = (
+    'Title,Authors,ISBN/UID,Read Status,Date Added,Dates Read,Star Rating,Tags\n'
+    'Piranesi,Susanna Clarke,9781635575637,read,2021/01/01,2021/02/01-2021/02/10,4.5,"fantasy, mystery"\n'
+)
+
+
+class PostImportTest(APITestCase):
+    """ Test module for importing a CSV library export """
+
+    def setUp(self):
+        self.user = User.objects.create(
+            username='Bertie', password='password')
+        self.token = str(self.user.auth_token)
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.token)
+        self.url = reverse('imports')
+
+    def queue_and_run(self, source):
+        response = self.client.post(self.url, source, content_type='text/csv')
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        call_command('process_imports', '--once', stdout=StringIO())
+        return ImportJob.objects.get(id=response.data['import']['id'])
+
+    def test_posting_a_csv_queues_an_import(self):
+        response = self.client.post(self.url, GOODREADS_CSV, content_type='text/csv')
+
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(response.data['import']['status'], ImportJob.QUEUED)
+        self.assertEqual(ImportJob.objects.filter(user=self.user).count(), 1)
+        # nothing is imported until the worker runs
+        self.assertEqual(Book.objects.count(), 0)
+
+    def test_can_upload_a_csv_file(self):
+        upload = SimpleUploadedFile('goodreads_library_export.csv', GOODREADS_CSV.encode('utf-8'))
+
+        response = self.client.post(self.url, {'file': upload}, format='multipart')
+
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(ImportJob.objects.get(user=self.user).source, GOODREADS_CSV)
+
+    def test_can_import_a_goodreads_export(self):
+        job = self.queue_and_run(GOODREADS_CSV)
+
+        self.assertEqual(job.status, ImportJob.DONE)
+        self.assertEqual(job.rows_processed, 2)
+        self.assertEqual(job.books_created, 2)
+
+        book = Book.objects.get(title="The Left Hand of Darkness", user=self.user)
+        self.assertEqual(book.rating, 5)
+        self.assertEqual(book.isbn_10, "0441478123")
+        self.assertEqual(book.isbn_13, "9780441478125")
+        self.assertEqual(book.page_count, 304)
+        self.assertEqual(book.publisher, "Ace")
+        self.assertEqual(book.current_status, Book.COMPLETED)
+        self.assertEqual(book.current_status_date, pytz.utc.localize(datetime.datetime(2019, 5, 20)))
+        self.assertEqual(
+            list(BookTag.objects.filter(book=book).values_list('tag__name', flat=True)), ["fiction"])
+        history = BookStatus.objects.filter(book=book).order_by('date')
+        self.assertEqual([status.status_code for status in history], [Book.WANTTOREAD, Book.COMPLETED])
+
+        other_book = Book.objects.get(title="Good Omens", user=self.user)
+        self.assertEqual(other_book.current_status, Book.CURRENT)
+        self.assertCountEqual(
+            BookAuthor.objects.filter(book=other_book).values_list('author__name', flat=True),
+            ["Terry Pratchett", "Neil Gaiman"])
+
+    def test_can_import_a_storygraph_export(self):
+        job = self.queue_and_run(STORYGRAPH_CSV)
+
+        self.assertEqual(job.status, ImportJob.DONE)
+        book = Book.objects.get(title="Piranesi", user=self.user)
+        # half stars round up
+        self.assertEqual(book.rating, 5)
+        self.assertEqual(book.isbn_13, "9781635575637")
+        self.assertEqual(book.current_status, Book.COMPLETED)
+        history = BookStatus.objects.filter(book=book).order_by('date')
+        self.assertEqual(
+            [status.status_code for status in history],
+            [Book.WANTTOREAD, Book.CURRENT, Book.COMPLETED])
+        self.assertCountEqual(
+            BookTag.objects.filter(book=book).values_list('tag__name', flat=True),
+            ["fantasy", "mystery"])
+
+    def test_records_rows_that_cannot_be_imported(self):
+        source = (
+            'Title,Author,My Rating\n'
+            'Good Row,Some Author,3\n'
+            ',Missing Title,3\n'
+            'Bad Rating,Some Author,eleven\n'
+        )
+
+        job = self.queue_and_run(source)
+
+        self.assertEqual(job.status, ImportJob.DONE)
+        self.assertEqual(job.rows_processed, 3)
+        self.assertEqual(job.rows_failed, 2)
+        self.assertEqual(job.books_created, 1)
+        self.assertEqual([error['row'] for error in job.errors], [3, 4])
+
+    def test_records_rows_the_database_would_refuse(self):
+        source = (
+            'Title,Author,Publisher,Number of Pages\n'
+            'Good Row,Some Author,Ace,300\n'
+            'Negative Pages,Some Author,Ace,-1\n'
+            '%s,Some Author,Ace,300\n'
+            'Long Publisher,Some Author,%s,300\n'
+            'Long Author,%s,Ace,300\n'
+        ) % ("x" * 256, "x" * 256, "x" * 256)
+
+        job = self.queue_and_run(source)
+
+        self.assertEqual(job.status, ImportJob.DONE)
+        self.assertEqual(job.rows_processed, 5)
+        self.assertEqual(job.rows_failed, 4)
+        self.assertEqual(job.books_created, 1)
+        self.assertEqual(job.errors, [
+            {"row": 3, "error": "page_count must not be negative"},
+            {"row": 4, "error": "title must be a non-empty string of at most 255 characters"},
+            {"row": 5, "error": "publisher must be at most 255 characters"},
+            {"row": 6, "error": "every author must be a non-empty string of at most 255 characters"},
+        ])
+        self.assertEqual(list(Book.objects.filter(user=self.user).values_list('title', flat=True)), ["Good Row"])
+
+    def test_saves_the_rest_of_a_batch_the_database_refuses(self):
+        source = (
+            'Title,Author,Number of Pages\n'
+            'Good Row,Some Author,300\n'
+            'Negative Pages,Some Author,-1\n'
+            'Another Good Row,Other Author,200\n'
+        )
+
+        # as if the database refused a row that looked fine
+        with patch('api.importer.find_field_error', return_value=None):
+            job = self.queue_and_run(source)
+
+        self.assertEqual(job.status, ImportJob.DONE)
+        self.assertEqual(job.books_created, 2)
+        self.assertEqual(job.rows_failed, 1)
+        self.assertEqual([error['row'] for error in job.errors], [3])
+        self.assertTrue(job.errors[0]['error'].startswith("Could not save row: "))
+        self.assertCountEqual(
+            Book.objects.filter(user=self.user).values_list('title', flat=True),
+            ["Good Row", "Another Good Row"])
+        self.assertEqual(BookAuthor.objects.filter(user=self.user).count(), 2)
+
+    def test_an_import_that_stops_unexpectedly_is_failed(self):
+        response = self.client.post(self.url, GOODREADS_CSV, content_type='text/csv')
+        self.client.post(self.url, STORYGRAPH_CSV, content_type='text/csv')
+        stderr = StringIO()
+
+        calls = []
+
+        def create_books_once(entries, user):
+            # fail the first job's batch, and import the second job as usual
+            calls.append(entries)
+            if len(calls) == 1:
+                raise RuntimeError("worker ran out of memory")
+            return create_books(entries, user)
+
+        with patch('api.importer.create_books', side_effect=create_books_once):
+            call_command('process_imports', '--once', stdout=StringIO(), stderr=stderr)
+
+        job = ImportJob.objects.get(id=response.data['import']['id'])
+        self.assertEqual(job.status, ImportJob.FAILED)
+        self.assertIsNotNone(job.finished_at)
+        self.assertEqual(job.errors, [{"row": 3, "error": "Import stopped: worker ran out of memory"}])
+        self.assertIn("worker ran out of memory", stderr.getvalue())
+
+        # the worker carried on with the next job
+        self.assertEqual(ImportJob.objects.exclude(id=job.id).get().status, ImportJob.DONE)
+        self.assertTrue(Book.objects.filter(title="Piranesi").exists())
+
+    def test_an_abandoned_import_is_picked_up_where_it_stopped(self):
+        # the first row was imported before the job's worker died
+        job = ImportJob.objects.create(
+            user=self.user, source=GOODREADS_CSV, status=ImportJob.RUNNING,
+            rows_processed=1, books_created=1,
+            started_at=timezone.now() - datetime.timedelta(hours=1),
+            heartbeat_at=timezone.now() - datetime.timedelta(hours=1))
+
+        call_command('process_imports', '--once', stdout=StringIO())
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, ImportJob.DONE)
+        self.assertEqual(job.rows_processed, 2)
+        self.assertEqual(job.books_created, 2)
+        self.assertEqual(list(Book.objects.filter(user=self.user).values_list('title', flat=True)), ["Good Omens"])
+
+    def test_a_running_import_is_left_to_its_worker(self):
+        ImportJob.objects.create(
+            user=self.user, source=GOODREADS_CSV, status=ImportJob.RUNNING,
+            started_at=timezone.now(), heartbeat_at=timezone.now())
+
+        self.assertIsNone(claim_next_job())
+
+    def test_a_worker_stops_saving_a_job_another_worker_claimed(self):
+        job = ImportJob.objects.create(
+            user=self.user, source=GOODREADS_CSV, status=ImportJob.RUNNING,
+            started_at=timezone.now(), heartbeat_at=timezone.now())
+        ImportJob.objects.filter(id=job.id).update(heartbeat_at=timezone.now())
+
+        job.rows_processed = 2
+        with self.assertRaises(JobReclaimed):
+            save_progress(job)
+        job.refresh_from_db()
+        self.assertEqual(job.rows_processed, 0)
+
+    def test_returns_error_if_no_csv_given(self):
+        response = self.client.post(self.url, '', content_type='text/csv')
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data, {"error": "No CSV file provided"})
+
+    def test_returns_error_if_unauthorized(self):
+        self.client.credentials()
+        response = self.client.post(self.url, GOODREADS_CSV, content_type='text/csv')
+
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
@@ -8,7 +8,7 @@ from django.utils import timezone
 import datetime
 import pytz
 
-from .models import Book, BookAuthor, Series, BookTag, BookStatus
+from .models import Book, Author, BookAuthor, Series, Tag, BookTag, BookStatus
 from .serializers import BookSerializer, BookAuthorSerializer
 
 from django.apps import apps
@@ -122,7 +122,7 @@ class BookAuthorTests(TestCase):
         BookAuthor.objects.create(
             author_name="First Last", user=self.user, book=self.book)
         filteredBookAuthors = BookAuthor.objects.filter(
-            author_name="First Last")
+            author__name="First Last")
 
         self.assertEqual(BookAuthor.objects.count(), expectedCount)
         self.assertTrue(filteredBookAuthors.exists())
@@ -135,6 +135,30 @@ class BookAuthorTests(TestCase):
         
         self.assertEqual(str(book_author), author_name)
 
+    def test_bookauthors_share_an_author_written_differently(self):
+        other_book = Book.objects.create(
+            title="OtherAuthorBook", user=self.user)
+        author_one = BookAuthor.objects.create(
+            author_name="Ursula K. Le Guin", user=self.user, book=self.book)
+        author_two = BookAuthor.objects.create(
+            author_name="  ursula k.   LE GUIN", user=self.user, book=other_book)
+
+        self.assertEqual(author_one.author_id, author_two.author_id)
+        self.assertEqual(author_two.author_name, "Ursula K. Le Guin")
+        self.assertEqual(Author.objects.filter(user=self.user).count(), 1)
+
+    def test_users_do_not_share_authors(self):
+        other_user = User.objects.create(
+            username="OtherAuthorUser", password="password")
+        other_book = Book.objects.create(
+            title="OtherUsersBook", user=other_user)
+        author_one = BookAuthor.objects.create(
+            author_name="First Last", user=self.user, book=self.book)
+        author_two = BookAuthor.objects.create(
+            author_name="First Last", user=other_user, book=other_book)
+
+        self.assertNotEqual(author_one.author_id, author_two.author_id)
+
 
 class SeriesTests(TestCase):
     """ test module for the Series model """
@@ -227,7 +251,7 @@ class BookTagTests(TestCase):
 
         self.assertEqual(BookTag.objects.count(), expectedCount)
         filteredBookTags = BookTag.objects.filter(
-            tag_name=tag_name)
+            tag__name=tag_name)
         self.assertTrue(filteredBookTags.exists())
         self.assertEqual(filteredBookTags[0].tag_name, tag_name)
         self.assertEqual(filteredBookTags[0].user, self.user)
@@ -243,7 +267,7 @@ class BookTagTests(TestCase):
         self.assertEqual(BookTag.objects.count(), expectedCount)
 
         filteredBookTags = BookTag.objects.filter(
-            tag_name=tag_name)
+            tag__name=tag_name)
         self.assertTrue(filteredBookTags.exists())
         self.assertEqual(filteredBookTags[0].tag_name, tag_name)
         self.assertEqual(filteredBookTags[0].user, self.user)
@@ -262,7 +286,7 @@ class BookTagTests(TestCase):
 
         # check that tag no longer exists
         filteredBookTags = BookTag.objects.filter(
-            tag_name=tag_name)
+            tag__name=tag_name)
         self.assertFalse(filteredBookTags.exists())
 
     def test_tag_is_deleted_if_associated_book_is_deleted(self):
@@ -281,7 +305,7 @@ class BookTagTests(TestCase):
 
         # check that tag no longer exists
         filteredBookTags = BookTag.objects.filter(
-            tag_name=tag_name)
+            tag__name=tag_name)
         self.assertFalse(filteredBookTags.exists())
 
     def test_booktag_str_method(self):
@@ -292,6 +316,25 @@ class BookTagTests(TestCase):
         
         self.assertEqual(str(tag), tag_name)
 
+    def test_booktags_with_the_same_name_share_a_tag(self):
+        other_book = Book.objects.create(
+            title="OtherTagBook", user=self.user)
+        tag_one = BookTag.objects.create(
+            tag_name="cool-tag", user=self.user, book=self.book)
+        tag_two = BookTag.objects.create(
+            tag_name="cool-tag", user=self.user, book=other_book)
+
+        self.assertEqual(tag_one.tag_id, tag_two.tag_id)
+        self.assertEqual(Tag.objects.filter(user=self.user).count(), 1)
+
+    def test_nested_tag_is_created_with_its_parents(self):
+        tag = BookTag.objects.create(
+            tag_name="fiction__fantasy__epic", user=self.user, book=self.book)
+
+        self.assertEqual(tag.tag.parent.name, "fiction__fantasy")
+        self.assertEqual(tag.tag.parent.parent.name, "fiction")
+        self.assertIsNone(tag.tag.parent.parent.parent)
+
 class BookStatusTests(TestCase):
     """ Test module for the BookStatus model """
 
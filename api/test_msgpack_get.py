@@ -0,0 +1,59 @@
+from django.urls import reverse
+from django.test import TestCase
+from rest_framework.test import APITestCase
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from unittest import skip
+import json
+import msgpack
+
+from .models import Book, BookAuthor, Series, BookTag, BookStatus
+
+from django.apps import apps
+User = apps.get_model('userauth','User')
+
+
+class GetMessagePackTest(APITestCase):
+    """ Test module for MessagePack responses """
+
+    def setUp(self):
+        self.user = User.objects.create(
+            username='Bertie', password='password')
+        self.token = str(self.user.auth_token)
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.token)
+
+        self.book = Book.objects.create(title="Packed Book", user=self.user)
+        BookAuthor.objects.create(author_name="Packed Author", book=self.book, user=self.user)
+        BookTag.objects.create(tag_name="fiction", book=self.book, user=self.user)
+
+    def test_books_as_msgpack(self):
+        json_response = self.client.get(reverse('books'))
+        response = self.client.get(reverse('books'), HTTP_ACCEPT='application/msgpack')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response['Content-Type'], 'application/msgpack')
+        self.assertEqual(msgpack.unpackb(response.content), json.loads(json_response.content))
+        self.assertLess(len(response.content), len(json_response.content))
+
+    def test_errors_as_msgpack(self):
+        url = reverse('book', kwargs={'book_id': self.book.id + 1000})
+        response = self.client.get(url, HTTP_ACCEPT='application/msgpack')
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(msgpack.unpackb(response.content), {"error": "No book found with the ID: %s" % (self.book.id + 1000)})
+
+    def test_formats_have_their_own_etags(self):
+        json_response = self.client.get(reverse('tags'))
+        response = self.client.get(reverse('tags'), HTTP_ACCEPT='application/msgpack')
+
+        self.assertNotEqual(response['ETag'], json_response['ETag'])
+        self.assertIn('Accept', response['Vary'])
+
+        # a JSON ETag doesn't make a MessagePack request 304
+        response = self.client.get(
+            reverse('tags'), HTTP_ACCEPT='application/msgpack', HTTP_IF_NONE_MATCH=json_response['ETag'])
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        response = self.client.get(
+            reverse('tags'), HTTP_ACCEPT='application/msgpack', HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
@@ -0,0 +1,60 @@
+from django.test import TestCase
+from django.core.management import call_command
+from io import StringIO
+
+from .models import Book
+from .seed import LibrarySeeder
+from .query_plans import analyze, check_query_plans, sequential_scans, hot_queries
+
+from django.apps import apps
+User = apps.get_model('userauth','User')
+
+
+class QueryPlansTest(TestCase):
+    """ Test module for the indexes behind the API's most frequent queries """
+
+    @classmethod
+    def setUpTestData(cls):
+        # many users with libraries of different sizes, so each one is a small part of every table
+        seeder = LibrarySeeder(min_books=50, max_books=600, author_count=500, tag_count=100, seed=20)
+        for user in seeder.create_users(40):
+            seeder.seed_library(user)
+        analyze()
+
+        # the largest library, which is the most tempting to scan in full
+        cls.user = max(User.objects.filter(username__startswith='seed_'),
+                       key=lambda user: Book.objects.filter(user=user).count())
+
+    def test_hot_queries_use_indexes(self):
+        # with sequential scans off, a table is only read in full if no index can be used;
+        # whether the planner would pick the index for a database this small isn't tested
+        for name, plan, scanned in check_query_plans(self.user, seqscan=False):
+            with self.subTest(query=name):
+                self.assertEqual(scanned, [], "%s is answered with a sequential scan:\n%s" % (name, plan))
+
+    def test_books_under_a_tag_use_the_tag_index(self):
+        plans = {name: plan for name, plan, scanned in check_query_plans(self.user, seqscan=False)}
+
+        self.assertIn('booktag_tag_book_index on api_booktag', plans['books under a tag'])
+
+    def test_finds_sequential_scans(self):
+        plan = "Sort\n  ->  Seq Scan on api_book\n        Filter: (user_id = 1)"
+
+        self.assertEqual(sequential_scans(plan), ['api_book'])
+        self.assertEqual(sequential_scans(plan, {'api_book': 10}), [])
+        self.assertEqual(sequential_scans(plan, {'api_book': 10000}), ['api_book'])
+
+    def test_hot_queries_work_for_an_empty_library(self):
+        user = User.objects.create(username='Bertie', password='password')
+
+        for name, queryset in hot_queries(user):
+            with self.subTest(query=name):
+                self.assertEqual(len(list(queryset)), 0)
+
+    def test_check_query_plans_command(self):
+        out = StringIO()
+        call_command('check_query_plans', '--username', self.user.username, '--no-seqscan', stdout=out)
+
+        output = out.getvalue()
+        self.assertIn('books by title', output)
+        self.assertNotIn('SEQUENTIAL SCAN', output)
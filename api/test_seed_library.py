@@ -0,0 +1,91 @@
+from django.test import TestCase
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.urls import reverse
+from rest_framework.test import APIClient
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from io import StringIO
+
+from .models import Book, BookAuthor, Series, BookTag, BookStatus
+from .seed import ZipfSampler, author_names, tag_names
+
+from django.apps import apps
+User = apps.get_model('userauth','User')
+
+
+class SeedLibraryCommandTest(TestCase):
+    """ Test module for the seed_library management command """
+
+    def seed(self, *args):
+        out = StringIO()
+        call_command('seed_library', '--seed', '7', *args, stdout=out)
+        return out.getvalue()
+
+    def test_creates_users_with_tokens_and_libraries(self):
+        output = self.seed('--users', '3', '--min-books', '20', '--max-books', '40', '--batch-size', '7')
+
+        users = User.objects.filter(username__startswith='seed_')
+        self.assertEqual(users.count(), 3)
+        self.assertEqual(Token.objects.filter(user__in=users).count(), 3)
+        for user in users:
+            self.assertTrue(20 <= Book.objects.filter(user=user).count() <= 40)
+        self.assertIn('created 3 users', output)
+
+        # every book has an author and a status history ending in its current status
+        self.assertFalse(Book.objects.filter(authors__isnull=True).exists())
+        for book in Book.objects.prefetch_related('statuses'):
+            history = sorted(book.statuses.all(), key=lambda book_status: book_status.date)
+            self.assertEqual(history[0].status_code, Book.WANTTOREAD)
+            self.assertEqual(history[-1].status_code, book.current_status)
+            self.assertEqual(history[-1].date, book.current_status_date)
+
+    def test_puts_books_in_series(self):
+        self.seed('--users', '1', '--min-books', '40', '--max-books', '40', '--series-fraction', '0.5')
+
+        in_series = Book.objects.filter(series__isnull=False)
+        self.assertEqual(in_series.count(), 20)
+        for book in in_series.select_related('series'):
+            self.assertEqual(book.series.user_id, book.user_id)
+            self.assertTrue(1 <= book.position_in_series <= book.series.planned_count)
+
+    def test_seeded_users_can_use_the_api(self):
+        self.seed('--users', '1', '--min-books', '5', '--max-books', '5', '--password', 'secret')
+
+        client = APIClient()
+        response = client.post(reverse('get-auth-token'), {'username': 'seed_1', 'password': 'secret'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        client.credentials(HTTP_AUTHORIZATION='Token ' + response.data['token'])
+        response = client.get(reverse('books'))
+        self.assertEqual(len(response.data['books']), 5)
+
+    def test_running_again_adds_new_users(self):
+        self.seed('--users', '2', '--max-books', '50')
+        self.seed('--users', '2', '--max-books', '50')
+
+        self.assertEqual(User.objects.filter(username__startswith='seed_').count(), 4)
+
+    def test_rejects_invalid_sizes(self):
+        with self.assertRaises(CommandError):
+            self.seed('--min-books', '10', '--max-books', '5')
+
+
+class SeedDistributionTest(TestCase):
+    """ Test module for the name pools and Zipf sampling behind seed_library """
+
+    def test_zipf_sampler_favours_the_first_items(self):
+        import random
+        sampler = ZipfSampler(list(range(100)), 1.1, random.Random(1))
+        picks = [sampler.sample(1)[0] for _ in range(2000)]
+
+        self.assertGreater(picks.count(0), picks.count(50) * 10)
+
+    def test_name_pools_are_distinct(self):
+        authors = author_names(5000)
+        tags = tag_names(300)
+
+        self.assertEqual(len(set(authors)), 5000)
+        self.assertEqual(len(set(tags)), 300)
+        self.assertIn('fiction__fantasy', tags)
+        self.assertTrue(any(tag.count('__') == 2 for tag in tags))
@@ -0,0 +1,236 @@
+from django.urls import reverse
+from django.test import TestCase
+from django.core.management import call_command
+from rest_framework.test import APITestCase, APITransactionTestCase
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from unittest import skip
+from unittest.mock import patch
+from io import StringIO
+import datetime
+import threading
+import base64
+import json
+
+from django.utils import timezone
+from django.db import connection, transaction
+
+from .models import Book, Author, BookAuthor, Series, BookTag, BookStatus, Tombstone, LibraryVersion
+from .sync import encode_sync_cursor
+
+from django.apps import apps
+User = apps.get_model('userauth','User')
+
+
+class GetSyncTest(APITestCase):
+    """ Test module for syncing the changes to a user's library """
+
+    def setUp(self):
+        self.user = User.objects.create(
+            username='Bertie', password='password')
+        self.token = str(self.user.auth_token)
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.token)
+        self.url = reverse('sync')
+
+        self.series = Series.objects.create(name="Synced Series", planned_count=3, user=self.user)
+        self.books = []
+        for i in range(5):
+            book = Book.objects.create(title="Book %s" % (i), user=self.user, series=self.series)
+            BookAuthor.objects.create(author_name="Author %s" % (i), book=book, user=self.user)
+            BookStatus.objects.create(status_code=Book.WANTTOREAD, book=book, user=self.user)
+            self.books.append(book)
+
+    def sync(self, since=None):
+        params = {} if since is None else {'since': since}
+        response = self.client.get(self.url, params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.data
+
+    def cursor_now(self):
+        return self.sync()['next']
+
+    def test_first_sync_returns_the_whole_library(self):
+        data = self.sync()
+
+        self.assertTrue(data['full'])
+        self.assertEqual([book['id'] for book in data['books']], [book.id for book in self.books])
+        self.assertEqual(data['books'][0]['authors'], ["Author 0"])
+        self.assertEqual(len(data['statuses']), 5)
+        self.assertEqual(data['series'][0]['books'], [book.id for book in self.books])
+        self.assertEqual(data['deleted'], {'books': [], 'series': [], 'statuses': []})
+        self.assertNotEqual(data['next'], None)
+
+    def test_sync_with_no_changes_is_empty(self):
+        data = self.sync(self.cursor_now())
+
+        self.assertFalse(data['full'])
+        self.assertEqual(data['books'], [])
+        self.assertEqual(data['series'], [])
+        self.assertEqual(data['statuses'], [])
+
+    def test_returns_only_the_changed_book(self):
+        since = self.cursor_now()
+        changed = self.books[2]
+
+        response = self.client.put(reverse('rating', args=[changed.id]), {'rating': 5}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        data = self.sync(since)
+        self.assertEqual([book['id'] for book in data['books']], [changed.id])
+        self.assertEqual(data['books'][0]['rating'], 5)
+
+    def test_author_and_tag_changes_count_as_book_changes(self):
+        since = self.cursor_now()
+        BookTag.objects.create(tag_name="fiction", book=self.books[1], user=self.user)
+        Author.objects.filter(book_authors__book=self.books[3]).update(name="Renamed Author")
+
+        data = self.sync(since)
+
+        self.assertEqual([book['id'] for book in data['books']], [self.books[1].id, self.books[3].id])
+        self.assertEqual(data['books'][0]['tags'], ["fiction"])
+        self.assertEqual(data['books'][1]['authors'], ["Renamed Author"])
+
+    def test_series_changes_when_a_book_leaves_it(self):
+        since = self.cursor_now()
+        Book.objects.filter(id=self.books[0].id).update(series=None)
+
+        data = self.sync(since)
+
+        self.assertEqual([series['id'] for series in data['series']], [self.series.id])
+        self.assertEqual(data['series'][0]['books'], [book.id for book in self.books[1:]])
+
+    def test_reports_deletions(self):
+        since = self.cursor_now()
+        deleted_book = self.books[4]
+        deleted_book_id = deleted_book.id
+        deleted_status_ids = list(BookStatus.objects.filter(book=deleted_book).values_list('id', flat=True))
+
+        response = self.client.delete(reverse('book', args=[deleted_book.id]))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        data = self.sync(since)
+        self.assertEqual(data['deleted']['books'], [deleted_book_id])
+        self.assertEqual(data['deleted']['statuses'], deleted_status_ids)
+        self.assertNotIn(deleted_book_id, [book['id'] for book in data['books']])
+
+    def test_next_cursor_picks_up_later_changes(self):
+        data = self.sync()
+        Book.objects.create(title="Newer Book", user=self.user)
+
+        data = self.sync(data['next'])
+
+        self.assertFalse(data['full'])
+        self.assertIn("Newer Book", [book['title'] for book in data['books']])
+
+    def test_does_not_return_other_users_changes(self):
+        since = self.cursor_now()
+        other_user = User.objects.create(username="Other", password="password")
+        Book.objects.create(title="Someone Else's Book", user=other_user)
+        Book.objects.create(title="Someone Else's Deleted Book", user=other_user).delete()
+
+        data = self.sync(since)
+
+        self.assertEqual(data['books'], [])
+        self.assertEqual(data['deleted']['books'], [])
+
+    def test_old_cursor_gets_a_full_sync(self):
+        version = LibraryVersion.objects.get(user=self.user).version
+        data = self.sync(encode_sync_cursor(version, timezone.now() - datetime.timedelta(days=365)))
+
+        self.assertTrue(data['full'])
+        self.assertEqual(len(data['books']), 5)
+
+    def test_cursor_from_before_versions_gets_a_full_sync(self):
+        legacy = base64.urlsafe_b64encode(json.dumps({'since': timezone.now().isoformat()}).encode('utf-8'))
+
+        data = self.sync(legacy.decode('ascii'))
+
+        self.assertTrue(data['full'])
+        self.assertEqual(len(data['books']), 5)
+
+    def test_changes_are_found_whatever_the_app_servers_clock_says(self):
+        # the app server's clock running ahead of the database's
+        with patch('api.sync.timezone.now', return_value=timezone.now() + datetime.timedelta(minutes=10)):
+            since = self.cursor_now()
+        changed = self.books[0]
+        Book.objects.filter(id=changed.id).update(rating=3)
+
+        data = self.sync(since)
+
+        self.assertEqual([book['id'] for book in data['books']], [changed.id])
+
+    def test_writes_are_stamped_with_the_version_they_bring_the_library_to(self):
+        book = Book.objects.create(title="Stamped Book", user=self.user)
+        version = LibraryVersion.objects.get(user=self.user).version
+        self.assertEqual(Book.objects.get(id=book.id).library_version, version)
+
+        book_id = book.id
+        book.delete()
+        version = LibraryVersion.objects.get(user=self.user).version
+        tombstone = Tombstone.objects.get(kind=Tombstone.BOOK, object_id=book_id)
+        self.assertEqual(tombstone.library_version, version)
+
+    def test_invalid_cursor_returns_error(self):
+        response = self.client.get(self.url, {'since': 'nonsense'})
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data, {"error": "Invalid cursor"})
+
+        for cursor in [{'version': -1, 'since': timezone.now().isoformat()}, {'version': '1', 'since': timezone.now().isoformat()}]:
+            encoded = base64.urlsafe_b64encode(json.dumps(cursor).encode('utf-8')).decode('ascii')
+            response = self.client.get(self.url, {'since': encoded})
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_prune_tombstones_removes_old_ones(self):
+        recent_id = self.books[1].id
+        self.books[0].delete()
+        Tombstone.objects.update(deleted_at=timezone.now() - datetime.timedelta(days=365))
+        self.books[1].delete()
+
+        call_command('prune_tombstones', stdout=StringIO())
+
+        self.assertEqual(list(Tombstone.objects.filter(kind=Tombstone.BOOK).values_list('object_id', flat=True)),
+                         [recent_id])
+
+
+class SyncDuringWriteTest(APITransactionTestCase):
+    """ Test module for syncing while another request's transaction is still writing """
+
+    def setUp(self):
+        self.user = User.objects.create(
+            username='Bertie', password='password')
+        self.token = str(self.user.auth_token)
+        self.url = reverse('sync')
+        Book.objects.create(title="Existing Book", user=self.user)
+
+    def sync(self, since=None):
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.token)
+        params = {} if since is None else {'since': since}
+        response = self.client.get(self.url, params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.data
+
+    def test_a_write_committed_after_a_sync_is_in_the_next_one(self):
+        written = threading.Event()
+        synced = threading.Event()
+
+        def slow_write():
+            try:
+                with transaction.atomic():
+                    Book.objects.create(title="Slow Book", user=self.user)
+                    written.set()
+                    # the transaction stays open, however long, until the sync has run
+                    synced.wait(10)
+            finally:
+                connection.close()
+
+        writer = threading.Thread(target=slow_write)
+        writer.start()
+        written.wait(10)
+        data = self.sync()
+        synced.set()
+        writer.join()
+
+        self.assertNotIn("Slow Book", [book['title'] for book in data['books']])
+        data = self.sync(data['next'])
+        self.assertEqual([book['title'] for book in data['books']], ["Slow Book"])
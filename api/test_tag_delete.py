@@ -5,7 +5,7 @@ from rest_framework import status
 from rest_framework.authtoken.models import Token
 from unittest import skip
 
-from .models import Book, BookTag
+from .models import Book, Tag, BookTag
 from .serializers import BookSerializer
 
 from django.apps import apps
@@ -54,7 +54,7 @@ class DeleteBookTagTest(APITestCase):
         }
         self.assertEqual(response.data, expected_data)
 
-        deleted_tag = BookTag.objects.filter(tag_name=tag_name)
+        deleted_tag = BookTag.objects.filter(tag__name=tag_name)
         self.assertFalse(deleted_tag.exists())
 
     def test_user_can_only_delete_their_own_tags(self):
@@ -88,10 +88,10 @@ class DeleteBookTagTest(APITestCase):
         }
         self.assertEqual(response.data, expected_data)
 
-        deleted_tag = BookTag.objects.filter(tag_name=tag_name, user=self.user)
+        deleted_tag = BookTag.objects.filter(tag__name=tag_name, user=self.user)
         self.assertFalse(deleted_tag.exists())
 
-        undeleted_tags = BookTag.objects.filter(tag_name=tag_name, user=other_user)
+        undeleted_tags = BookTag.objects.filter(tag__name=tag_name, user=other_user)
         self.assertTrue(undeleted_tags.exists())
 
     def test_returns_error_if_no_tags_found(self):
@@ -106,3 +106,19 @@ class DeleteBookTagTest(APITestCase):
             "error": "Could not find any tags matching the name '%s'" %(tag_name)
         }
         self.assertEqual(response.data, expected_data)
+
+    def test_deletes_tags_no_book_has_anymore(self):
+        book = Book.objects.create(
+            title="DeleteTagTestBook", user=self.user)
+        BookTag.objects.create(
+            tag_name="fiction__fantasy", user=self.user, book=book)
+        BookTag.objects.create(
+            tag_name="history", user=self.user, book=book)
+
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.token)
+        url = reverse('tag', kwargs={"tag_name": "fiction__fantasy"})
+        response = self.client.delete(url, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            list(Tag.objects.filter(user=self.user).values_list('name', flat=True)), ["history"])
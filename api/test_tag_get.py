@@ -83,4 +83,65 @@ User = apps.get_model('userauth','User')
 #         response = self.client.get(url, format='json')
 
 #         self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
-        
\ No newline at end of file
+        
+
+class GetTagTest(APITestCase):
+    """ Test module for getting the books under one of a User's tags """
+
+    def setUp(self):
+        self.user = User.objects.create(
+            username="BookTagUser", password="password")
+        self.token = str(self.user.auth_token)
+
+    def test_returns_books_with_the_tag_or_a_nested_tag(self):
+        book_one = Book.objects.create(
+            title="TagTestBookOne", user=self.user)
+        book_two = Book.objects.create(
+            title="TagTestBookTwo", user=self.user)
+        book_three = Book.objects.create(
+            title="TagTestBookThree", user=self.user)
+        BookTag.objects.create(
+            tag_name="fiction", user=self.user, book=book_one)
+        BookTag.objects.create(
+            tag_name="fiction__fantasy", user=self.user, book=book_one)
+        BookTag.objects.create(
+            tag_name="fiction__fantasy__epic", user=self.user, book=book_two)
+        BookTag.objects.create(
+            tag_name="fictional", user=self.user, book=book_three)
+
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.token)
+        url = reverse('tag', kwargs={"tag_name": "fiction"})
+        response = self.client.get(url, format='json')
+
+        expected_data = {
+            "tags": [{
+                "tag_name": "fiction",
+                "books": [book_one.id, book_two.id]
+            }]
+        }
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data, expected_data)
+
+    def test_does_not_return_another_users_books(self):
+        other_user = User.objects.create(
+            username="AnotherBookTagUser", password="password")
+        other_book = Book.objects.create(
+            title="OtherUsersBook", user=other_user)
+        BookTag.objects.create(
+            tag_name="fiction", user=other_user, book=other_book)
+
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.token)
+        url = reverse('tag', kwargs={"tag_name": "fiction"})
+        response = self.client.get(url, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        expected_data = {
+            "error": "No tags match the name 'fiction'"
+        }
+        self.assertEqual(response.data, expected_data)
+
+    def test_returns_error_if_unauthorized(self):
+        url = reverse('tag', kwargs={"tag_name": "fiction"})
+        response = self.client.get(url, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
@@ -5,7 +5,7 @@ from rest_framework import status
 from rest_framework.authtoken.models import Token
 from unittest import skip
 
-from .models import Book, BookTag
+from .models import Book, Tag, BookTag
 from .serializers import BookSerializer
 
 from django.apps import apps
@@ -195,10 +195,10 @@ class PutBookTagTest(APITestCase):
 
         self.assertEqual(response.status_code, status.HTTP_200_OK)
 
-        removed = BookTag.objects.filter(tag_name=fiction.tag_name, user=self.user, book=book_one)
+        removed = BookTag.objects.filter(tag__name=fiction.tag_name, user=self.user, book=book_one)
         self.assertFalse(removed.exists())
 
-        added = BookTag.objects.filter(tag_name=fiction.tag_name, user=self.user, book=book_two)
+        added = BookTag.objects.filter(tag__name=fiction.tag_name, user=self.user, book=book_two)
         self.assertTrue(added.exists())
 
         expected_data = {
@@ -228,9 +228,9 @@ class PutBookTagTest(APITestCase):
 
         self.assertEqual(response.status_code, status.HTTP_200_OK)
 
-        removed = BookTag.objects.filter(tag_name=fiction.tag_name, user=self.user, book=book_one)
+        removed = BookTag.objects.filter(tag__name=fiction.tag_name, user=self.user, book=book_one)
         self.assertTrue(removed.exists())
-        added = BookTag.objects.filter(tag_name=fiction.tag_name, user=self.user, book=book_two)
+        added = BookTag.objects.filter(tag__name=fiction.tag_name, user=self.user, book=book_two)
         self.assertTrue(added.exists())
 
         expected_data = {
@@ -258,10 +258,10 @@ class PutBookTagTest(APITestCase):
 
         self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
 
-        non_removed = BookTag.objects.filter(tag_name=fiction.tag_name, user=self.user, book=book_one)
+        non_removed = BookTag.objects.filter(tag__name=fiction.tag_name, user=self.user, book=book_one)
         self.assertTrue(non_removed.exists())
 
-        non_added = BookTag.objects.filter(tag_name=fiction.tag_name, user=self.user, book__id=999)
+        non_added = BookTag.objects.filter(tag__name=fiction.tag_name, user=self.user, book__id=999)
         self.assertFalse(non_added.exists())
 
         expected_data = {
@@ -306,7 +306,7 @@ class PutBookTagTest(APITestCase):
         }
         self.assertEqual(response.data, expected_data)
 
-        deleted_tag = BookTag.objects.filter(tag_name=tag_name)
+        deleted_tag = BookTag.objects.filter(tag__name=tag_name)
         self.assertFalse(deleted_tag.exists())
 
     def test_can_change_nested_tag_name(self):
@@ -365,3 +365,97 @@ class PutBookTagTest(APITestCase):
         self.assertEqual(updated_tag_one.tag_name, data["new_name"])
         updated_tag_two = BookTag.objects.get(id=fiction_two.id)
         self.assertEqual(updated_tag_two.tag_name, (data["new_name"]+"__fantasy"))
+
+    def test_renaming_a_tag_keeps_its_tag_row(self):
+        book = Book.objects.create(
+            title="PutTagTestBook", user=self.user)
+        fiction = BookTag.objects.create(
+            tag_name="fiction", user=self.user, book=book)
+        fantasy = BookTag.objects.create(
+            tag_name="fiction__fantasy", user=self.user, book=book)
+
+        data = {
+            "new_name": "stories",
+            "books": [book.id]
+        }
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.token)
+        url = reverse('tag', kwargs={"tag_name": "fiction"})
+        response = self.client.put(url, data, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(Tag.objects.get(id=fiction.tag_id).name, "stories")
+        nested_tag = Tag.objects.get(id=fantasy.tag_id)
+        self.assertEqual(nested_tag.name, "stories__fantasy")
+        self.assertEqual(nested_tag.parent_id, fiction.tag_id)
+
+    def test_renaming_a_tag_while_dropping_a_book_keeps_its_count(self):
+        book_one = Book.objects.create(
+            title="PutTagTestBookOne", user=self.user)
+        book_two = Book.objects.create(
+            title="PutTagTestBookTwo", user=self.user)
+        BookTag.objects.create(
+            tag_name="fiction", user=self.user, book=book_one)
+        BookTag.objects.create(
+            tag_name="fiction", user=self.user, book=book_two)
+
+        data = {
+            "new_name": "stories",
+            "books": [book_one.id]
+        }
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.token)
+        url = reverse('tag', kwargs={"tag_name": "fiction"})
+        response = self.client.put(url, data, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(Tag.objects.get(user=self.user, name="stories").book_count, 1)
+
+        response = self.client.get(reverse('tags_tree'))
+        self.assertEqual(response.data['tags'][0]['book_count'], 1)
+
+    def test_renaming_to_an_existing_tag_merges_them(self):
+        book_one = Book.objects.create(
+            title="PutTagTestBookOne", user=self.user)
+        book_two = Book.objects.create(
+            title="PutTagTestBookTwo", user=self.user)
+        BookTag.objects.create(
+            tag_name="fiction", user=self.user, book=book_one)
+        BookTag.objects.create(
+            tag_name="fiction", user=self.user, book=book_two)
+        BookTag.objects.create(
+            tag_name="stories", user=self.user, book=book_two)
+
+        data = {
+            "new_name": "stories",
+            "books": [book_one.id, book_two.id]
+        }
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.token)
+        url = reverse('tag', kwargs={"tag_name": "fiction"})
+        response = self.client.put(url, data, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertFalse(Tag.objects.filter(name="fiction", user=self.user).exists())
+        # book two has the tag once, not twice
+        stories = BookTag.objects.filter(tag__name="stories", user=self.user)
+        self.assertEqual(
+            sorted(stories.values_list('book_id', flat=True)), [book_one.id, book_two.id])
+
+    def test_returns_error_if_tag_is_nested_under_itself(self):
+        book = Book.objects.create(
+            title="PutTagTestBook", user=self.user)
+        BookTag.objects.create(
+            tag_name="fiction", user=self.user, book=book)
+
+        data = {
+            "new_name": "fiction__fiction",
+            "books": [book.id]
+        }
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.token)
+        url = reverse('tag', kwargs={"tag_name": "fiction"})
+        response = self.client.put(url, data, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        expected_data = {
+            "error": "Can't nest the tag 'fiction' under itself"
+        }
+        self.assertEqual(response.data, expected_data)
+        self.assertTrue(BookTag.objects.filter(tag__name="fiction", book=book).exists())
@@ -142,3 +142,56 @@ class GetBookTagsTest(APITestCase):
 
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertEqual(response.data, expected_data)
+
+    def test_can_get_tag_counts_only(self):
+        book_one = Book.objects.create(
+            title="TagTestBookOne", user=self.user)
+        book_two = Book.objects.create(
+            title="TagTestBookTwo", user=self.user)
+        BookTag.objects.create(
+            tag_name="fiction", user=self.user, book=book_one)
+        BookTag.objects.create(
+            tag_name="fiction", user=self.user, book=book_two)
+        BookTag.objects.create(
+            tag_name="cool", user=self.user, book=book_one)
+
+        expected_data = {
+            "tags": [
+                {
+                    "tag_name": "cool",
+                    "count": 1
+                },
+                {
+                    "tag_name": "fiction",
+                    "count": 2
+                },
+            ]
+        }
+
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.token)
+        url = reverse('tags')
+        response = self.client.get(url, {'counts_only': 1})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data, expected_data)
+
+    def test_tags_are_collected_in_one_query(self):
+        books = [
+            Book.objects.create(title="Book %s" % (index), user=self.user)
+            for index in range(20)
+        ]
+        for book in books:
+            BookTag.objects.create(
+                tag_name="fiction", user=self.user, book=book)
+            BookTag.objects.create(
+                tag_name="tag %s" % (book.id), user=self.user, book=book)
+
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.token)
+        url = reverse('tags')
+        # token lookup, library version and the grouped tags
+        with self.assertNumQueries(3):
+            response = self.client.get(url, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data['tags']), 21)
+        self.assertEqual(response.data['tags'][0]['books'], [book.id for book in books])
@@ -0,0 +1,135 @@
+from django.urls import reverse
+from django.test import TestCase
+from rest_framework.test import APITestCase
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from unittest import skip
+
+from .models import Book, BookTag
+
+from django.apps import apps
+User = apps.get_model('userauth','User')
+
+
+class GetTagsTreeTest(APITestCase):
+    """ Test module for getting a User's tags as a tree """
+
+    def setUp(self):
+        self.user = User.objects.create(
+            username="TagTreeUser", password="password")
+        self.token = str(self.user.auth_token)
+
+    def test_can_get_nested_tags_as_a_tree(self):
+        book_one = Book.objects.create(
+            title="TagTreeBookOne", user=self.user)
+        book_two = Book.objects.create(
+            title="TagTreeBookTwo", user=self.user)
+        BookTag.objects.create(
+            tag_name="fiction", user=self.user, book=book_one)
+        BookTag.objects.create(
+            tag_name="fiction__fantasy__epic", user=self.user, book=book_one)
+        BookTag.objects.create(
+            tag_name="fiction__fantasy", user=self.user, book=book_two)
+        BookTag.objects.create(
+            tag_name="cool", user=self.user, book=book_two)
+
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.token)
+        url = reverse('tags_tree')
+        response = self.client.get(url, format='json')
+
+        expected_data = {
+            "tags": [
+                {
+                    "tag_name": "cool",
+                    "depth": 0,
+                    "book_count": 1,
+                    "children": []
+                },
+                {
+                    "tag_name": "fiction",
+                    "depth": 0,
+                    "book_count": 2,
+                    "children": [
+                        {
+                            "tag_name": "fiction__fantasy",
+                            "depth": 1,
+                            "book_count": 2,
+                            "children": [
+                                {
+                                    "tag_name": "fiction__fantasy__epic",
+                                    "depth": 2,
+                                    "book_count": 1,
+                                    "children": []
+                                }
+                            ]
+                        }
+                    ]
+                }
+            ]
+        }
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data, expected_data)
+
+    def test_book_counts_follow_changes_to_tags(self):
+        book = Book.objects.create(
+            title="TagTreeBook", user=self.user)
+        BookTag.objects.create(
+            tag_name="fiction__fantasy", user=self.user, book=book)
+        other_book = Book.objects.create(
+            title="OtherTagTreeBook", user=self.user)
+        BookTag.objects.create(
+            tag_name="fiction__mystery", user=self.user, book=other_book)
+
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.token)
+        # moving fantasy out from under fiction
+        url = reverse('tag', kwargs={"tag_name": "fiction__fantasy"})
+        self.client.put(url, {"new_name": "fantasy", "books": [book.id]}, format='json')
+        response = self.client.get(reverse('tags_tree'), format='json')
+
+        counts = [(tag["tag_name"], tag["book_count"]) for tag in response.data["tags"]]
+        self.assertEqual(counts, [("fantasy", 1), ("fiction", 1)])
+
+        other_book.delete()
+        response = self.client.get(reverse('tags_tree'), format='json')
+
+        counts = [(tag["tag_name"], tag["book_count"]) for tag in response.data["tags"]]
+        self.assertEqual(counts, [("fantasy", 1), ("fiction", 0)])
+
+    def test_only_returns_the_users_tags(self):
+        other_user = User.objects.create(
+            username="OtherTagTreeUser", password="password")
+        other_book = Book.objects.create(
+            title="OtherUsersBook", user=other_user)
+        BookTag.objects.create(
+            tag_name="fiction", user=other_user, book=other_book)
+
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.token)
+        url = reverse('tags_tree')
+        response = self.client.get(url, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data, {"tags": []})
+
+    def test_a_tag_named_tree_is_at_its_own_address(self):
+        book = Book.objects.create(
+            title="TagTreeBook", user=self.user)
+        BookTag.objects.create(
+            tag_name="tree", user=self.user, book=book)
+
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.token)
+        url = reverse('tag', kwargs={"tag_name": "tree"})
+        response = self.client.get(url, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data, {"tags": [{"tag_name": "tree", "books": [book.id]}]})
+
+        response = self.client.put(url, {"new_name": "trees", "books": [book.id]}, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(BookTag.objects.filter(tag__name="trees", book=book).exists())
+
+    def test_returns_error_if_unauthorized(self):
+        url = reverse('tags_tree')
+        response = self.client.get(url, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
@@ -4,13 +4,23 @@ from . import views
 
 urlpatterns = [
     path('books/',                  views.books,        name="books"),
+    path('books/bulk/',             views.books_bulk,   name="books_bulk"),
+    path('books/search/',           views.books_search, name="books_search"),
     path('books/<int:book_id>/',    views.book,         name="book"),
     path('series/',                 views.all_series,   name="series_list"),
     path('series/<int:series_id>/', views.one_series,   name="series_details"),
     path('tags/',                   views.tags,         name="tags"),
     path('tags/<str:tag_name>/',    views.tag,          name="tag"),
+    path('tag-tree/',               views.tags_tree,    name="tags_tree"),
+    path('authors/',                views.authors,      name="authors"),
+    path('authors/<int:author_id>/books/', views.author_books, name="author_books"),
     path('status/<int:id>/',        views.bookstatus,   name="bookstatus"),
-    path('rating/<int:book_id>/',   views.rating,       name="rating")
+    path('rating/<int:book_id>/',   views.rating,       name="rating"),
+    path('imports/',                views.imports,      name="imports"),
+    path('imports/<int:job_id>/',   views.import_job,   name="import_job"),
+    path('export/',                 views.export,       name="export"),
+    path('sync/',                   views.sync,         name="sync"),
+    path('batch/',                  views.batch,        name="batch"),
 ]
 
 urlpatterns = format_suffix_patterns(urlpatterns, allowed=['json'])
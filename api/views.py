@@ -1,9 +1,12 @@
 from django.shortcuts import render
+from django.http import StreamingHttpResponse
 
-from rest_framework.decorators import api_view
+from rest_framework.decorators import api_view, parser_classes, renderer_classes
+from rest_framework.parsers import JSONParser, MultiPartParser
 from rest_framework.response import Response
 from rest_framework import status
 from django.core.exceptions import ValidationError
+from django.db import transaction
 
 from django.utils import timezone
 from django.utils.dateparse import parse_datetime
@@ -11,32 +14,87 @@ import datetime
 import pytz
 
 from rest_framework.authtoken.models import Token
-from .models import Book, BookAuthor, Series, BookTag, BookStatus
-from .serializers import BookSerializer, SeriesSerializer, BookTagSerializer, BookStatusSerializer
-
-from django.apps import apps
-User = apps.get_model('userauth','User')
-
-from django.db.models import F, Value
-from django.db.models.functions import Concat, Right, Length
+from .models import Book, BookAuthor, Series, Tag, BookTag, BookStatus, ImportJob, Tombstone
+from .serializers import BookSerializer, SeriesSerializer, BookTagSerializer, BookStatusSerializer, ImportJobSerializer
+from .helper import prefetch_book_relations, replace_book_names
+from .pagination import is_paginated, paginate_books, paginate_by_offset, get_ordering, ordering_columns
+from .filters import filter_books
+from .authors import book_authors, author_counts, author_book_ids
+from .tags import tag_books, rename_tag, prune_tags, subtree_filter, subtree_book_ids, tag_tree
+from .parsers import NDJSONParser, CSVParser
+from .renderers import NDJSONRenderer, CSVRenderer
+from .export import ndjson_lines, csv_lines
+from .bulk import MAX_BULK_BOOKS, parse_books, create_books
+from .batch import MAX_BATCH_OPERATIONS, find_operation_error, run_operation
+from .search import build_search_query, search_books
+from .book_cache import STUB_FIELDS, book_documents, forget_books
+from .fast_serializers import serialize_books, serialize_series, serialize_statuses
+from .fieldsets import requested_book_fields, sparse_books
+from .conditional import conditional_library_get
+from .sync import library_changes, decode_sync_cursor
+
+# query parameter values that switch on an optional mode
+TRUE_VALUES = ['1', 'true', 'True']
+
+from django.db.models import F, Count, prefetch_related_objects
+from django.contrib.postgres.aggregates import ArrayAgg
 
 
 # Create your views here.
 @api_view(["GET", "POST"])
+@conditional_library_get
 def books(request):
     if request.method == 'GET':
         # get user from token passed into request header
-        requestUser = User.objects.get(auth_token__key=request.auth)
+        requestUser = request.user
+
+        # ?fields= and ?exclude= pick which fields each book has,
+        # ?ordering= sorts them, and the other parameters filter them (see api/filters.py)
+        try:
+            fields = requested_book_fields(request.query_params)
+            ordering = get_ordering(request.query_params)
+            bookList = filter_books(Book.objects.filter(user=requestUser), requestUser, request.query_params)
+        except ValueError as error:
+            error_message = {
+                "error": str(error)
+            }
+            return Response(error_message, status=status.HTTP_400_BAD_REQUEST)
 
-        # find all books associated with this user
-        bookList = Book.objects.filter(user=requestUser)
+        # the books are ordered by this column, which pages' cursors are made from
+        ordering_column = ordering.lstrip('-')
+        if fields is None:
+            # find all books associated with this user; only what's needed to find them
+            # in the book cache is loaded here
+            bookList = bookList.only(*STUB_FIELDS, ordering_column)
+        else:
+            # load only the fields asked for; the book cache holds whole books, so it's skipped
+            bookList = sparse_books(bookList, fields, ordering_column)
+
+        # return a single page of books if the client asked for one
+        next_cursor = None
+        paginated = is_paginated(request.query_params)
+        if paginated:
+            try:
+                bookList, next_cursor = paginate_books(bookList, request.query_params)
+            except ValueError as error:
+                error_message = {
+                    "error": str(error)
+                }
+                return Response(error_message, status=status.HTTP_400_BAD_REQUEST)
+        elif 'ordering' in request.query_params:
+            bookList = bookList.order_by(*ordering_columns(ordering))
 
-        # serialize the book list
-        serializer = BookSerializer(bookList, many=True)
+        # serialize the book list, reusing cached books that haven't changed
+        if fields is None:
+            book_data = book_documents(bookList)
+        else:
+            book_data = BookSerializer(bookList, many=True, fields=fields).data
         # add wrapper key
         json = {
-            'books': serializer.data
+            'books': book_data
         }
+        if paginated:
+            json['next'] = next_cursor
 
         return Response(json, status=status.HTTP_200_OK)
 
@@ -44,8 +102,7 @@ def books(request):
         # print("\nPOSTING\n", request.body)
 
         if 'title' in request.data and 'authors' in request.data:
-            requestUser = User.objects.get(
-                auth_token__key=request.auth)
+            requestUser = request.user
             title = request.data['title']
             authors = request.data['authors']
                         
@@ -102,17 +159,15 @@ def books(request):
                 page_count=page_count,
                 description=description)
 
-            # make new authors
-            for author in authors:
-                BookAuthor.objects.create(
-                    author_name=author, user=requestUser, book=newBook)
+            # make new authors, in the order they were given
+            BookAuthor.objects.bulk_create(
+                book_authors(requestUser, [(newBook, author) for author in authors]))
 
             if 'tags' in request.data:
                 # make new tags
                 tags = request.data['tags']
-                for tag in tags:
-                    BookTag.objects.create(
-                        tag_name=tag, book=newBook, user=requestUser)
+                BookTag.objects.bulk_create(
+                    tag_books(requestUser, [(newBook, tag) for tag in tags]))
 
             # make new default status
             date = pytz.utc.localize(datetime.datetime.now())
@@ -134,20 +189,108 @@ def books(request):
             return Response(error_message, status=status.HTTP_400_BAD_REQUEST)
 
 
+@api_view(["POST"])
+@parser_classes([JSONParser, NDJSONParser])
+def books_bulk(request):
+    if request.method == "POST":
+        # accept a bare list (JSON array or NDJSON) or one wrapped like { "books": [...] }
+        items = request.data
+        if isinstance(items, dict) and 'books' in items:
+            items = items['books']
+
+        if not isinstance(items, list) or len(items) == 0:
+            error_message = {"error": "Expected a list of books"}
+            return Response(error_message, status=status.HTTP_400_BAD_REQUEST)
+        if len(items) > MAX_BULK_BOOKS:
+            error_message = {"error": "Too many books; at most %s can be created at once" %(MAX_BULK_BOOKS)}
+            return Response(error_message, status=status.HTTP_400_BAD_REQUEST)
+
+        request_user = request.user
+
+        # check every book before creating any of them
+        entries, errors = parse_books(items, request_user)
+        if errors:
+            error_message = {
+                "error": "Invalid book parameters",
+                "errors": errors
+            }
+            return Response(error_message, status=status.HTTP_400_BAD_REQUEST)
+
+        new_books = create_books(entries, request_user)
+
+        # create response json, in the same order the books were given
+        prefetch_related_objects(new_books, 'authors', 'tags')
+        serializer = BookSerializer(new_books, many=True)
+        json = {
+            'books': serializer.data
+        }
+
+        return Response(json, status=status.HTTP_201_CREATED)
+
+
+# how many search results come back when no page_size is given
+SEARCH_PAGE_SIZE = 20
+
+
+@api_view(["GET"])
+@conditional_library_get
+def books_search(request):
+    if request.method == "GET":
+        search_query = build_search_query(request.query_params.get('q', ''))
+        if search_query is None:
+            error_message = {"error": "No search terms provided"}
+            return Response(error_message, status=status.HTTP_400_BAD_REQUEST)
+
+        # find this user's matching books, best matches first
+        results = search_books(request.user, search_query).only(*STUB_FIELDS)
+
+        try:
+            bookList, next_cursor = paginate_by_offset(results, request.query_params, SEARCH_PAGE_SIZE)
+        except ValueError as error:
+            error_message = {
+                "error": str(error)
+            }
+            return Response(error_message, status=status.HTTP_400_BAD_REQUEST)
+
+        # serialize the page, reusing cached books that haven't changed
+        json = {
+            'books': book_documents(bookList),
+            'next': next_cursor
+        }
+
+        return Response(json, status=status.HTTP_200_OK)
+
+
 @api_view(["GET", "DELETE", "PUT"])
+@conditional_library_get
 def book(request, book_id):
     if request.method == 'GET':
+        # ?fields= and ?exclude= pick which fields the book has
+        try:
+            fields = requested_book_fields(request.query_params)
+        except ValueError as error:
+            error_message = {
+                "error": str(error)
+            }
+            return Response(error_message, status=status.HTTP_400_BAD_REQUEST)
+
         # find book by ID; use .filter to avoid throwing error if not found
-        book_results = Book.objects.filter(id=book_id)
+        if fields is None:
+            book_results = Book.objects.filter(id=book_id).only(*STUB_FIELDS)
+        else:
+            book_results = sparse_books(Book.objects.filter(id=book_id), fields, 'user')
 
         if book_results.count() > 0:
             book = book_results[0]
-            request_user = User.objects.get(auth_token__key=request.auth)
+            request_user = request.user
 
-            if book.user.id == request_user.id:
-                serializer = BookSerializer(book)
+            if book.user_id == request_user.id:
+                if fields is None:
+                    book_data = book_documents([book])[0]
+                else:
+                    book_data = BookSerializer(book, fields=fields).data
                 json = {
-                    "book": serializer.data
+                    "book": book_data
                 }
 
                 return Response(json, status=status.HTTP_200_OK)
@@ -165,8 +308,7 @@ def book(request, book_id):
 
     elif request.method == "DELETE":
         # find the user making the request
-        requestUser = User.objects.get(
-            auth_token__key=request.auth)
+        requestUser = request.user
         requestUserId = requestUser.id
         # find book by ID; use .filter to avoid throwing error if not found
         filteredBook = Book.objects.filter(id=book_id)
@@ -174,16 +316,17 @@ def book(request, book_id):
         if filteredBook.count() > 0:
             book = filteredBook[0]
             # check that book belongs to user making the request
-            if book.user.id == requestUserId:
+            if book.user_id == requestUserId:
                 serializer = BookSerializer(book)
                 json = {
                     "book": serializer.data
                 }
                 book.delete()
+                forget_books(requestUserId, [book_id])
                 return Response(json, status=status.HTTP_200_OK)
             else:
                 json = {
-                    "error": "Users can only delete their own books; book %s belongs to user %s" %(book.id, book.user.id)
+                    "error": "Users can only delete their own books; book %s belongs to user %s" %(book.id, book.user_id)
                 }
                 return Response(json, status=status.HTTP_400_BAD_REQUEST)
         
@@ -194,7 +337,7 @@ def book(request, book_id):
         return Response(json, status=status.HTTP_400_BAD_REQUEST)
 
     elif request.method == "PUT":
-        request_user = User.objects.get(auth_token__key=request.auth)
+        request_user = request.user
         # print("\nPUTTING\n", request.body)
         filtered_books = Book.objects.filter(id=book_id)
 
@@ -206,55 +349,6 @@ def book(request, book_id):
                 new_title = request.data['title']
                 book.title = new_title
 
-            # update authors if an author key is received
-            if "authors" in request.data:
-                # check existing authors against input
-                new_authors = request.data['authors']
-                existing_authors = BookAuthor.objects.filter(book=book)
-                for bookauthor in existing_authors:
-                    # check if new input contains this author name
-                    existing_author_name = bookauthor.author_name
-
-                    if existing_author_name in new_authors:
-                        # remove this author from new_authors
-                        new_authors.remove(existing_author_name)
-                    else:
-                        # remove this bookauthor entry
-                        bookauthor.delete()
-
-                # set new authors
-                for author_name in new_authors:
-                    BookAuthor.objects.create(
-                        author_name=author_name, user=request_user, book=book)
-
-            # update tags if an tag key is received
-            if "tags" in request.data:
-                recieved_tags = request.data['tags']
-
-                # remove any duplicates from input
-                new_tags = []
-                for tag in recieved_tags:
-                    if tag not in new_tags:
-                        new_tags.append(tag)
-
-                # check existing tags against input
-                existing_tags = BookTag.objects.filter(book=book, user=request_user)
-                for booktag in existing_tags:
-                    # check if new input contains this tag name
-                    existing_tag = booktag.tag_name
-
-                    if existing_tag in new_tags:
-                        # remove this tag from new_tags
-                        new_tags.remove(existing_tag)
-                    else:
-                        # remove this booktag entry
-                        booktag.delete()
-
-                # set new tags
-                for booktag in new_tags:
-                    BookTag.objects.create(
-                        tag_name=booktag, user=request_user, book=book)
-
             # update series info if given any
             if 'position_in_series' in request.data:
                 position_in_series = request.data['position_in_series']
@@ -290,8 +384,14 @@ def book(request, book_id):
             if 'description' in request.data:
                 book.description = request.data['description']
 
-            # save updated book
-            book.save()
+            # save updated book, with its authors and tags if any were received
+            with transaction.atomic():
+                if "authors" in request.data:
+                    replace_book_names(BookAuthor, book, request_user, request.data['authors'])
+                if "tags" in request.data:
+                    replace_book_names(BookTag, book, request_user, request.data['tags'])
+                book.save()
+            forget_books(book.user_id, [book.id])
 
             # serialize updated book
             updated_book = Book.objects.filter(id=book_id)
@@ -310,19 +410,19 @@ def book(request, book_id):
 
 
 @api_view(["GET", "POST"])
+@conditional_library_get
 def all_series(request):
     if request.method == "GET":
         # get user from token passed into request header
-        request_user = User.objects.get(auth_token__key=request.auth)
+        request_user = request.user
 
         # # find all series associated with this user
         series_list = Series.objects.filter(user=request_user)
 
         # # serialize the series list
-        serializer = SeriesSerializer(series_list, many=True)
         # add wrapper key
         json = {
-            'series': serializer.data
+            'series': serialize_series(series_list)
         }
 
         return Response(json, status=status.HTTP_200_OK)
@@ -334,7 +434,7 @@ def all_series(request):
             # make new series
             name = request.data['name']
             planned_count = request.data['planned_count']
-            request_user = User.objects.get(auth_token__key=request.auth)
+            request_user = request.user
             new_series = Series.objects.create(
                 name=name, planned_count=planned_count, user=request_user)
             
@@ -359,19 +459,22 @@ def one_series(request, series_id):
             series = filtered_series[0]
 
             # check that series belongs to user making the request
-            requestUser = User.objects.get(auth_token__key=request.auth)
-            if series.user.id == requestUser.id:
+            requestUser = request.user
+            if series.user_id == requestUser.id:
                 serializer = SeriesSerializer(series)
                 json = {
                     "series": serializer.data
                 }
 
+                # its books are left out of any series, so drop them from the book cache
+                series_book_ids = list(series.books.values_list('id', flat=True))
                 series.delete()
+                forget_books(requestUser.id, series_book_ids)
 
                 return Response(json, status=status.HTTP_200_OK)
             else:
                 error_message = {
-                    "error": "Users can only delete their own series; series %s belongs to user %s" %(series.id, series.user.id)
+                    "error": "Users can only delete their own series; series %s belongs to user %s" %(series.id, series.user_id)
                 }
                 return Response(error_message, status=status.HTTP_400_BAD_REQUEST)
         else:
@@ -412,31 +515,27 @@ def one_series(request, series_id):
             return Response(error_message, status=status.HTTP_400_BAD_REQUEST)
 
 @api_view(["GET"])
+@conditional_library_get
 def tags(request):
     if request.method == "GET":
-        request_user = User.objects.get(auth_token__key=request.auth)
-
-        booktag_list = BookTag.objects.filter(user=request_user)
-
-        # organize into list like
-        # { 'tag_name': [...book_ids...] }
-        collected_tags = {}
-        for tag in booktag_list:
-            if tag.tag_name in collected_tags:
-                if tag.book.id not in collected_tags[tag.tag_name]:
-                    collected_tags[tag.tag_name].append(tag.book.id)
-            else:
-                collected_tags[tag.tag_name] = [tag.book.id]
-
-        # organize into objects like
-        # { 'name': tag_name, 'books': [...] }
-        tag_list = []
-        for tag_name in collected_tags:
-            new_tag = {
-                "tag_name": tag_name,
-                "books": collected_tags[tag_name]
-            }
-            tag_list.append(new_tag)
+        request_user = request.user
+
+        # the user's tags that books have, in order. Naming the user of the book tags too
+        # (always the tag's user) lets the join read just theirs, by the index on BookTag.user
+        tag_rows = Tag.objects.filter(
+            user=request_user, book_tags__user=request_user
+        ).values(tag_name=F('name')).order_by('tag_name')
+
+        if request.query_params.get('counts_only') in TRUE_VALUES:
+            # organize into objects like
+            # { 'tag_name': tag_name, 'count': number_of_books }
+            tag_list = list(tag_rows.annotate(
+                count=Count('book_tags__book', distinct=True)))
+        else:
+            # let the database group the rows into objects like
+            # { 'tag_name': tag_name, 'books': [...book_ids...] }
+            tag_list = list(tag_rows.annotate(
+                books=ArrayAgg('book_tags__book', distinct=True, ordering='book_tags__book')))
 
         # add wrapper
         json = {
@@ -445,67 +544,88 @@ def tags(request):
 
         return Response(json, status=status.HTTP_200_OK)
 
-@api_view(["PUT", "DELETE"])
+@api_view(["GET"])
+@conditional_library_get
+def tags_tree(request):
+    # the user's tags nested into a tree, each with how many books it and the tags under it have
+    json = {
+        "tags": tag_tree(request.user)
+    }
+    return Response(json, status=status.HTTP_200_OK)
+
+@api_view(["GET", "PUT", "DELETE"])
+@conditional_library_get
 def tag(request, tag_name):
-    if request.method == "PUT":
+    if request.method == "GET":
+        # every book with the tag or one nested under it, from one indexed query
+        book_ids = list(subtree_book_ids(request.user, tag_name))
+
+        if len(book_ids) > 0:
+            json = {
+                "tags": [{
+                    "tag_name": tag_name,
+                    "books": book_ids
+                }]
+            }
+            return Response(json, status=status.HTTP_200_OK)
+        else:
+            error_message = {
+                "error": "No tags match the name '%s'" %(tag_name)
+            }
+            return Response(error_message, status=status.HTTP_400_BAD_REQUEST)
+
+    elif request.method == "PUT":
         if 'new_name' in request.data and 'books' in request.data:
             new_name = request.data['new_name']
             new_books = request.data['books']
-            request_user = User.objects.get(auth_token__key=request.auth)
+            request_user = request.user
 
             # find all occurrences of the provided tag name in the database
-            matching_tags = BookTag.objects.filter(tag_name=tag_name, user=request_user)
+            matching_tags = BookTag.objects.filter(tag__name=tag_name, user=request_user)
             if matching_tags.count() > 0:
                 if len(new_books) > 0:
-                    updated_tag = {
-                        "tag_name": new_name,
-                        "books": []
-                    }
-
+                    # find every book before changing anything
+                    found_books = Book.objects.filter(id__in=new_books, user=request_user).values_list('id', flat=True)
+                    found_ids = [str(book_id) for book_id in found_books]
                     for book_id in new_books:
-                        matching_books = Book.objects.filter(id=book_id)
-                        # if there's a matching book
-                        if matching_books.count() > 0:
-                            matching_book = matching_books[0]
-                            matching_booktags = BookTag.objects.filter(tag_name=tag_name, user=request_user, book=matching_book)
-                            # if there's an existing booktag for it
-                            if matching_booktags.count() > 0:
-                                matching_booktag = matching_booktags[0]
-                                matching_booktag.tag_name = new_name
-                                matching_booktag.save()
-                                updated_tag["books"].append(matching_book.id)
-                            # if there isn't an existing booktag
-                            else:
-                                new_booktag = BookTag.objects.create(tag_name=new_name, user=request_user, book=matching_book)
-                                updated_tag["books"].append(matching_book.id)
-                        # if there isn't a matching book
-                        else:
+                        if str(book_id) not in found_ids:
                             error_message = { "error": "Could not find book with ID: %s" %(book_id) }
                             return Response(error_message, status=status.HTTP_400_BAD_REQUEST)
-                        
-                    for matching_tag in matching_tags:
-                        # if that tag's book id is not also in new_books
-                        if matching_tag.book.id not in new_books:
-                            matching_tag.delete()
-
-                    # calculate prefix form
-                    new_prefix = new_name + "__"
-                    old_prefix = tag_name + "__"
-                    old_prefix_length = len(old_prefix)
-                    # update all tags with matching prefixes
-                    BookTag.objects.filter(
-                        tag_name__startswith=old_prefix, 
-                        user=request_user
-                    ).update(
-                        tag_name=Concat(
-                            Value(new_prefix), 
-                            Right(
-                                F('tag_name'), 
-                                Length(F('tag_name')) - Value(old_prefix_length)
-                            )
-                        )
-                    )
+                    book_ids = [int(book_id) for book_id in new_books]
+
+                    tag = matching_tags[0].tag
+                    # every book whose tags change, so they can be dropped from the book cache:
+                    # those with this tag or one nested under it, and those being given it
+                    changed_book_ids = list(BookTag.objects.filter(
+                        tag__in=Tag.objects.filter(subtree_filter(tag_name), user=request_user)
+                    ).values_list('book_id', flat=True))
+                    changed_book_ids += book_ids
+
+                    try:
+                        with transaction.atomic():
+                            # books that aren't in the new list lose the tag
+                            BookTag.objects.filter(tag=tag).exclude(book_id__in=book_ids).delete()
+                            # renaming the one Tag row renames it for every book, and any tags
+                            # nested under it along with it
+                            tag = rename_tag(tag, new_name)
+                            # books that don't have it yet gain it
+                            tagged = set(BookTag.objects.filter(tag=tag).values_list('book_id', flat=True))
+                            BookTag.objects.bulk_create([
+                                BookTag(tag=tag, user=request_user, book_id=book_id)
+                                for book_id in dict.fromkeys(book_ids)
+                                if book_id not in tagged
+                            ])
+                    except ValueError as error:
+                        error_message = { "error": str(error) }
+                        return Response(error_message, status=status.HTTP_400_BAD_REQUEST)
+                    # the tags the old name was nested under may no longer be needed
+                    prune_tags(request_user)
+                    forget_books(request_user.id, changed_book_ids)
 
+                    updated_tag = {
+                        "tag_name": new_name,
+                        "books": book_ids
+                    }
                     # add wrapper
                     json = {
                         "tags": [updated_tag]
@@ -519,8 +639,10 @@ def tag(request, tag_name):
                     json = {
                         "tags": serializer.data
                     }
-                    for tag in matching_tags:
-                        tag.delete()
+                    book_ids = [tag.book_id for tag in matching_tags]
+                    matching_tags.delete()
+                    prune_tags(request_user)
+                    forget_books(request_user.id, book_ids)
                     return Response(json, status=status.HTTP_200_OK)
             else:
                 error_message = {
@@ -534,10 +656,10 @@ def tag(request, tag_name):
             return Response(error_message, status=status.HTTP_400_BAD_REQUEST)
 
     elif request.method == "DELETE":
-        request_user = User.objects.get(auth_token__key=request.auth)
+        request_user = request.user
 
         # find all occurrences of the provided tag name in the database
-        matching_tags = BookTag.objects.filter(tag_name=tag_name, user=request_user)
+        matching_tags = BookTag.objects.filter(tag__name=tag_name, user=request_user)
 
         if matching_tags.count() > 0:
             # serialize tags to be deleted
@@ -546,9 +668,11 @@ def tag(request, tag_name):
                 "tags": serializer.data
             }
 
-            # for each matching tag, delete that tag
-            for tag in matching_tags:
-                tag.delete()
+            # delete every matching tag in one statement, then the tag itself if nothing else uses it
+            book_ids = [tag.book_id for tag in matching_tags]
+            matching_tags.delete()
+            prune_tags(request_user)
+            forget_books(request_user.id, book_ids)
 
             return Response(json, status=status.HTTP_200_OK)
         else:
@@ -557,11 +681,42 @@ def tag(request, tag_name):
             }
             return Response(error_message, status=status.HTTP_400_BAD_REQUEST)
 
+@api_view(["GET"])
+@conditional_library_get
+def authors(request):
+    # the user's authors in order of name, each with how many books they have,
+    # counted by the database in one query
+    json = {
+        "authors": list(author_counts(request.user))
+    }
+    return Response(json, status=status.HTTP_200_OK)
+
+@api_view(["GET"])
+@conditional_library_get
+def author_books(request, author_id):
+    # the author with the ids of their books, gathered by the database in one query
+    author = author_book_ids(request.user, author_id).first()
+
+    if author is not None:
+        # an author whose books have all been deleted aggregates no rows, which is NULL
+        if author['books'] is None:
+            author['books'] = []
+        json = {
+            "authors": [author]
+        }
+        return Response(json, status=status.HTTP_200_OK)
+    else:
+        error_message = {
+            "error": "Could not find author with ID: %s" %(author_id)
+        }
+        return Response(error_message, status=status.HTTP_400_BAD_REQUEST)
+
 @api_view(["GET", "POST", "DELETE"])
+@conditional_library_get
 def bookstatus(request, id):
     if request.method == "GET":
         book_id = id
-        request_user = User.objects.get(auth_token__key=request.auth)
+        request_user = request.user
         matching_books = Book.objects.filter(user=request_user, id=book_id)
         
         if matching_books.count() > 0:
@@ -577,9 +732,8 @@ def bookstatus(request, id):
             #         date=matching_book.current_status_date
             #     )
 
-            serializer = BookStatusSerializer(matching_bookstatuses, many=True)
             json = {
-                'status_history': serializer.data
+                'status_history': serialize_statuses(matching_bookstatuses)
             }
             return Response(json, status=status.HTTP_200_OK)
         else:
@@ -590,7 +744,7 @@ def bookstatus(request, id):
 
     elif request.method == "POST":
         book_id = id
-        request_user = User.objects.get(auth_token__key=request.auth)
+        request_user = request.user
         matching_books = Book.objects.filter(user=request_user, id=book_id)
 
         if matching_books.count() > 0:
@@ -616,13 +770,17 @@ def bookstatus(request, id):
 
                     # update book's current status
                     # if the new status's date is more recent than the old current status
-                    new_date = parse_datetime(date)
-                    old_date = matching_book.current_status_date
-                    difference = new_date - old_date
-                    if (difference.days > 0) or (difference.days == 0 and difference.seconds > 0):
-                        matching_book.current_status = status_code
-                        matching_book.current_status_date = date
-                        matching_book.save()
+                    with transaction.atomic():
+                        # locked, and read again, as when a status is deleted
+                        matching_book = Book.objects.select_for_update().get(id=matching_book.id)
+                        new_date = parse_datetime(date)
+                        old_date = matching_book.current_status_date
+                        difference = new_date - old_date
+                        if (difference.days > 0) or (difference.days == 0 and difference.seconds > 0):
+                            matching_book.current_status = status_code
+                            matching_book.current_status_date = date
+                            matching_book.save()
+                            forget_books(request_user.id, [matching_book.id])
 
                     serializer = BookStatusSerializer(new_status)
                     json = {
@@ -647,7 +805,7 @@ def bookstatus(request, id):
     
     elif request.method == "DELETE":
         status_id = id
-        request_user = User.objects.get(auth_token__key=request.auth)
+        request_user = request.user
         matching_statuses = BookStatus.objects.filter(id=status_id, user=request_user)
 
         if matching_statuses.count() > 0:
@@ -658,30 +816,30 @@ def bookstatus(request, id):
                 "status": serializer.data,
             }
 
-            # update book
-            matching_book = matching_status.book
-            status_history = BookStatus.objects.filter(user=request_user, book=matching_book)
+            with transaction.atomic():
+                # lock the book, so a status added or deleted at the same time waits for this
+                # one rather than setting the book's current status from an older history
+                matching_book = Book.objects.select_for_update().get(id=matching_status.book_id)
 
-            if status_history.count() > 0:
-                most_recent = status_history[0]
+                # the book's new current status is the most recent of the others, read backwards
+                # from the end of its history by the index on (user, book, date)
+                most_recent = BookStatus.objects.filter(
+                    user=request_user, book=matching_book
+                ).exclude(id=matching_status.id).order_by('-date').first()
 
-                for book_status in status_history:
-                    if book_status != matching_status:
-                        difference = book_status.date - most_recent.date
-                        if (difference.days > 0) or (difference.days == 0 and difference.seconds > 0):
-                            most_recent = book_status
+                matching_status.delete()
 
+                # a book's last status leaves it as it was
+                if most_recent is not None and (
+                        matching_book.current_status != most_recent.status_code
+                        or matching_book.current_status_date != most_recent.date):
                     matching_book.current_status = most_recent.status_code
                     matching_book.current_status_date = most_recent.date
-                    matching_book.save()
+                    matching_book.save(update_fields=['current_status', 'current_status_date'])
 
-                    json["current_status"] = most_recent.status_code
-                    json["current_status_date"] = most_recent.date
-            else:
-                json["current_status"] = matching_book.current_status
-                json["current_status_date"] = matching_book.current_status_date
-
-            matching_status.delete()
+            json["current_status"] = matching_book.current_status
+            json["current_status_date"] = matching_book.current_status_date
+            forget_books(request_user.id, [matching_book.id])
 
             return Response(json, status=status.HTTP_200_OK)
 
@@ -694,7 +852,7 @@ def bookstatus(request, id):
 @api_view(["PUT"])
 def rating(request, book_id):
     if request.method == "PUT":
-        request_user = User.objects.get(auth_token__key=request.auth)
+        request_user = request.user
         matching_books = Book.objects.filter(user=request_user, id=book_id)
 
         if "rating" in request.data:
@@ -705,6 +863,7 @@ def rating(request, book_id):
                 if (any(new_rating in i for i in Book.RATING_CHOICES)):
                     matching_book.rating = new_rating
                     matching_book.save()
+                    forget_books(request_user.id, [matching_book.id])
 
                     serializer = BookSerializer(matching_book)
                     json = {
@@ -726,3 +885,146 @@ def rating(request, book_id):
                 'error': 'New Rating Not Provided'
             }
             return Response(error_message, status=status.HTTP_400_BAD_REQUEST)
+
+@api_view(["POST"])
+@parser_classes([MultiPartParser, CSVParser])
+def imports(request):
+    if request.method == "POST":
+        # accept an uploaded file in the "file" field or a raw text/csv body
+        if isinstance(request.data, str):
+            source = request.data
+        elif 'file' in request.data:
+            try:
+                source = request.data['file'].read().decode('utf-8-sig')
+            except UnicodeDecodeError:
+                error_message = {"error": "CSV file must be UTF-8 encoded"}
+                return Response(error_message, status=status.HTTP_400_BAD_REQUEST)
+        else:
+            source = ''
+
+        if not source.strip():
+            error_message = {"error": "No CSV file provided"}
+            return Response(error_message, status=status.HTTP_400_BAD_REQUEST)
+
+        # queue the import for the process_imports worker
+        new_job = ImportJob.objects.create(user=request.user, source=source)
+
+        serializer = ImportJobSerializer(new_job)
+        json = {
+            "import": serializer.data
+        }
+        return Response(json, status=status.HTTP_202_ACCEPTED)
+
+@api_view(["GET"])
+def import_job(request, job_id):
+    if request.method == "GET":
+        # don't load the uploaded file just to report on the job
+        matching_jobs = ImportJob.objects.filter(id=job_id, user=request.user).defer('source')
+
+        if matching_jobs.count() > 0:
+            serializer = ImportJobSerializer(matching_jobs[0])
+            json = {
+                "import": serializer.data
+            }
+            return Response(json, status=status.HTTP_200_OK)
+        else:
+            error_message = {
+                "error": "Could not find import with ID: %s" %(job_id)
+            }
+            return Response(error_message, status=status.HTTP_400_BAD_REQUEST)
+
+@api_view(["GET"])
+@renderer_classes([NDJSONRenderer, CSVRenderer])
+@conditional_library_get
+def export(request):
+    if request.method == "GET":
+        # ?format=csv or ?format=ndjson (the default) picks the renderer
+        if request.accepted_renderer.format == 'csv':
+            lines = csv_lines(request.user)
+            filename = 'library.csv'
+        else:
+            lines = ndjson_lines(request.user)
+            filename = 'library.ndjson'
+
+        # send the library as it is read instead of building it all in memory
+        response = StreamingHttpResponse(lines, content_type=request.accepted_renderer.media_type)
+        response['Content-Disposition'] = 'attachment; filename="%s"' %(filename)
+        return response
+
+
+@api_view(["GET"])
+@conditional_library_get
+def sync(request):
+    if request.method == "GET":
+        cursor = None
+        if 'since' in request.query_params:
+            try:
+                cursor = decode_sync_cursor(request.query_params['since'])
+            except ValueError as error:
+                error_message = {
+                    "error": str(error)
+                }
+                return Response(error_message, status=status.HTTP_400_BAD_REQUEST)
+
+        changes = library_changes(request.user, cursor)
+
+        json = {
+            'books': serialize_books(changes['books']),
+            'series': serialize_series(changes['series']),
+            'statuses': serialize_statuses(changes['statuses']),
+            'deleted': {
+                'books': changes['deleted'][Tombstone.BOOK],
+                'series': changes['deleted'][Tombstone.SERIES],
+                'statuses': changes['deleted'][Tombstone.STATUS],
+            },
+            'full': changes['full'],
+            'next': changes['next'],
+        }
+        return Response(json, status=status.HTTP_200_OK)
+
+@api_view(["POST"])
+@parser_classes([JSONParser])
+def batch(request):
+    if request.method == "POST":
+        operations = request.data.get('operations') if isinstance(request.data, dict) else None
+
+        if not isinstance(operations, list) or len(operations) == 0:
+            error_message = {"error": "Expected a list of operations"}
+            return Response(error_message, status=status.HTTP_400_BAD_REQUEST)
+        if len(operations) > MAX_BATCH_OPERATIONS:
+            error_message = {"error": "Too many operations; at most %s can be run at once" %(MAX_BATCH_OPERATIONS)}
+            return Response(error_message, status=status.HTTP_400_BAD_REQUEST)
+
+        # check every operation before running any of them
+        for index, operation in enumerate(operations):
+            error = find_operation_error(operation)
+            if error is not None:
+                error_message = {"error": "Operation %s: %s" %(index, error)}
+                return Response(error_message, status=status.HTTP_400_BAD_REQUEST)
+
+        # run them in order, all or nothing: if one fails, the ones before it are undone
+        results = []
+        failed = None
+        with transaction.atomic():
+            for index, operation in enumerate(operations):
+                response = run_operation(request, operation)
+                results.append({
+                    "status": response.status_code,
+                    "body": response.data
+                })
+                if response.status_code >= 400:
+                    failed = index
+                    transaction.set_rollback(True)
+                    break
+
+        if failed is not None:
+            error_message = {
+                "error": "Operation %s failed, so no changes were saved" %(failed),
+                "results": results
+            }
+            return Response(error_message, status=status.HTTP_400_BAD_REQUEST)
+
+        json = {
+            "results": results
+        }
+        return Response(json, status=status.HTTP_200_OK)
@@ -0,0 +1,271 @@
+"""
+Per-route request metrics, kept in memory and served at /metrics in the Prometheus
+text format, https://prometheus.io/docs/instrumenting/exposition_formats/
+
+For every request MetricsMiddleware records, labelled by route and HTTP method:
+    * booktracker_request_duration_seconds   : time from the first middleware to the response
+    * booktracker_db_queries                 : how many SQL queries the request ran
+    * booktracker_db_duration_seconds        : time spent waiting on those queries
+    * booktracker_serialize_duration_seconds : time spent turning models into response data
+    * booktracker_render_duration_seconds    : time spent rendering the response body (e.g. JSON encoding)
+
+Other parts of the app can also count events with registry.increment(); those counters are
+listed in COUNTERS and aren't labelled.
+
+Histograms live in the memory of the process that handled the request, so with several
+gunicorn workers each one serves its own numbers and Prometheus sums them.
+
+If settings.SLOW_REQUEST_THRESHOLD is set (in seconds), requests slower than that are
+logged to the 'booktracker.slow_requests' logger along with every SQL statement they ran.
+"""
+import logging
+import threading
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import connection
+from django.http import HttpResponse, HttpResponseForbidden
+
+
+slow_request_logger = logging.getLogger('booktracker.slow_requests')
+
+# upper bounds of the histogram buckets
+SECONDS_BUCKETS = [0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10]
+QUERY_BUCKETS = [0, 1, 2, 3, 5, 10, 20, 50, 100, 200, 500, 1000]
+
+# name: (help text, bucket bounds)
+HISTOGRAMS = {
+    'booktracker_request_duration_seconds': ("Total time taken to answer a request", SECONDS_BUCKETS),
+    'booktracker_db_queries': ("Number of SQL queries run by a request", QUERY_BUCKETS),
+    'booktracker_db_duration_seconds': ("Time a request spent running SQL queries", SECONDS_BUCKETS),
+    'booktracker_serialize_duration_seconds': ("Time a request spent serializing its response data", SECONDS_BUCKETS),
+    'booktracker_render_duration_seconds': ("Time a request spent rendering its response body", SECONDS_BUCKETS),
+}
+
+# name: help text
+COUNTERS = {
+    'booktracker_book_cache_hits_total': "Serialized books served from the book cache",
+    'booktracker_book_cache_misses_total': "Serialized books missing or stale in the book cache",
+}
+
+# the path metrics are served at; requests to it are not themselves recorded
+METRICS_PATH = '/metrics'
+
+
+class Histogram:
+    """ a cumulative histogram of observed values, like Prometheus's own client keeps """
+
+    def __init__(self, bounds):
+        self.bounds = bounds
+        self.bucket_counts = [0] * len(bounds)
+        self.count = 0
+        self.sum = 0
+
+    def observe(self, value):
+        for index, bound in enumerate(self.bounds):
+            if value <= bound:
+                self.bucket_counts[index] += 1
+        self.count += 1
+        self.sum += value
+
+
+class Registry:
+    """
+    every histogram, keyed by metric name and then by its (route, method) labels,
+    and every counter, keyed by metric name
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.histograms = {name: {} for name in HISTOGRAMS}
+            self.counters = {name: 0 for name in COUNTERS}
+
+    def observe(self, name, labels, value):
+        with self.lock:
+            series = self.histograms[name]
+            if labels not in series:
+                series[labels] = Histogram(HISTOGRAMS[name][1])
+            series[labels].observe(value)
+
+    def increment(self, name, amount=1):
+        with self.lock:
+            self.counters[name] += amount
+
+    def get(self, name, labels):
+        """ the histogram for a metric and labels, or None if nothing was observed yet """
+        return self.histograms[name].get(labels)
+
+    def render(self):
+        """ all histograms and counters in the Prometheus text exposition format """
+        lines = []
+        with self.lock:
+            for name, (help_text, bounds) in HISTOGRAMS.items():
+                lines.append("# HELP %s %s" % (name, help_text))
+                lines.append("# TYPE %s histogram" % (name))
+                for (route, method), histogram in sorted(self.histograms[name].items()):
+                    labels = 'route="%s",method="%s"' % (escape_label(route), escape_label(method))
+                    for bound, bucket_count in zip(bounds, histogram.bucket_counts):
+                        lines.append('%s_bucket{%s,le="%s"} %s' % (name, labels, bound, bucket_count))
+                    lines.append('%s_bucket{%s,le="+Inf"} %s' % (name, labels, histogram.count))
+                    lines.append('%s_sum{%s} %s' % (name, labels, histogram.sum))
+                    lines.append('%s_count{%s} %s' % (name, labels, histogram.count))
+            for name, help_text in COUNTERS.items():
+                lines.append("# HELP %s %s" % (name, help_text))
+                lines.append("# TYPE %s counter" % (name))
+                lines.append("%s %s" % (name, self.counters[name]))
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+
+def escape_label(value):
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def route_name(request):
+    """
+    The name of the URL pattern that handled a request, like 'book' for books/<book_id>/,
+    so that every book shares one set of histograms instead of one per id.
+    """
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return 'unmatched'
+    return match.url_name or match.view_name or 'unnamed'
+
+
+class QueryRecorder:
+    """
+    A database execute wrapper that counts and times every query run while it is installed,
+    https://docs.djangoproject.com/en/3.0/topics/db/instrumentation/
+    """
+
+    def __init__(self, keep_sql):
+        self.count = 0
+        self.duration = 0
+        self.keep_sql = keep_sql
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - start
+            self.count += 1
+            self.duration += elapsed
+            if self.keep_sql:
+                self.queries.append((elapsed, sql))
+
+
+# the serialization time of the request being answered on this thread, while there is one
+serialization = threading.local()
+
+
+@contextmanager
+def timed_serialization():
+    """
+    Count the time spent in the block towards the current request's
+    booktracker_serialize_duration_seconds.
+
+    The serializers in api/serializers.py time their .data with this, and the builders in
+    api/fast_serializers.py and api/book_cache.py time themselves; a block inside another
+    one, like the serializers a builder runs, is only counted once. Serializing runs the
+    queries that load related objects (and the fast builders' .values() queries), so their
+    time is in booktracker_db_duration_seconds too. Blocks run outside a request, like in
+    management commands, aren't counted.
+    """
+    if getattr(serialization, 'duration', None) is None or serialization.depth > 0:
+        yield
+        return
+
+    serialization.depth += 1
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        serialization.duration += time.perf_counter() - start
+        serialization.depth -= 1
+
+
+class MetricsMiddleware:
+    """ records the histograms above for every request; should be the first middleware """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if request.path_info == METRICS_PATH:
+            return self.get_response(request)
+
+        slow_threshold = getattr(settings, 'SLOW_REQUEST_THRESHOLD', None)
+        recorder = QueryRecorder(keep_sql=slow_threshold is not None)
+        request._render_duration = 0
+        serialization.duration = 0
+        serialization.depth = 0
+
+        start = time.perf_counter()
+        try:
+            with connection.execute_wrapper(recorder):
+                response = self.get_response(request)
+        finally:
+            serialize_duration = serialization.duration
+            serialization.duration = None
+        duration = time.perf_counter() - start
+
+        labels = (route_name(request), request.method)
+        registry.observe('booktracker_request_duration_seconds', labels, duration)
+        registry.observe('booktracker_db_queries', labels, recorder.count)
+        registry.observe('booktracker_db_duration_seconds', labels, recorder.duration)
+        registry.observe('booktracker_serialize_duration_seconds', labels, serialize_duration)
+        registry.observe('booktracker_render_duration_seconds', labels, request._render_duration)
+
+        if slow_threshold is not None and duration > slow_threshold:
+            log_slow_request(request, response, duration, recorder)
+
+        return response
+
+    def process_template_response(self, request, response):
+        """
+        DRF's Response is rendered after the view returns; time it by wrapping render().
+        That's the encoding alone: the data was serialized by the view (see timed_serialization).
+        """
+        render = response.render
+
+        def timed_render():
+            start = time.perf_counter()
+            try:
+                return render()
+            finally:
+                request._render_duration += time.perf_counter() - start
+
+        response.render = timed_render
+        return response
+
+
+def log_slow_request(request, response, duration, recorder):
+    lines = [
+        "%s %s (%s) took %.3fs with %s queries taking %.3fs" % (
+            request.method, request.path, route_name(request), duration, recorder.count, recorder.duration)
+    ]
+    for elapsed, sql in recorder.queries:
+        lines.append("  %.3fs  %s" % (elapsed, sql))
+    slow_request_logger.warning("\n".join(lines))
+
+
+def metrics(request):
+    """
+    Serve the histograms to Prometheus.
+
+    If settings.METRICS_TOKEN is set, the scraper must send it as 'Authorization: Bearer <token>'.
+    """
+    metrics_token = getattr(settings, 'METRICS_TOKEN', None)
+    if metrics_token and request.META.get('HTTP_AUTHORIZATION') != 'Bearer %s' % (metrics_token):
+        return HttpResponseForbidden()
+
+    return HttpResponse(registry.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -68,6 +68,10 @@ else:
     ]
 
 MIDDLEWARE = [
+    # first, so that it times everything below it
+    'booktracker.metrics.MetricsMiddleware',
+    # above everything that reads or changes response bodies
+    'booktracker.compression.CompressionMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -156,14 +160,67 @@ AUTH_USER_MODEL = 'userauth.User'
 
 # set authentication scheme
 REST_FRAMEWORK = {
+    # renders exactly like DRF's JSONRenderer, only faster when FAST_RENDERING is on
+    'DEFAULT_RENDERER_CLASSES': [
+        'api.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+        # for clients that send 'Accept: application/msgpack'
+        'api.renderers.MessagePackRenderer',
+    ],
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication',
+        'userauth.authentication.CachedTokenAuthentication',
     ],
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
     ]
 }
 
+# responses shorter than this many bytes aren't compressed (see booktracker/compression.py)
+COMPRESSION_MIN_SIZE = 1024
+
+# Cache
+# https://docs.djangoproject.com/en/3.0/topics/cache/
+# the local-memory cache is per-process; with several gunicorn workers, point this at
+# a shared backend so that invalidating an entry reaches every worker
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        # every serialized book is an entry (see api/book_cache.py), so allow far more than
+        # the default 300 before culling
+        'OPTIONS': {
+            'MAX_ENTRIES': 50000,
+        },
+    }
+}
+
+# how many seconds CachedTokenAuthentication remembers a token's user. Logging out only
+# clears the cache of the worker that handled it, so the other workers can go on accepting
+# the token for this long; keep it short unless CACHES points at a shared backend
+TOKEN_CACHE_TIMEOUT = 5
+
+# build list responses from plain dicts instead of DRF serializers, and encode them with
+# orjson (see api/fast_serializers.py); the responses are the same either way
+FAST_RENDERING = os.environ.get("FAST_RENDERING") == "True"
+
+# how many seconds a serialized book is kept in the cache (see api/book_cache.py)
+BOOK_CACHE_TIMEOUT = 3600
+
+# how many seconds a running import can go without saving progress before another
+# process_imports worker takes it over (see api/importer.py)
+IMPORT_JOB_TIMEOUT = 600
+
+# how many days GET sync/ remembers deletions for (see manage.py prune_tombstones);
+# clients that last synced longer ago than this are sent their whole library
+SYNC_TOMBSTONE_DAYS = 90
+
+# Metrics (see booktracker/metrics.py)
+# requests slower than this many seconds are logged with their SQL; unset to turn the log off
+SLOW_REQUEST_THRESHOLD = None
+if os.environ.get("SLOW_REQUEST_THRESHOLD"):
+    SLOW_REQUEST_THRESHOLD = float(os.environ.get("SLOW_REQUEST_THRESHOLD"))
+# if set, /metrics is only served to requests with the header 'Authorization: Bearer <METRICS_TOKEN>'
+METRICS_TOKEN = os.environ.get("METRICS_TOKEN")
+
 # from https://devcenter.heroku.com/articles/django-assets
 # Static files (CSS, JavaScript, Images)
 # https://docs.djangoproject.com/en/1.9/howto/static-files/
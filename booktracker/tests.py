@@ -0,0 +1,187 @@
+from django.urls import reverse
+from django.test import TestCase, override_settings
+from rest_framework.test import APITestCase
+from rest_framework import status
+from unittest.mock import patch
+import brotli
+import gzip
+import json
+
+from .metrics import registry, serialization, timed_serialization
+from .compression import accepted_codings, choose_coding
+
+from django.apps import apps
+User = apps.get_model('userauth', 'User')
+Book = apps.get_model('api', 'Book')
+BookAuthor = apps.get_model('api', 'BookAuthor')
+
+
+class MetricsMiddlewareTest(APITestCase):
+    """ Test module for the per-route request metrics """
+
+    def setUp(self):
+        registry.reset()
+        self.user = User.objects.create(
+            username='Bertie', password='password')
+        self.token = str(self.user.auth_token)
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.token)
+        self.book = Book.objects.create(title="Counted Book", user=self.user)
+
+    def test_records_each_request_by_route(self):
+        self.client.get(reverse('books'))
+        self.client.get(reverse('books'))
+        self.client.get(reverse('book', args=[self.book.id]))
+
+        books_duration = registry.get('booktracker_request_duration_seconds', ('books', 'GET'))
+        book_duration = registry.get('booktracker_request_duration_seconds', ('book', 'GET'))
+        self.assertEqual(books_duration.count, 2)
+        self.assertEqual(book_duration.count, 1)
+        self.assertGreater(books_duration.sum, 0)
+
+        render_duration = registry.get('booktracker_render_duration_seconds', ('books', 'GET'))
+        self.assertEqual(render_duration.count, 2)
+        self.assertGreater(render_duration.sum, 0)
+
+    def test_times_serialization_apart_from_rendering(self):
+        self.client.get(reverse('books'))
+        with override_settings(FAST_RENDERING=True):
+            self.client.get(reverse('series_list'))
+
+        for route in ('books', 'series_list'):
+            with self.subTest(route=route):
+                serialize_duration = registry.get('booktracker_serialize_duration_seconds', (route, 'GET'))
+                self.assertEqual(serialize_duration.count, 1)
+                self.assertGreater(serialize_duration.sum, 0)
+
+    def test_counts_nested_serialization_once(self):
+        serialization.duration = 0
+        serialization.depth = 0
+        # only the outer block reads the clock
+        with patch('booktracker.metrics.time.perf_counter', side_effect=[1, 3]):
+            with timed_serialization():
+                with timed_serialization():
+                    pass
+        self.assertEqual(serialization.duration, 2)
+
+        # outside a request, nothing is counted
+        serialization.duration = None
+        with timed_serialization():
+            pass
+        self.assertIsNone(serialization.duration)
+
+    def test_counts_queries(self):
+        # token, library version, books, then the uncached book, its authors and its tags
+        with self.assertNumQueries(6):
+            self.client.get(reverse('books'))
+
+        queries = registry.get('booktracker_db_queries', ('books', 'GET'))
+        self.assertEqual(queries.sum, 6)
+        self.assertGreater(registry.get('booktracker_db_duration_seconds', ('books', 'GET')).sum, 0)
+
+    def test_metrics_endpoint_serves_prometheus_text(self):
+        self.client.get(reverse('books'))
+
+        response = self.client.get(reverse('metrics'))
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response['Content-Type'].startswith('text/plain; version=0.0.4'))
+        body = response.content.decode('utf-8')
+        self.assertIn('# TYPE booktracker_db_queries histogram', body)
+        self.assertIn('booktracker_db_queries_bucket{route="books",method="GET",le="10"} 1', body)
+        self.assertIn('booktracker_db_queries_bucket{route="books",method="GET",le="+Inf"} 1', body)
+        self.assertIn('booktracker_db_queries_count{route="books",method="GET"} 1', body)
+        self.assertIn('booktracker_db_queries_sum{route="books",method="GET"} 6', body)
+        self.assertIn('# TYPE booktracker_book_cache_misses_total counter', body)
+        self.assertIn('booktracker_book_cache_misses_total 1', body)
+        self.assertIn('booktracker_book_cache_hits_total 0', body)
+        # the metrics endpoint doesn't record itself
+        self.assertNotIn('route="metrics"', body)
+
+    @override_settings(METRICS_TOKEN='scraper-secret')
+    def test_metrics_endpoint_can_require_a_token(self):
+        self.client.credentials()
+        response = self.client.get(reverse('metrics'))
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+        response = self.client.get(reverse('metrics'), HTTP_AUTHORIZATION='Bearer scraper-secret')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    @override_settings(SLOW_REQUEST_THRESHOLD=0)
+    def test_logs_slow_requests_with_their_sql(self):
+        with self.assertLogs('booktracker.slow_requests', level='WARNING') as logs:
+            self.client.get(reverse('books'))
+
+        self.assertEqual(len(logs.output), 1)
+        self.assertIn('GET /books/ (books)', logs.output[0])
+        self.assertIn('with 6 queries', logs.output[0])
+        self.assertIn('FROM "api_book"', logs.output[0])
+
+    @override_settings(SLOW_REQUEST_THRESHOLD=60)
+    def test_does_not_log_fast_requests(self):
+        with self.assertRaises(AssertionError):
+            with self.assertLogs('booktracker.slow_requests', level='WARNING'):
+                self.client.get(reverse('books'))
+
+
+class CompressionMiddlewareTest(APITestCase):
+    """ Test module for compressing responses """
+
+    def setUp(self):
+        self.user = User.objects.create(
+            username='Bertie', password='password')
+        self.token = str(self.user.auth_token)
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.token)
+        for index in range(50):
+            book = Book.objects.create(title="Compressible Book %s" % (index), user=self.user)
+            BookAuthor.objects.create(author_name="Compressible Author", book=book, user=self.user)
+
+    def test_parses_accept_encoding(self):
+        self.assertEqual(accepted_codings("gzip, br;q=0.5, *;q=0"), {'gzip': 1.0, 'br': 0.5, '*': 0.0})
+        self.assertEqual(accepted_codings(""), {})
+
+    def test_chooses_the_coding_the_client_prefers(self):
+        self.assertEqual(choose_coding("gzip"), 'gzip')
+        self.assertEqual(choose_coding("identity"), None)
+        self.assertEqual(choose_coding(""), None)
+        self.assertEqual(choose_coding("gzip;q=0, deflate"), None)
+        self.assertEqual(choose_coding("*"), 'br')
+        self.assertEqual(choose_coding("gzip, br;q=0.5"), 'gzip')
+
+    def test_gzips_large_responses(self):
+        plain = self.client.get(reverse('books'))
+        response = self.client.get(reverse('books'), HTTP_ACCEPT_ENCODING='gzip')
+
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertIn('Accept-Encoding', response['Vary'])
+        self.assertEqual(gzip.decompress(response.content), plain.content)
+        self.assertLess(len(response.content) * 5, len(plain.content))
+        # the library's ETag was already weak, so it stays the same
+        self.assertEqual(response['ETag'], plain['ETag'])
+
+    def test_prefers_brotli(self):
+        plain = self.client.get(reverse('books'))
+        response = self.client.get(reverse('books'), HTTP_ACCEPT_ENCODING='gzip, deflate, br')
+
+        self.assertEqual(response['Content-Encoding'], 'br')
+        self.assertEqual(brotli.decompress(response.content), plain.content)
+
+    def test_leaves_small_responses_alone(self):
+        response = self.client.get(reverse('book', args=[Book.objects.first().id]), HTTP_ACCEPT_ENCODING='gzip')
+
+        self.assertFalse(response.has_header('Content-Encoding'))
+        self.assertEqual(json.loads(response.content)['book']['title'], "Compressible Book 0")
+
+    @override_settings(COMPRESSION_MIN_SIZE=10 ** 6)
+    def test_threshold_is_configurable(self):
+        response = self.client.get(reverse('books'), HTTP_ACCEPT_ENCODING='gzip')
+
+        self.assertFalse(response.has_header('Content-Encoding'))
+
+    def test_compresses_streamed_exports(self):
+        plain = self.client.get(reverse('export'))
+        response = self.client.get(reverse('export'), HTTP_ACCEPT_ENCODING='gzip')
+
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(
+            gzip.decompress(b''.join(response.streaming_content)),
+            b''.join(plain.streaming_content))
@@ -17,8 +17,11 @@ from django.conf.urls import url
 from django.contrib import admin
 from django.urls import path, include
 
+from . import metrics
+
 urlpatterns = [
     url(r'^admin/', admin.site.urls),
+    path('metrics', metrics.metrics, name="metrics"),
     path('', include('userauth.urls')),
     path('', include('api.urls')),
 ]
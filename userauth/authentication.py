@@ -0,0 +1,49 @@
+# userauth/authentication.py
+
+from django.conf import settings
+from django.core.cache import cache
+
+from rest_framework import exceptions
+from rest_framework.authentication import TokenAuthentication
+
+
+def token_cache_key(key):
+    return 'auth-token:%s' % (key)
+
+
+def forget_token(key):
+    """ drop a token from the cache so the next request looks it up again """
+    cache.delete(token_cache_key(key))
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """
+    TokenAuthentication that remembers which user a token belongs to.
+
+    DRF's TokenAuthentication looks the token (and its user) up in the database
+    on every request. This keeps the result in Django's cache for
+    settings.TOKEN_CACHE_TIMEOUT seconds, so a client making several requests in a row
+    only pays for the lookup once.
+
+    Cached entries are dropped when their token is deleted or their user is saved
+    (see the receivers in userauth/models.py), but only from the cache of the process
+    that made the change: the default cache is local to each gunicorn worker. So the
+    timeout is kept to a few seconds, which is how long a token that was deleted, or
+    a user who was deactivated, may still be let in by the other workers. That's long
+    enough to cover a burst of requests from one client.
+    """
+
+    def authenticate_credentials(self, key):
+        cache_key = token_cache_key(key)
+        cached = cache.get(cache_key)
+
+        if cached is None:
+            # raises AuthenticationFailed for unknown tokens and inactive users
+            user, token = super().authenticate_credentials(key)
+            cache.set(cache_key, (user, token), settings.TOKEN_CACHE_TIMEOUT)
+            return (user, token)
+
+        user, token = cached
+        if not user.is_active:
+            raise exceptions.AuthenticationFailed('User inactive or deleted.')
+        return (user, token)
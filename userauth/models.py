@@ -24,3 +24,20 @@ from rest_framework.authtoken.models import Token
 def create_auth_token(sender, instance=None, created=False, **kwargs):
     if created:
         Token.objects.create(user=instance)
+
+
+# keep the token cache used by CachedTokenAuthentication in sync
+from django.db.models.signals import post_delete
+from .authentication import forget_token
+
+# a deleted token (e.g. on logout) should stop working straight away
+@receiver(post_delete, sender=Token)
+def forget_deleted_token(sender, instance=None, **kwargs):
+    forget_token(instance.key)
+
+# a changed user (e.g. deactivated) should not be served from a stale cache entry
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+def forget_saved_users_tokens(sender, instance=None, created=False, **kwargs):
+    if not created:
+        for key in Token.objects.filter(user=instance).values_list('key', flat=True):
+            forget_token(key)
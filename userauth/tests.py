@@ -4,6 +4,11 @@ from rest_framework.test import APITestCase
 from rest_framework import status
 from rest_framework.authtoken.models import Token
 from unittest import skip
+from unittest.mock import patch
+import time
+
+from django.conf import settings
+from django.db import connection
 
 # Create your tests here.
 from .models import User
@@ -252,3 +257,63 @@ class LogoutUserTest(APITestCase):
 
         # assert
         self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+class CachedTokenAuthenticationTest(APITestCase):
+    """ Test module for remembering which User a token belongs to """
+
+    def setUp(self):
+        self.user = User.objects.create(
+            username='Cache Test', password='password')
+        self.token = str(self.user.auth_token)
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.token)
+        self.url = reverse('books')
+
+    def test_token_is_looked_up_once(self):
+        # token lookup, library version and the (empty) book list
+        with self.assertNumQueries(3):
+            response = self.client.get(self.url, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        # only the library version and the book list
+        with self.assertNumQueries(2):
+            response = self.client.get(self.url, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_deleted_token_stops_working(self):
+        response = self.client.get(self.url, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        Token.objects.get(key=self.token).delete()
+
+        response = self.client.get(self.url, format='json')
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_token_deleted_by_another_worker_stops_working_after_the_timeout(self):
+        response = self.client.get(self.url, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        # deleted without this process's receivers clearing its cache, as when
+        # another gunicorn worker handles the logout
+        with connection.cursor() as cursor:
+            cursor.execute("DELETE FROM authtoken_token WHERE key = %s", [self.token])
+
+        later = time.time() + settings.TOKEN_CACHE_TIMEOUT + 1
+        with patch('django.core.cache.backends.locmem.time.time', return_value=later):
+            response = self.client.get(self.url, format='json')
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_deactivated_user_stops_working(self):
+        response = self.client.get(self.url, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        self.user.is_active = False
+        self.user.save()
+
+        response = self.client.get(self.url, format='json')
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_invalid_token_is_rejected(self):
+        self.client.credentials(HTTP_AUTHORIZATION='Token notarealtoken')
+        response = self.client.get(self.url, format='json')
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)